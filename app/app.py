@@ -5,8 +5,15 @@ Module containing script to create and populate a cache from a trace file.
 import sys
 import os
 import argparse
+from itertools import islice
 
 from cache_factory import create_cache, CacheType
+from cache_enum import EvictionPolicyType, ReplayEngine, CodecType
+from mrc import miss_ratio_curve, write_curve
+from load_generator import ARRIVALS, feed_open_loop, label_rate, rate_sweep, sustainable_rate, write_sweep
+from process_replay import replay_processes, PARTITIONS
+from request_log import LOG_FORMATS
+from trace_file import read_trace, warmup_keys, WARMUP_MODES
 
 
 def main():
@@ -20,16 +27,96 @@ def main():
 
     # Add arguments to the parser
     parser.add_argument('tracefile', type=str, help='Path to the trace file.')
-    parser.add_argument('tablename', type=str,
-                        help='Name of the table to use.')
+    parser.add_argument('tablename', type=str, nargs='?',
+                        help='Name of the table to use. (not needed with --simulate)')
     parser.add_argument('--cache_type', type=int, default=4,
-                        help='Cache type to use. (1: SQLALCHEMY, 2: REDIS, 3: MEMCACHE)')
+                        help='Cache type to use. (1: SQLALCHEMY, 2: REDIS, 3: MEMCACHE, 4: PYTHON_CACHE, 5: NEAR_CACHE)')
     parser.add_argument('--log_dir', type=str, default=".",
                         help='Directory to log cache operations to.')
     parser.add_argument('--thread_count', type=int,
                         default=1, help='Number of threads to use.')
     parser.add_argument('--limit', type=int, default=0,
                         help='Maximum number of entries to add to the cache.')
+    parser.add_argument('--max_size', type=int, default=0,
+                        help='Maximum byte size of the Python cache. (0: no limit)')
+    parser.add_argument('--shard_count', type=int, default=16,
+                        help='Number of independently locked Python cache segments.')
+    parser.add_argument('--policy', type=str, default=EvictionPolicyType.LRU.value,
+                        choices=[p.value for p in EvictionPolicyType],
+                        help='Eviction policy of the Python cache when --max_size is set.')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='Maximum number of keys a worker takes at once, Redis and Memcache use one multi-key round trip per batch.')
+    parser.add_argument('--single_flight', action='store_true',
+                        help='Redis and Memcache misses take a fill lease so only one worker fetches a key.')
+    parser.add_argument('--lease_ms', type=int, default=1000,
+                        help='Fill lease time to live of --single_flight in milliseconds.')
+    parser.add_argument('--codec', type=str, default=CodecType.JSON.value,
+                        choices=[c.value for c in CodecType],
+                        help='Format of the Redis and Memcache values, raw stores the bytes of the hex values.')
+    parser.add_argument('--compress_threshold', type=int, default=0,
+                        help='Smallest encoded value size compressed with zlib. (0: no compression)')
+    parser.add_argument('--pool_size', type=int, default=0,
+                        help='Number of Redis or Memcache connections the workers share. (0: one per thread)')
+    parser.add_argument('--pg_fast_path', action='store_true',
+                        help='Postgres cache looks up and fills a key with one prepared statement instead of the ORM.')
+    parser.add_argument('--coalesce_ms', type=float, default=0,
+                        help='Collect concurrent misses for this long into one source query. (0: one query per miss)')
+    parser.add_argument('--coalesce_keys', type=int, default=64,
+                        help='Number of keys after which a coalesced source query runs without waiting.')
+    parser.add_argument('--dispatch_chunk', type=int, default=64,
+                        help='Trace requests handed to a worker at once.')
+    parser.add_argument('--affinity', action='store_true',
+                        help='Send every request of a key to the same worker thread.')
+    parser.add_argument('--ttl', type=int, default=0,
+                        help='Time to live of cached values in seconds, Redis EX, Memcache expire and Python cache expiry. (0: no expiry)')
+    parser.add_argument('--l2_cache_type', type=int, default=CacheType.REDIS.value,
+                        choices=[CacheType.REDIS.value, CacheType.MEMCACHE.value],
+                        help='Shared L2 behind the in-process L1 of the near cache. (2: REDIS, 3: MEMCACHE)')
+    parser.add_argument('--l1_size', type=int, default=0,
+                        help='Maximum byte size of the near cache L1, split into --shard_count segments evicted by --policy. (0: no limit)')
+    parser.add_argument('--l1_ttl_ms', type=int, default=0,
+                        help='How long the near cache L1 serves a copy in milliseconds. (0: no expiry)')
+    parser.add_argument('--invalidate', action='store_true',
+                        help='Near caches drop their L1 copies of keys other processes write to the L2, through Redis pub/sub.')
+    parser.add_argument('--log_format', type=str, default="csv", choices=LOG_FORMATS,
+                        help='Request log format, binary logs are converted to csv with app/request_log.py.')
+    parser.add_argument('--log_buffer', type=int, default=1024,
+                        help='Request records a thread buffers before handing them to the log thread.')
+    parser.add_argument('--log_queue', type=int, default=64,
+                        help='Full request log buffers that can wait for the log thread before workers block.')
+    parser.add_argument('--no_request_log', action='store_true',
+                        help='Do not write the per request log, only print the latency percentiles and throughput.')
+    parser.add_argument('--engine', type=str, default=ReplayEngine.THREADS.value,
+                        choices=[e.value for e in ReplayEngine],
+                        help='Replay with worker threads or with asyncio tasks on one event loop (Redis and Memcache, plain gets and sets with --concurrency tasks).')
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help='Number of asyncio worker tasks, the requests in flight with --engine asyncio.')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Number of replay processes, each with its own cache client and --thread_count threads.')
+    parser.add_argument('--partition', type=str, default=PARTITIONS[0], choices=PARTITIONS,
+                        help='How --processes split the trace, round robin or by key hash.')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Open loop replay at this many requests per second, latencies count from the due time. (0: closed loop)')
+    parser.add_argument('--arrival', type=str, default=ARRIVALS[0], choices=ARRIVALS,
+                        help='Open loop arrivals, evenly spaced or a Poisson process.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the Poisson arrivals.')
+    parser.add_argument('--rate_sweep', type=str, default=None,
+                        help='Comma separated request rates replayed open loop until p99 exceeds --slo_ms.')
+    parser.add_argument('--slo_ms', type=float, default=10.0,
+                        help='p99 latency objective of --rate_sweep in milliseconds.')
+    parser.add_argument('--sweep_cache_types', type=str, default=None,
+                        help='Comma separated cache types swept one after another. (default: --cache_type)')
+    parser.add_argument('--warmup', type=int, default=0,
+                        help='Load the keys of the first N requests (or the N most frequent keys) into the cache before the measured run. (0: cold start)')
+    parser.add_argument('--warmup_mode', type=str, default=WARMUP_MODES[0], choices=WARMUP_MODES,
+                        help='Warm up with the first N requests, which are then not replayed, or the top N keys.')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Compute the LRU hit rate vs. cache bytes table without a database or threads.')
+    parser.add_argument('--sample_rate', type=float, default=1.0,
+                        help='SHARDS key sampling rate of --simulate, in (0, 1].')
+    parser.add_argument('--mrc_sizes', type=str, default=None,
+                        help='Comma separated cache byte sizes of --simulate. (default: powers of two)')
 
     # Parse the command line arguments
     args = parser.parse_args()
@@ -49,24 +136,93 @@ def main():
         print("Error: Folder doesn't exist.")
         sys.exit(1)
 
-    # Create a cache object with the specified type
+    if args.simulate:
+        # value bytes as stored by the Python cache, Redis and Memcached add their own overhead
+        sizes = None
+        if args.mrc_sizes:
+            sizes = [int(size) for size in args.mrc_sizes.split(",")]
+        rows = miss_ratio_curve(read_trace(tracefile, args.limit), sizes, args.sample_rate)
+        for size, hit_rate in rows:
+            print(f"{size}\t{hit_rate:.4f}")
+        tracefile_name = tracefile.split("/")[-1]
+        write_curve(rows, f"{log_dir_path}/{tracefile_name}_mrc.csv")
+        return
+
+    if args.tablename is None:
+        print("Error: tablename is required.")
+        sys.exit(1)
+
     cache_type = CacheType(args.cache_type)
-    cache = create_cache(cache_type, args.thread_count,
-                         tracefile, log_dir_path, args.tablename)
-
-    # Open the trace file and populate the cache
-    with open(tracefile) as tracefile:
-        count = 1
-        for line in tracefile:
-            lineSplit = line.split()
-            key = lineSplit[0]
-            cache.keyQueue.put((key, count))
-
-            # Check if the limit is exceeded
-            if args.limit > 0 and count >= args.limit:
-                break
-
-            count += 1
+    options = {"max_size": args.max_size, "shard_count": args.shard_count,
+               "policy_type": EvictionPolicyType(args.policy),
+               "batch_size": args.batch_size,
+               "single_flight": args.single_flight, "lease_ms": args.lease_ms,
+               "engine": ReplayEngine(args.engine), "concurrency": args.concurrency,
+               "codec": CodecType(args.codec), "compress_threshold": args.compress_threshold,
+               "pool_size": args.pool_size, "pg_fast_path": args.pg_fast_path,
+               "coalesce_ms": args.coalesce_ms, "coalesce_keys": args.coalesce_keys,
+               "dispatch_chunk": args.dispatch_chunk, "affinity": args.affinity,
+               "l2_cache_type": CacheType(args.l2_cache_type), "l1_size": args.l1_size,
+               "l1_ttl_ms": args.l1_ttl_ms, "invalidate": args.invalidate, "ttl": args.ttl,
+               "log_format": args.log_format, "log_buffer_size": args.log_buffer,
+               "log_queue_size": args.log_queue, "log_requests": not args.no_request_log}
+
+    warm_keys = None
+    skip = 0
+    if args.warmup > 0:
+        warm_keys = warmup_keys(tracefile, args.warmup, args.warmup_mode, args.limit)
+        if args.warmup_mode == "first":
+            # these requests were replayed by the warm-up
+            skip = args.warmup
+
+    def create_warm_cache(cache_type):
+        cache = create_cache(cache_type, args.thread_count,
+                             tracefile, log_dir_path, args.tablename, **options)
+        if warm_keys:
+            cache.warm_up(warm_keys)
+        return cache
+
+    if args.rate_sweep:
+        rates = [float(rate) for rate in args.rate_sweep.split(",")]
+        cache_types = [cache_type]
+        if args.sweep_cache_types:
+            cache_types = [CacheType(int(value)) for value in args.sweep_cache_types.split(",")]
+        keys = [key for key, _ in islice(read_trace(tracefile, args.limit), skip, None)]
+        sweep_rows = []
+        for sweep_type in cache_types:
+            rows = rate_sweep(lambda rate: label_rate(create_warm_cache(sweep_type), rate),
+                              keys, rates, args.slo_ms, args.arrival, args.seed)
+            print("sustainable_rate", sweep_type.name.lower(),
+                  f"slo_p99_ms {args.slo_ms}", f"rate {sustainable_rate(rows, args.slo_ms)}")
+            sweep_rows.extend({"cache_type": sweep_type.name.lower(), **row} for row in rows)
+        tracefile_name = tracefile.split("/")[-1]
+        write_sweep(sweep_rows, f"{log_dir_path}/{tracefile_name}_rate_sweep.csv")
+        return
+
+    if args.processes > 1:
+        if args.rate > 0:
+            print("Error: --rate replays in one process.")
+            sys.exit(1)
+        replay_processes(args.processes, args.partition, cache_type, args.thread_count,
+                         tracefile, log_dir_path, args.tablename, args.limit,
+                         warm_keys=warm_keys, skip=skip, **options)
+        return
+
+    # Create a cache object with the specified type
+    cache = create_warm_cache(cache_type)
+
+    # Read the trace file and populate the cache
+    requests = islice(read_trace(tracefile, args.limit), skip, None)
+    if args.rate > 0:
+        label_rate(cache, args.rate)
+        send_stats = feed_open_loop(cache, (key for key, _ in requests),
+                                    args.rate, args.arrival, args.seed)
+        print("open_loop", f"rate {args.rate:g}", f"arrival {args.arrival}",
+              f"sent {send_stats['sent']}", f"late_sends {send_stats['late']}",
+              f"max_lag_ms {send_stats['max_lag_ms']:.4f}")
+    else:
+        for count, (key, _) in enumerate(requests, skip + 1):
+            cache.dispatcher.put(key, count)
 
     # Close the cache
     cache.close()
@@ -0,0 +1,227 @@
+"""
+Asyncio replay engine for the network bound caches.
+
+Instead of one thread and one connection per worker, a single event loop thread runs
+`concurrency` worker tasks that share a bounded connection pool, so thousands of requests
+can be in flight without thousands of OS threads. Requests are logged in the same format
+as the threaded workers, with the task number in the thread_number column.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import aiomcache
+import redis.asyncio as aioredis
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from memcache_cache import MemcacheCache
+from postgres_db import get_async_engine, fetch_data_auto_async
+from redis_cache import RedisCache
+
+# upper bound of the connections the worker tasks share per backend
+MAX_CONNECTIONS = 256
+DB_POOL_SIZE = 32
+
+
+class AsyncCache:
+    """
+    Mixin that replaces the worker threads of a Cache subclass with an event loop.
+
+    It goes before the backend class in the bases, which keeps the backend's sync
+    connection for prep_cache and its cache type for the log file name.
+
+    Attributes:
+    concurrency (int): Number of worker tasks, the maximum number of requests in flight.
+    connection_count (int): Number of connections the worker tasks share.
+    """
+
+    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name,
+                 concurrency=100, **kwargs):
+        """
+        Initializes the asyncio cache instance.
+
+        Parameters:
+        thread_count (int): Unused, the event loop thread is the only consumer of the trace,
+            create_cache only accepts 1.
+        trace_file_name (str): Name of the trace file.
+        log_dir_path (str): Path to the log directory.
+        table_name (str): Name of the cache table.
+        concurrency (int): Number of worker tasks.
+        kwargs: Options passed on to Cache, a pool_size option sets connection_count.
+
+        Raises:
+        Exception: If concurrency is less than 1.
+        """
+        if concurrency < 1:
+            raise Exception("concurrency less than 1")
+        # the backend constructor starts the workers, so this has to be set first
+        self.concurrency = concurrency
+        self.connection_count = kwargs.get("pool_size") or min(concurrency, MAX_CONNECTIONS)
+        self.async_engine = None
+        self.AsyncSession = None
+        super().__init__(1, trace_file_name, log_dir_path, table_name, **kwargs)
+
+    def worker_threads(self):
+        """
+        Initializes the event loop thread and log thread.
+        """
+        self.log_label = "asyncio"
+        # codec stats are kept per task
+        self.codec_stats = [[0, 0, 0, 0, 0, 0] for _ in range(self.concurrency)]
+        self.start_ns = time.perf_counter_ns()
+        try:
+            if self.request_log is not None:
+                self.log_thread = threading.Thread(target=self.cache_log_worker)
+                self.log_thread.start()
+            self.cache_worker_threads.append(threading.Thread(
+                target=asyncio.run, args=(self.replay(),)))
+            for worker_thread in self.cache_worker_threads:
+                worker_thread.start()
+        except Exception as e:
+            # if anything goes wrong on setup raise exception
+            print(e)
+            raise
+
+    async def create_async_connection(self):
+        """
+        Creates the connection pool shared by the worker tasks.
+        """
+        return None
+
+    async def close_async_connection(self, conn):
+        """
+        Closes the shared connection pool.
+        """
+        pass
+
+    async def process_key_async(self, conn, key, count, task_number):
+        """
+        Processes a cache key.
+
+        Parameters:
+        conn (object): Shared async client.
+        key (str): Key to process.
+        count (int): Count to process.
+        task_number (int): Worker task number.
+        """
+        pass
+
+    async def fetch_source_async(self, key):
+        """
+        Fetches a value from the database without blocking the event loop.
+        """
+        return await fetch_data_auto_async(self.SourceTable, key, self.AsyncSession)
+
+    async def replay(self):
+        """
+        Feeds the dispatched chunks to the worker tasks until the end of the trace.
+
+        The chunks are dispatched by the main thread, so they are waited for in the default
+        executor to keep the event loop free.
+        """
+        # the async engine belongs to the loop it was created in
+        self.async_engine = get_async_engine(min(self.concurrency, DB_POOL_SIZE))
+        self.AsyncSession = async_sessionmaker(self.async_engine)
+        conn = await self.create_async_connection()
+        requests = asyncio.Queue(maxsize=2 * self.concurrency)
+        tasks = [asyncio.create_task(self.async_worker(conn, requests, task_number))
+                 for task_number in range(self.concurrency)]
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, self.dispatcher.get_chunk, 0)
+                if chunk is None:
+                    break
+                for item in chunk:
+                    await requests.put(item)
+
+            for _ in tasks:
+                await requests.put(None)
+            await asyncio.gather(*tasks)
+        finally:
+            await self.close_async_connection(conn)
+            await self.async_engine.dispose()
+
+    async def async_worker(self, conn, requests, task_number):
+        """
+        Processes keys until it gets the end of replay marker.
+
+        Raises:
+        Exception: The first request failure of the task, once the replay ended.
+        """
+        error = None
+        while True:
+            item = await requests.get()
+            if item is None:
+                break
+            if error is not None:
+                # the replay failed, the queue is only drained so the feed is not blocked
+                continue
+            key, count = item
+            try:
+                await self.process_key_async(conn, key, count, task_number)
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+
+
+class AsyncRedisCache(AsyncCache, RedisCache):
+    """
+    Redis cache replayed with redis.asyncio.
+    """
+
+    async def create_async_connection(self):
+        REDIS_HOSTNAME = os.getenv('REDIS_HOSTNAME')
+        REDIS_PORT = os.getenv('REDIS_PORT')
+        # tasks wait for a free connection instead of failing when the pool is used up
+        pool = aioredis.BlockingConnectionPool(
+            host=REDIS_HOSTNAME, port=REDIS_PORT,
+            max_connections=self.connection_count, timeout=None)
+        return aioredis.Redis(connection_pool=pool)
+
+    async def close_async_connection(self, conn):
+        await conn.aclose()
+        await conn.connection_pool.disconnect()
+
+    async def process_key_async(self, conn, key, count, task_number):
+        stime = time.perf_counter_ns()
+        value = await conn.get(key)
+        if value is not None:
+            self.log_cache(task_number, count, stime, key,
+                           self.decode_value(value, task_number), True)
+        else:
+            value = await self.fetch_source_async(key)
+            self.log_cache(task_number, count, stime, key, value, False)
+            await conn.set(key, self.encode_value(value, task_number), ex=self.ttl or None)
+
+
+class AsyncMemcacheCache(AsyncCache, MemcacheCache):
+    """
+    Memcache cache replayed with aiomcache.
+    """
+
+    async def create_async_connection(self):
+        MEMCACHED_HOSTNAME = os.getenv('MEMCACHED_HOSTNAME')
+        MEMCACHED_PORT = os.getenv('MEMCACHED_PORT')
+        return aiomcache.Client(MEMCACHED_HOSTNAME, int(MEMCACHED_PORT),
+                                pool_size=self.connection_count)
+
+    async def close_async_connection(self, conn):
+        await conn.close()
+
+    async def process_key_async(self, conn, key, count, task_number):
+        stime = time.perf_counter_ns()
+        # aiomcache only takes byte keys and values
+        value = await conn.get(key.encode())
+        if value is not None:
+            self.log_cache(task_number, count, stime, key,
+                           self.decode_value(value, task_number), True, False)
+        else:
+            value = await self.fetch_source_async(key)
+            await conn.set(key.encode(), self.encode_value(value, task_number),
+                           exptime=self.ttl)
+            self.log_cache(task_number, count, stime, key, value, False, False)
@@ -4,15 +4,23 @@ Cache class for caching data.
 
 import threading
 import time
-import queue
 import datetime
 
 from sqlalchemy import MetaData
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.automap import automap_base
 
-from cache_enum import CacheType
-from postgres_db import get_engine
+from cache_enum import CacheType, CodecType
+from codec import create_codec
+from connection_pool import PoolWaitTimer
+from dispatcher import Dispatcher
+from request_log import RequestLog, TIER_CACHE, TIER_SOURCE, LOG_DATE_FORMAT, log_file_name
+from fetch_coalescer import FetchCoalescer
+from latency_histogram import LatencyHistogram
+from postgres_db import get_engine, fetch_data_auto, fetch_data_many
+
+# keys stored per bulk operation of a warm-up
+WARMUP_BATCH = 1000
 
 class Cache:
     """
@@ -23,9 +31,25 @@ class Cache:
     log_dir_path (str): Path to the log directory.
     tracefile_name (str): Name of the trace file.
     table_name (str): Name of the cache table.
+    batch_size (int): Maximum number of keys a worker takes from the queue at once.
+    single_flight (bool): Whether a miss takes a lease in the backend so only one worker fetches a key.
+    prep (bool): Whether the constructor flushes the backend with prep_cache.
+    codec (Codec): Format of the values stored in Redis and Memcache.
+    pool_size (int): Number of connections the workers share.
+    ttl (int): Time to live of cached values in seconds, 0 for no expiry.
+    coalescer (FetchCoalescer): Batches the source fetches of concurrent misses, None when off.
+    dispatcher (Dispatcher): Hands chunks of trace requests to the workers.
+    request_log (RequestLog): Buffers request records for the log thread, None without request logging.
+    scheduled_ns (dict): Due perf_counter_ns times of open loop requests by count, latencies
+        of these requests are measured from the due time.
     """
 
-    def __init__(self, thread_count, tracefile_name, log_dir_path, table_name):
+    def __init__(self, thread_count, tracefile_name, log_dir_path, table_name, batch_size=1,
+                 single_flight=False, lease_ms=1000, lease_poll_ms=5, prep=True,
+                 codec=CodecType.JSON, compress_threshold=0, pool_size=0,
+                 coalesce_ms=0, coalesce_keys=64, dispatch_chunk=64, affinity=False, ttl=0,
+                 log_format="csv", log_buffer_size=1024, log_queue_size=64,
+                 log_requests=True):
         """
         Initializes the Cache instance.
         
@@ -34,21 +58,67 @@ class Cache:
         tracefile_name (str): Name of the trace file.
         log_dir_path (str): Path to the log directory.
         table_name (str): Name of the cache table.
+        batch_size (int): Maximum number of keys a worker takes from the queue at once.
+        single_flight (bool): Whether a miss takes a lease in the backend so only one worker fetches a key.
+        lease_ms (int): Lease time to live, waiting workers fetch themselves once it runs out.
+        lease_poll_ms (int): How often a waiting worker checks whether the value was filled.
+        prep (bool): Whether to flush the backend, False when another process already did.
+        codec (CodecType): Format of the values stored in Redis and Memcache.
+        compress_threshold (int): Smallest encoded value size compressed with zlib, 0 for none.
+        pool_size (int): Number of connections the workers share, 0 for one per thread.
+        coalesce_ms (float): How long concurrent misses are collected into one source query, 0 for no coalescing.
+        coalesce_keys (int): Number of keys after which a source query runs without waiting.
+        dispatch_chunk (int): Requests handed to a worker at once, at least batch_size.
+        affinity (bool): Whether every request of a key goes to the same worker.
+        ttl (int): Time to live of cached values in seconds, 0 for no expiry. Redis sets it
+            with EX, Memcache as the expire time and the Python cache expires its entries
+            itself. The Postgres cache keeps values until the table is flushed.
+        log_format (str): Request log format, "csv" or "binary".
+        log_buffer_size (int): Records a thread buffers before handing them to the log thread.
+        log_queue_size (int): Full buffers that can wait for the log thread before workers block.
+        log_requests (bool): Whether every request is written to the log file, the latency
+            histograms are kept either way.
         
         Raises:
-        Exception: If thread_count is less than 1.
+        Exception: If thread_count or batch_size is less than 1.
         """
         if thread_count < 1:
             raise Exception("thread_count less than 1")
+        if batch_size < 1:
+            raise Exception("batch_size less than 1")
         self.thread_count = thread_count
+        self.batch_size = batch_size
+        self.single_flight = single_flight
+        self.lease_ms = lease_ms
+        self.lease_poll_ms = lease_poll_ms
+        self.prep = prep
+        self.codec = create_codec(codec, compress_threshold)
+        # encodes, encode ns, encoded bytes, decodes, decode ns and decoded bytes, one row per worker
+        self.codec_stats = [[0, 0, 0, 0, 0, 0] for _ in range(thread_count)]
+        self.pool_size = pool_size if pool_size > 0 else thread_count
+        self.ttl = ttl
+        # connection checkout time of the request a thread is working on
+        self.pool_wait = PoolWaitTimer()
+        # source fetches, fills waited for, lease timeouts and wait seconds, one row per worker
+        self.flight_stats = [[0, 0, 0, 0.0] for _ in range(thread_count)]
         self.log_dir_path = log_dir_path
         self.tracefile_name = tracefile_name
         self.cache_worker_threads = []
         self.log_thread = None
         self.cache_type = CacheType.NONE
+        self.log_label = None
 
-        self.keyQueue = queue.Queue(maxsize=100)
-        self.request_log_queue = queue.Queue()
+        self.dispatcher = Dispatcher(thread_count, max(dispatch_chunk, batch_size), affinity)
+        self.request_log = None
+        if log_requests:
+            self.request_log = RequestLog(log_format, log_buffer_size, log_queue_size)
+        # hit and miss latency histograms and last request end of each thread, merged at close
+        self.local_histograms = threading.local()
+        self.histograms = []
+        self.histograms_lock = threading.Lock()
+        self.start_ns = None
+        self.scheduled_ns = {}
+        self.warmup_secs = 0.0
 
         self.engine = get_engine()
         session_factory = sessionmaker(bind=self.engine)
@@ -61,19 +131,122 @@ class Cache:
         BaseSourceTable.prepare()
         self.SourceTable = BaseSourceTable.classes[self.table_name]
 
+        self.coalescer = None
+        if coalesce_ms > 0:
+            self.coalescer = FetchCoalescer(
+                lambda keys: fetch_data_many(self.SourceTable, keys, self.Session),
+                coalesce_ms, coalesce_keys)
+
     def prep_cache(self):
         """
         Prepares the cache by flushing all data and closing the connection.
         """
         pass
 
+    def warm_up(self, keys):
+        """
+        Loads the values of keys into the backend before the measured run.
+
+        The values are read with one source table query and stored with the bulk
+        operations of the backend. The measured run, and its throughput, start afterwards.
+
+        Parameters:
+        keys (list): Distinct keys, the most recently or frequently used last.
+        """
+        stime = time.perf_counter_ns()
+        loaded = self.bulk_load(keys)
+        self.warmup_secs = (time.perf_counter_ns() - stime) / 1e9
+        print("warmup", self.cache_type.name.lower(),
+              f"keys {len(keys)}",
+              f"loaded {loaded}",
+              f"secs {self.warmup_secs:.4f}",
+              f"per_sec {loaded / max(self.warmup_secs, 1e-9):.4f}")
+        # the workers wait for the first chunk, so the measured run starts now
+        self.start_ns = time.perf_counter_ns()
+
+    def bulk_load(self, keys):
+        """
+        Stores the source values of keys in the backend.
+
+        Parameters:
+        keys (list): Distinct keys in the order they are stored.
+
+        Returns:
+        int: Number of values stored.
+        """
+        return 0
+
+    def warmup_batches(self, keys):
+        """
+        Fetches the source values of keys with one query.
+
+        Parameters:
+        keys (list): Distinct keys.
+
+        Returns:
+        generator: Dicts of up to WARMUP_BATCH source values by key, in the order of keys.
+        """
+        values = fetch_data_many(self.SourceTable, keys, self.Session)
+        for start in range(0, len(keys), WARMUP_BATCH):
+            batch = {key: values[key] for key in keys[start:start + WARMUP_BATCH]
+                     if key in values}
+            if batch:
+                yield batch
+
     def close(self):
         """
-        Closes all threads and connections.
+        Ends the trace and closes all threads and connections.
         """
+        self.dispatcher.close()
         for worker_thread in self.cache_worker_threads:
             worker_thread.join()
-        self.log_thread.join()
+        self.print_latency_report()
+
+        dispatch_stats = self.dispatcher.stats()
+        print("dispatch",
+              f"chunks {dispatch_stats['chunks']}",
+              f"mean_chunk {dispatch_stats['mean_chunk']:.4f}",
+              f"producer_waits {dispatch_stats['producer_waits']}",
+              f"producer_wait_ms {dispatch_stats['producer_wait_ms']:.4f}",
+              f"worker_wait_ms {dispatch_stats['worker_wait_ms']:.4f}")
+
+        if self.request_log is not None:
+            # the workers are done, so the log thread gets their last records and stops
+            self.request_log.close()
+            self.log_thread.join()
+
+            log_stats = self.request_log.stats()
+            print("request_log",
+                  f"records {log_stats['records']}",
+                  f"batches {log_stats['batches']}",
+                  f"full_waits {log_stats['full_waits']}",
+                  f"wait_ms {log_stats['wait_ms']:.4f}",
+                  f"max_queue {log_stats['max_depth']}")
+
+        if self.single_flight:
+            fetches, waits, timeouts, wait_secs = map(sum, zip(*self.flight_stats))
+            print("single_flight",
+                  f"source_fetches {fetches}",
+                  f"fetches_saved {waits}",
+                  f"lease_timeouts {timeouts}",
+                  f"mean_wait_ms {wait_secs * 1000 / max(1, waits + timeouts):.4f}")
+
+        encodes, encode_ns, encoded_bytes, decodes, decode_ns, decoded_bytes = map(
+            sum, zip(*self.codec_stats))
+        if encodes or decodes:
+            print("codec", self.codec.name,
+                  f"bytes_written {encoded_bytes}",
+                  f"bytes_read {decoded_bytes}",
+                  f"mean_encode_us {encode_ns / 1000 / max(1, encodes):.4f}",
+                  f"mean_decode_us {decode_ns / 1000 / max(1, decodes):.4f}")
+
+        if self.coalescer is not None:
+            stats = self.coalescer.stats()
+            print("fetch_coalescer",
+                  f"fetches {stats['requests']}",
+                  f"queries {stats['queries']}",
+                  f"deduped {stats['deduped']}",
+                  f"mean_batch {stats['mean_batch']:.4f}")
 
     def process_key(self, cache_conn, key, count, threadNumber):
         """
@@ -87,6 +260,228 @@ class Cache:
         """
         pass
 
+    def process_batch(self, cache_conn, items, threadNumber):
+        """
+        Processes a batch of cache keys.
+
+        Backends that support multi-key commands override this to use one round trip per
+        batch, the default processes the keys one at a time.
+
+        Parameters:
+        cache_conn (Client): Backend connection object.
+        items (list): (key, count) tuples to process.
+        threadNumber (int): Thread number.
+        """
+        for key, count in items:
+            self.process_key(cache_conn, key, count, threadNumber)
+
+    @staticmethod
+    def split_repeats(misses):
+        """
+        Splits the misses of a batch into the first request of every key and the requests
+        that repeat a key.
+
+        A batch fetches a missing key once, so its repeats are served by that fetch and
+        logged as hits.
+
+        Parameters:
+        misses (list): (key, count) tuples that missed.
+
+        Returns:
+        tuple: The (key, count) tuples to fetch and the repeated (key, count) tuples.
+        """
+        first = {}
+        repeats = []
+        for key, count in misses:
+            if key in first:
+                repeats.append((key, count))
+            else:
+                first[key] = count
+        return list(first.items()), repeats
+
+    def latency_histograms(self):
+        """
+        Merges the latency histograms of all threads.
+
+        Returns:
+        tuple: Hit, miss and overall LatencyHistogram and the wall clock seconds from the
+        start of the workers to the end of the last request.
+        """
+        hit_histogram = LatencyHistogram()
+        miss_histogram = LatencyHistogram()
+        end_ns = self.start_ns or 0
+        with self.histograms_lock:
+            for thread_hits, thread_misses, last_ns in self.histograms:
+                hit_histogram.merge(thread_hits)
+                miss_histogram.merge(thread_misses)
+                end_ns = max(end_ns, last_ns)
+        all_histogram = LatencyHistogram()
+        all_histogram.merge(hit_histogram)
+        all_histogram.merge(miss_histogram)
+        secs = (end_ns - (self.start_ns or end_ns)) / 1e9
+        return hit_histogram, miss_histogram, all_histogram, secs
+
+    def print_latency_report(self):
+        """
+        Prints the hit, miss and overall latency percentiles in milliseconds and the wall
+        clock throughput.
+        """
+        hit_histogram, miss_histogram, all_histogram, secs = self.latency_histograms()
+        backend = self.cache_type.name.lower()
+        for name, histogram in (("hit", hit_histogram), ("miss", miss_histogram),
+                                ("all", all_histogram)):
+            print("latency_ms", backend, name, histogram.summary())
+
+        print("throughput", backend,
+              f"requests {all_histogram.count}",
+              f"secs {secs:.4f}",
+              f"per_sec {all_histogram.count / max(secs, 1e-9):.4f}")
+
+    def thread_histograms(self):
+        """
+        Returns:
+        list: The hit and miss latency histograms of the calling thread and the
+        perf_counter_ns time its last request ended.
+        """
+        histograms = getattr(self.local_histograms, "histograms", None)
+        if histograms is None:
+            histograms = [LatencyHistogram(), LatencyHistogram(), 0]
+            self.local_histograms.histograms = histograms
+            with self.histograms_lock:
+                self.histograms.append(histograms)
+        return histograms
+
+    def fetch_source(self, key):
+        """
+        Fetches a value from the source table, through the coalescer when there is one.
+
+        Parameters:
+        key (str): Key to fetch.
+
+        Returns:
+        str: The value, or None if the key is not in the source table.
+        """
+        if self.coalescer is not None:
+            return self.coalescer.fetch(key)
+        return fetch_data_auto(self.SourceTable, key, None, self.Session)
+
+    def encode_value(self, value, threadNumber):
+        """
+        Encodes a value for the backend with the codec of the run.
+
+        Parameters:
+        value (str): Source value.
+        threadNumber (int): Thread number.
+
+        Returns:
+        bytes: The encoded value.
+        """
+        stime = time.perf_counter_ns()
+        data = self.codec.encode(value)
+        stats = self.codec_stats[threadNumber]
+        stats[0] += 1
+        stats[1] += time.perf_counter_ns() - stime
+        stats[2] += len(data)
+        return data
+
+    def decode_value(self, data, threadNumber):
+        """
+        Decodes a value read from the backend.
+
+        Parameters:
+        data (bytes): Encoded value.
+        threadNumber (int): Thread number.
+
+        Returns:
+        str: The source value.
+        """
+        stime = time.perf_counter_ns()
+        value = self.codec.decode(data)
+        stats = self.codec_stats[threadNumber]
+        stats[3] += 1
+        stats[4] += time.perf_counter_ns() - stime
+        stats[5] += len(data)
+        return value
+
+    def lookup_value(self, cache_conn, key, threadNumber):
+        """
+        Gets a value from the backend for a single flight waiter.
+
+        Returns:
+        str: The value, or None if the key is not cached.
+        """
+        return None
+
+    def store_value(self, cache_conn, key, value, threadNumber):
+        """
+        Sets a value in the backend after a single flight fetch.
+        """
+        pass
+
+    def acquire_lease(self, cache_conn, key):
+        """
+        Tries to take the fill lease of a key.
+
+        Returns:
+        bool: True if this worker holds the lease and must fetch the value.
+        """
+        return True
+
+    def release_lease(self, cache_conn, key):
+        """
+        Gives up the fill lease of a key.
+        """
+        pass
+
+    def lease_fetch(self, cache_conn, key, threadNumber):
+        """
+        Fetches a missing value so only one worker across all processes hits the source.
+
+        The worker that gets the lease reads the backend once more, as the last holder may
+        have filled the value since this worker missed, and otherwise fetches and stores
+        it. Other workers poll the backend until the value appears. If the lease runs out
+        first they fetch it themselves.
+
+        Parameters:
+        cache_conn (Client): Backend connection object.
+        key (str): Key that missed.
+        threadNumber (int): Thread number.
+
+        Returns:
+        str: The value.
+        """
+        stats = self.flight_stats[threadNumber]
+        if self.acquire_lease(cache_conn, key):
+            try:
+                value = self.lookup_value(cache_conn, key, threadNumber)
+                if value is not None:
+                    stats[1] += 1
+                    return value
+                value = self.fetch_source(key)
+                self.store_value(cache_conn, key, value, threadNumber)
+            finally:
+                self.release_lease(cache_conn, key)
+            stats[0] += 1
+            return value
+
+        wait_start = time.time()
+        deadline = wait_start + self.lease_ms / 1000
+        while time.time() < deadline:
+            time.sleep(self.lease_poll_ms / 1000)
+            value = self.lookup_value(cache_conn, key, threadNumber)
+            if value is not None:
+                stats[1] += 1
+                stats[3] += time.time() - wait_start
+                return value
+
+        # the lease holder did not fill the value in time
+        value = self.fetch_source(key)
+        self.store_value(cache_conn, key, value, threadNumber)
+        stats[0] += 1
+        stats[2] += 1
+        stats[3] += time.time() - wait_start
+        return value
+
     def create_connection(self):
         """
         Creates a connection to the Memcache server.
@@ -96,13 +491,24 @@ class Cache:
         """
         return None
 
+    def release_connection(self, cache_conn):
+        """
+        Releases the connection of a worker once it processed its last request.
+
+        Parameters:
+        cache_conn (Client): Connection from create_connection.
+        """
+        pass
+
     def worker_threads(self):
         """
         Initializes the worker threads and log thread.
         """
+        self.start_ns = time.perf_counter_ns()
         try:
-            self.log_thread = threading.Thread(target=self.cache_log_worker)
-            self.log_thread.start()
+            if self.request_log is not None:
+                self.log_thread = threading.Thread(target=self.cache_log_worker)
+                self.log_thread.start()
             for thread_number in range(self.thread_count):
                 self.cache_worker_threads.append(threading.Thread(
                     target=self.cache_worker, args=(thread_number,)))
@@ -113,115 +519,107 @@ class Cache:
             print(e)
             raise
 
-    def cache_log_worker(self):
+    def log_file_path(self):
         """
-        Logs cache data to a file.
-        """
-        datetime_object = datetime.datetime.now()
-        string_format = "%d_%m_%Y_%H_%M"
-        formatted_string = datetime_object.strftime(string_format)
+        Builds the path of the request log file.
 
-        log_file = open(
-            f"{self.log_dir_path}/{self.tracefile_name}_{formatted_string}_{self.cache_type.value}.log", 'w')
+        The name is the trace file name, the optional log label, the current time and the
+        cache type value joined by underscores, binary logs end in .bin instead of .log.
 
-        csv_string = "cache_action,"
-        csv_string += "thread_number,"
-        csv_string += "count,"
-        csv_string += "delta_time,"
-        csv_string += "key,"
-        csv_string += "value"
+        Returns:
+        str: Path of the log file.
+        """
+        datetime_object = datetime.datetime.now()
+        formatted_string = datetime_object.strftime(LOG_DATE_FORMAT)
 
-        log_file.write(str(csv_string) + '\n')
+        extension = "bin" if self.request_log is not None and self.request_log.log_format == "binary" else "log"
+        name = log_file_name(self.tracefile_name, self.log_label, formatted_string,
+                             self.cache_type.value, extension)
+        return f"{self.log_dir_path}/{name}"
 
-        queue_empty = False
-        while not queue_empty:
-            try:
-                log_item = self.request_log_queue.get(block=True, timeout=1.0)
-                csv_string = f'{log_item["cache_action"]},'
-                csv_string += f'{log_item["thread_number"]},'
-                csv_string += f'{log_item["count"]},'
-                csv_string += f'{log_item["delta_time"]},'
-                csv_string += f'{log_item["key"]},'
-                csv_string += f'{log_item["value"]}'
-
-                log_file.write(str(csv_string) + '\n')
-                self.request_log_queue.task_done()
-            except queue.Empty:
-                if self.keyQueue.empty():
-                    queue_empty = True
-        log_file.close()
+    def cache_log_worker(self):
+        """
+        Logs cache data to a file until close() stops the request log.
+        """
+        self.request_log.write(self.log_file_path())
 
     def cache_worker(self, threadNumber):
         """
-        Processes cache keys.
+        Processes the chunks of cache keys dispatched to a worker until the end of the trace.
         
         Parameters:
         threadNumber (int): Thread number.
         """
         # child class specific
         cache_conn = self.create_connection()
-        while True:
-            key, count, queue_empty = self.next_queue_value()
-            
-            if queue_empty:
-                break
-
-            if key is None:
-                continue
-
-            self.process_key(cache_conn, key, count, threadNumber)
+        batch_size = self.batch_size
+        try:
+            for chunk in self.dispatcher.worker_chunks(threadNumber):
+                if batch_size > 1:
+                    for start in range(0, len(chunk), batch_size):
+                        self.process_batch(cache_conn, chunk[start:start + batch_size],
+                                           threadNumber)
+                else:
+                    for key, count in chunk:
+                        self.process_key(cache_conn, key, count, threadNumber)
+        except Exception:
+            # the producer keeps queueing the keys of this worker, taking its chunks until
+            # the end of the trace gives back their slots so the producer does not block
+            for _ in self.dispatcher.worker_chunks(threadNumber):
+                pass
+            raise
+        finally:
+            self.release_connection(cache_conn)
 
-    def log_cache(self, threadNumber, count, stime, key=None, value=None, hit=False, debug=False):
+    def log_cache(self, threadNumber, count, stime, key=None, value=None, hit=False, debug=False,
+                  tier=None):
         """
-        Logs cache data to the log queue.
+        Records the latency of a request and logs it to the request log buffer of the
+        calling thread.
         
         Parameters:
         threadNumber (int): Thread number.
         count (int): Count to process.
-        stime (float): Start time.
+        stime (int): Start time from time.perf_counter_ns.
         key (str): Key to log.
         value (str): Value to log.
         hit (bool): Whether the cache hit.
         debug (bool): Whether to print debug information.
-        """
-        log_item = {"cache_action": hit if "hit" else "miss",
-                    "thread_number": threadNumber,
-                    "count": count, "delta_time": self.delta_time(stime),
-                    "key": key,
-                    "value": value}
-        if debug:
-            print(log_item)
-        self.request_log_queue.put(log_item)
+        tier (int): Tier code the request was served from, by default cache for a hit and
+            source for a miss.
 
-    def next_queue_value(self):
-        """
-        Gets the next value from the key queue.
-        
         Returns:
-        tuple: Key, count, and queue empty flag.
+        int: The latency of the request in nanoseconds.
         """
-        key = None
-        count = None
-        queue_empty = False
-        try:
-            key, count = self.keyQueue.get(block=True, timeout=1.00)
-            self.keyQueue.task_done()
-        except queue.Empty:
-            if self.keyQueue.empty():
-                queue_empty = True
-
-        return key, count, queue_empty
+        end_ns = time.perf_counter_ns()
+        if self.scheduled_ns:
+            # open loop requests wait from their due time, not from when a worker got them
+            stime = self.scheduled_ns.pop(count, stime)
+        latency_ns = end_ns - stime
+        histograms = self.thread_histograms()
+        histograms[0 if hit else 1].record(latency_ns)
+        histograms[2] = end_ns
+        pool_wait = self.pool_wait.take()
+        if debug:
+            print(hit, threadNumber, count, latency_ns / 1e6, pool_wait, key, value)
+        if self.request_log is not None:
+            if tier is None:
+                tier = TIER_CACHE if hit else TIER_SOURCE
+            # numbers are formatted by the log thread
+            self.request_log.record(hit, threadNumber, count, latency_ns / 1e6, pool_wait,
+                                    time.time(), tier, key, str(value))
+        return latency_ns
 
     def delta_time(self, stime):
         """
         Calculates the delta time.
         
         Parameters:
-        stime (float): Start time.
+        stime (int): Start time from time.perf_counter_ns.
         
         Returns:
         str: Delta time in milliseconds.
         """
-        end_time = (time.time() - stime) * 1000
+        end_time = (time.perf_counter_ns() - stime) / 1e6
         delta = "{:.4f}".format(end_time)
         return delta
@@ -26,3 +26,62 @@ class CacheType(Enum):
 
     # A cache that uses a Python dictionary
     PYTHON_CACHE = 4
+
+    # An in-process Python LRU cache in front of REDIS or MEMCACHE
+    NEAR_CACHE = 5
+
+
+class EvictionPolicyType(Enum):
+    """
+    Enumerates the eviction policies the Python cache can use.
+
+    Each policy is assigned the name used to select it on the command line.
+    """
+
+    # Least recently used
+    LRU = "lru"
+
+    # Adaptive replacement cache
+    ARC = "arc"
+
+    # 2Q, a probation FIFO in front of a main LRU
+    TWO_Q = "2q"
+
+    # Second chance FIFO
+    CLOCK = "clock"
+
+    # SIEVE, a FIFO with a moving hand
+    SIEVE = "sieve"
+
+    # Window LRU and segmented LRU behind a TinyLFU admission filter
+    W_TINYLFU = "tinylfu"
+
+    # GreedyDual-Size-Frequency, evicts large and rarely used entries first
+    GDSF = "gdsf"
+
+
+class ReplayEngine(Enum):
+    """
+    Enumerates the ways requests can be replayed against a cache.
+    """
+
+    # One thread and one connection per worker
+    THREADS = "threads"
+
+    # Worker tasks on one event loop sharing a connection pool, Redis and Memcache only
+    ASYNCIO = "asyncio"
+
+
+class CodecType(Enum):
+    """
+    Enumerates the formats Redis and Memcache values are stored in.
+    """
+
+    # The bytes a hex string value stands for
+    RAW = "raw"
+
+    # JSON text
+    JSON = "json"
+
+    # Python pickle
+    PICKLE = "pickle"
@@ -6,15 +6,43 @@ from redis_cache import RedisCache
 from memcache_cache import MemcacheCache
 from postgres_cache import PostgresCache
 from python_cache import PythonCache
+from near_cache import NearRedisCache, NearMemcacheCache
+from async_cache import AsyncRedisCache, AsyncMemcacheCache
 
-from cache_enum import CacheType
+from cache_enum import CacheType, EvictionPolicyType, ReplayEngine, CodecType
 
 
 def create_cache(cache_type: CacheType,
                  thread_count: int,
                  tracefile_path: str,
                  log_dir_path: str,
-                 table_name: str) -> object:
+                 table_name: str,
+                 max_size: int = 0,
+                 shard_count: int = 1,
+                 policy_type: EvictionPolicyType = EvictionPolicyType.LRU,
+                 batch_size: int = 1,
+                 single_flight: bool = False,
+                 lease_ms: int = 1000,
+                 engine: ReplayEngine = ReplayEngine.THREADS,
+                 concurrency: int = 100,
+                 prep: bool = True,
+                 codec: CodecType = CodecType.JSON,
+                 compress_threshold: int = 0,
+                 pool_size: int = 0,
+                 pg_fast_path: bool = False,
+                 coalesce_ms: float = 0,
+                 coalesce_keys: int = 64,
+                 dispatch_chunk: int = 64,
+                 affinity: bool = False,
+                 l2_cache_type: CacheType = CacheType.REDIS,
+                 l1_size: int = 0,
+                 l1_ttl_ms: int = 0,
+                 invalidate: bool = False,
+                 ttl: int = 0,
+                 log_format: str = "csv",
+                 log_buffer_size: int = 1024,
+                 log_queue_size: int = 64,
+                 log_requests: bool = True) -> object:
     """
     Creates a cache instance based on the provided cache type.
 
@@ -24,22 +52,103 @@ def create_cache(cache_type: CacheType,
         tracefile_path (str): Path to the trace file.
         log_dir_path (str): Path to the log directory.
         table_name (str): Name of the cache table.
+        max_size (int): Maximum byte size of the Python cache, 0 for no limit.
+        shard_count (int): Number of independently locked Python cache segments.
+        policy_type (EvictionPolicyType): Eviction policy of the Python cache.
+        batch_size (int): Maximum number of keys a worker processes at once.
+        single_flight (bool): Whether Redis and Memcache misses take a fill lease.
+        lease_ms (int): Fill lease time to live in milliseconds.
+        engine (ReplayEngine): Whether requests are replayed by threads or asyncio tasks.
+        concurrency (int): Number of asyncio worker tasks.
+        prep (bool): Whether the cache flushes the backend before the replay.
+        codec (CodecType): Format of the Redis and Memcache values.
+        compress_threshold (int): Smallest encoded value size compressed with zlib, 0 for none.
+        pool_size (int): Number of Redis or Memcache connections the workers share, 0 for one
+            per thread (or per task up to a limit with asyncio).
+        pg_fast_path (bool): Whether the Postgres cache uses a prepared lookup and fill
+            statement instead of the ORM.
+        coalesce_ms (float): How long concurrent misses are collected into one source query,
+            0 for no coalescing. Not used by the Postgres cache, which reads the source itself.
+        coalesce_keys (int): Number of keys after which a coalesced source query runs.
+        dispatch_chunk (int): Requests handed to a worker at once.
+        affinity (bool): Whether every request of a key goes to the same worker thread.
+        l2_cache_type (CacheType): L2 of the near cache, REDIS or MEMCACHE.
+        l1_size (int): Maximum byte size of the near cache L1, 0 for no limit. The L1 uses
+            shard_count segments and the policy_type eviction policy.
+        l1_ttl_ms (int): Near cache L1 time to live in milliseconds, 0 for no expiry.
+        invalidate (bool): Whether near caches drop the L1 copies of keys other processes
+            write to the L2, through Redis pub/sub.
+        ttl (int): Time to live of cached values in seconds, 0 for no expiry. Passed to
+            Redis as EX and to Memcache as the expire time, the Python cache and the near
+            cache L2 use it too. Not used by the Postgres cache.
+        log_format (str): Request log format, "csv" or "binary".
+        log_buffer_size (int): Records a thread buffers before handing them to the log thread.
+        log_queue_size (int): Full log buffers that can wait before workers block.
+        log_requests (bool): Whether every request is written to the log file.
 
     Returns:
         object: The created cache instance, or None if the cache type is not supported.
 
     Raises:
-        ValueError: If the cache type is not a valid CacheType enum value.
+        ValueError: If the cache type is not a valid CacheType enum value, the asyncio
+            engine is used with a cache type other than Redis or Memcache or with
+            thread_count, batch_size, single_flight, lease_ms, coalesce_ms, coalesce_keys
+            or max_size set, or the near cache L2 is not Redis or Memcache.
     """
     tracefile_name = tracefile_path.split("/")[-1]
+    shared_options = {"log_format": log_format, "log_buffer_size": log_buffer_size,
+                   "log_queue_size": log_queue_size, "log_requests": log_requests,
+                   "dispatch_chunk": dispatch_chunk, "affinity": affinity, "ttl": ttl}
+    if engine == ReplayEngine.ASYNCIO:
+        # the asyncio workers only do plain gets and sets with `concurrency` tasks
+        unsupported = {"thread_count": thread_count != 1, "batch_size": batch_size != 1,
+                       "single_flight": single_flight, "lease_ms": lease_ms != 1000,
+                       "coalesce_ms": coalesce_ms != 0, "coalesce_keys": coalesce_keys != 64,
+                       "max_size": max_size != 0}
+        options_set = [name for name, is_set in unsupported.items() if is_set]
+        if options_set:
+            raise ValueError("The asyncio engine does not support the options: {}".format(
+                options_set))
+        if cache_type == CacheType.REDIS:
+            return AsyncRedisCache(thread_count, tracefile_name, log_dir_path, table_name,
+                                   concurrency=concurrency, prep=prep, codec=codec,
+                                   compress_threshold=compress_threshold,
+                                   pool_size=pool_size, **shared_options)
+        elif cache_type == CacheType.MEMCACHE:
+            return AsyncMemcacheCache(thread_count, tracefile_name, log_dir_path, table_name,
+                                      concurrency=concurrency, prep=prep, codec=codec,
+                                      compress_threshold=compress_threshold,
+                                      pool_size=pool_size, **shared_options)
+        raise ValueError("The asyncio engine supports the cache types: {}".format(
+            [CacheType.REDIS.value, CacheType.MEMCACHE.value]))
+    options = {"batch_size": batch_size, "prep": prep,
+               "coalesce_ms": coalesce_ms, "coalesce_keys": coalesce_keys, **shared_options}
+    if cache_type in [CacheType.REDIS, CacheType.MEMCACHE, CacheType.NEAR_CACHE]:
+        options.update(single_flight=single_flight, lease_ms=lease_ms, codec=codec,
+                       compress_threshold=compress_threshold, pool_size=pool_size)
+    if cache_type == CacheType.NEAR_CACHE:
+        near_options = {"l1_size": l1_size, "l1_ttl_ms": l1_ttl_ms,
+                        "l1_shard_count": shard_count, "l1_policy": policy_type,
+                        "invalidate": invalidate, **options}
+        if l2_cache_type == CacheType.REDIS:
+            return NearRedisCache(thread_count, tracefile_name, log_dir_path, table_name,
+                                  **near_options)
+        elif l2_cache_type == CacheType.MEMCACHE:
+            return NearMemcacheCache(thread_count, tracefile_name, log_dir_path, table_name,
+                                     **near_options)
+        raise ValueError("Invalid near cache L2 type. Supported types are: {}".format(
+            [CacheType.REDIS.value, CacheType.MEMCACHE.value]))
     if cache_type not in [CacheType.SQLALCHEMY, CacheType.REDIS, CacheType.MEMCACHE, CacheType.PYTHON_CACHE]:
         raise ValueError("Invalid cache type. Supported types are: {}".format(
             [t.value for t in CacheType]))
     elif cache_type == CacheType.SQLALCHEMY:
-        return PostgresCache(thread_count, tracefile_name, log_dir_path, table_name)
+        return PostgresCache(thread_count, tracefile_name, log_dir_path, table_name,
+                             fast_path=pg_fast_path, **options)
     elif cache_type == CacheType.REDIS:
-        return RedisCache(thread_count, tracefile_name, log_dir_path, table_name)
+        return RedisCache(thread_count, tracefile_name, log_dir_path, table_name, **options)
     elif cache_type == CacheType.MEMCACHE:
-        return MemcacheCache(thread_count, tracefile_name, log_dir_path, table_name)
+        return MemcacheCache(thread_count, tracefile_name, log_dir_path, table_name, **options)
     elif cache_type == CacheType.PYTHON_CACHE:
-        return PythonCache(thread_count, tracefile_name, log_dir_path, table_name)
+        return PythonCache(thread_count, tracefile_name, log_dir_path, table_name,
+                           max_size=max_size, shard_count=shard_count,
+                           policy_type=policy_type, **options)
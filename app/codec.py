@@ -0,0 +1,139 @@
+"""
+Value codecs shared by the Redis and Memcache caches.
+
+Source values are hex strings of random bytes (see scripts/make_sql_dump.py). The JSON
+codec stores them quoted as before, the raw codec stores the bytes they encode, which
+halves the bytes on the wire, and the pickle codec is there for comparison. Any codec can
+be wrapped in zlib compression for values from a size threshold on.
+"""
+
+import json
+import pickle
+import zlib
+
+from cache_enum import CodecType
+
+# first byte of a zlib wrapped value
+PLAIN = b"\x00"
+COMPRESSED = b"\x01"
+
+
+class Codec:
+    """
+    Base class of the codecs, converts source values to bytes and back.
+    """
+
+    name = None
+
+    def encode(self, value):
+        raise NotImplementedError
+
+    def decode(self, data):
+        raise NotImplementedError
+
+
+class RawCodec(Codec):
+    """
+    Stores the bytes of a hex string value, a missing source value is stored empty.
+    """
+
+    name = CodecType.RAW.value
+
+    def encode(self, value):
+        if value is None:
+            return b""
+        return bytes.fromhex(value)
+
+    def decode(self, data):
+        if not data:
+            return None
+        return data.hex()
+
+
+class JsonCodec(Codec):
+    """
+    Stores the JSON text of a value.
+    """
+
+    name = CodecType.JSON.value
+
+    def encode(self, value):
+        return json.dumps(value).encode()
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class PickleCodec(Codec):
+    """
+    Stores the pickle of a value.
+    """
+
+    name = CodecType.PICKLE.value
+
+    def encode(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+
+class ZlibCodec(Codec):
+    """
+    Compresses the output of another codec when it is at least threshold bytes long.
+
+    A flag byte in front of the data tells whether it was compressed.
+
+    Attributes:
+        inner (Codec): The wrapped codec.
+        threshold (int): Smallest encoded size that is compressed.
+        level (int): zlib compression level.
+    """
+
+    def __init__(self, inner, threshold, level=1):
+        self.inner = inner
+        self.threshold = threshold
+        self.level = level
+        self.name = f"{inner.name}+zlib"
+
+    def encode(self, value):
+        data = self.inner.encode(value)
+        if len(data) >= self.threshold:
+            return COMPRESSED + zlib.compress(data, self.level)
+        return PLAIN + data
+
+    def decode(self, data):
+        if data[:1] == COMPRESSED:
+            return self.inner.decode(zlib.decompress(data[1:]))
+        return self.inner.decode(data[1:])
+
+
+CODECS = {
+    CodecType.RAW: RawCodec,
+    CodecType.JSON: JsonCodec,
+    CodecType.PICKLE: PickleCodec,
+}
+
+
+def create_codec(codec_type=CodecType.JSON, compress_threshold=0):
+    """
+    Creates a codec.
+
+    Parameters:
+    - codec_type (CodecType, optional): The value format. Defaults to JSON.
+    - compress_threshold (int, optional): Smallest encoded size compressed with zlib, 0 for no
+      compression. Defaults to 0.
+
+    Returns:
+    - Codec: The codec.
+
+    Raises:
+    - ValueError: If the codec type is not supported.
+    """
+    if codec_type not in CODECS:
+        raise ValueError("Invalid codec type. Supported types are: {}".format(
+            [t.value for t in CODECS]))
+    codec = CODECS[codec_type]()
+    if compress_threshold > 0:
+        codec = ZlibCodec(codec, compress_threshold)
+    return codec
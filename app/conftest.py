@@ -0,0 +1,187 @@
+import pytest
+from sqlalchemy import create_engine, select, text
+
+import cache
+import memcache_cache
+import redis_cache
+from memcache_cache import MemcacheCache
+from redis_cache import RedisCache
+
+SOURCE_KEYS = 100
+
+
+def source_value(key):
+    """
+    Hex value of a source key, the near cache stores values as the bytes they encode.
+    """
+    return f"{int(key):04x}"
+
+
+@pytest.fixture
+def source_table(tmp_path, monkeypatch):
+    """
+    Points the Cache engine at an SQLite source table with keys 0 to SOURCE_KEYS - 1, so
+    cache classes can be built without a Postgres server.
+
+    Returns:
+    str: Name of the source table.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE source (id INTEGER PRIMARY KEY, orig_key TEXT, orig_value TEXT)"))
+        conn.execute(text("INSERT INTO source (orig_key, orig_value) VALUES (:key, :value)"),
+                     [{"key": str(key), "value": source_value(key)}
+                      for key in range(SOURCE_KEYS)])
+    monkeypatch.setattr(cache, "get_engine", lambda: engine)
+    for module in (cache, redis_cache, memcache_cache):
+        monkeypatch.setattr(module, "fetch_data_many", fetch_data_in)
+    return "source"
+
+
+def fetch_data_in(SourceTable, keys, Session):
+    """
+    fetch_data_many with IN, SQLite has no ANY(array).
+    """
+    session = Session()
+    rows = session.scalars(select(SourceTable).where(SourceTable.orig_key.in_(list(keys)))).all()
+    session.close()
+    return {row.orig_key: row.orig_value for row in rows}
+
+
+class FakeRedisPipeline:
+    def __init__(self, conn):
+        self.conn = conn
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def mset(self, mapping):
+        self.commands.append((self.conn.mset, (mapping,), {}))
+
+    def set(self, key, value, **kwargs):
+        self.commands.append((self.conn.set, (key, value), kwargs))
+
+    def execute(self):
+        results = [command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the redis.Redis commands the cache classes use.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False, px=None):
+        self.round_trips += 1
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def mset(self, mapping):
+        self.round_trips += 1
+        self.data.update(mapping)
+        return True
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def flushall(self):
+        self.data.clear()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Hands every Redis cache worker the same FakeRedis connection.
+
+    Returns:
+    FakeRedis: The shared connection.
+    """
+    conn = FakeRedis()
+    monkeypatch.setattr(RedisCache, "create_connection", lambda self: conn)
+    return conn
+
+
+class FakeMemcache:
+    """
+    In-memory stand-in for the pymemcache client commands the cache classes use.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def get_many(self, keys):
+        self.round_trips += 1
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set(self, key, value, expire=0, noreply=None):
+        self.round_trips += 1
+        self.data[key] = value
+        return True
+
+    def set_many(self, values, expire=0, noreply=None):
+        self.round_trips += 1
+        self.data.update(values)
+        return []
+
+    def add(self, key, value, expire=0, noreply=None):
+        self.round_trips += 1
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def delete(self, key, noreply=None):
+        self.round_trips += 1
+        return self.data.pop(key, None) is not None
+
+    def flush_all(self):
+        self.data.clear()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_memcache(monkeypatch):
+    """
+    Makes FakeMemcache the pooled client Memcache caches share.
+
+    Returns:
+    FakeMemcache: The shared client.
+    """
+    client = FakeMemcache()
+    monkeypatch.setattr(MemcacheCache, "create_pool", lambda self: client)
+    return client
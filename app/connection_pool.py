@@ -0,0 +1,97 @@
+"""
+Shared, bounded connection pools for the Redis and Memcache caches.
+
+Workers block when every connection is checked out instead of opening more, so the thread
+count and the connection count can differ. The time a worker spends waiting for a
+connection is added to a per thread timer, which the request log reads as its own latency
+column.
+"""
+
+import threading
+import time
+
+import redis
+from pymemcache import pool
+from pymemcache.client.base import PooledClient
+
+
+class PoolWaitTimer(threading.local):
+    """
+    Connection checkout time of the current thread since the last take.
+    """
+
+    def __init__(self):
+        self.wait_ns = 0
+
+    def add(self, wait_ns):
+        self.wait_ns += wait_ns
+
+    def take(self):
+        """
+        Returns the checkout time in milliseconds and starts over.
+        """
+        wait_ms = self.wait_ns / 1e6
+        self.wait_ns = 0
+        return wait_ms
+
+
+class TimedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """
+    Redis pool that waits for a free connection and times the wait.
+    """
+
+    def __init__(self, wait_timer, **kwargs):
+        super().__init__(**kwargs)
+        self.wait_timer = wait_timer
+
+    def get_connection(self, *args, **kwargs):
+        stime = time.perf_counter_ns()
+        connection = super().get_connection(*args, **kwargs)
+        self.wait_timer.add(time.perf_counter_ns() - stime)
+        return connection
+
+
+class BlockingObjectPool(pool.ObjectPool):
+    """
+    pymemcache object pool that waits for a free client instead of raising when all
+    max_size clients are in use, and times the wait.
+    """
+
+    def __init__(self, obj_creator, wait_timer, max_size, **kwargs):
+        super().__init__(obj_creator, max_size=max_size, **kwargs)
+        self.wait_timer = wait_timer
+        self.free_slots = threading.BoundedSemaphore(max_size)
+
+    def get(self):
+        stime = time.perf_counter_ns()
+        self.free_slots.acquire()
+        try:
+            obj = super().get()
+        except Exception:
+            self.free_slots.release()
+            raise
+        self.wait_timer.add(time.perf_counter_ns() - stime)
+        return obj
+
+    def destroy(self, obj, silent=True):
+        super().destroy(obj, silent)
+        self.free_slots.release()
+
+    def release(self, obj, silent=True):
+        super().release(obj, silent)
+        self.free_slots.release()
+
+
+class BlockingPooledClient(PooledClient):
+    """
+    pymemcache PooledClient on a BlockingObjectPool.
+    """
+
+    def __init__(self, server, wait_timer, max_pool_size, **kwargs):
+        super().__init__(server, max_pool_size=max_pool_size, **kwargs)
+        self.client_pool = BlockingObjectPool(
+            self._create_client,
+            wait_timer,
+            max_pool_size,
+            after_remove=lambda client: client.close(),
+        )
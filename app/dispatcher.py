@@ -0,0 +1,162 @@
+"""
+Chunked dispatch of trace requests to the worker threads.
+
+The producer collects requests into chunks and appends each chunk to the queue of one
+worker: the one with the fewest queued chunks or, with key affinity, the one owning the key,
+so every request of a key is processed in trace order by the same worker. Workers take a
+whole chunk at a time, paying for one synchronisation per chunk instead of one per request.
+close appends an end of trace sentinel to every queue, so workers stop as soon as their
+queue drains instead of after an idle timeout.
+
+The worker queues and the free slot tokens that bound the queued chunks are SimpleQueues,
+deques whose blocking get is implemented in C, which keeps dispatching cheap even when the
+open loop replay sends every request as a chunk of its own.
+"""
+
+import queue
+import time
+import zlib
+from collections import deque
+
+
+class Dispatcher:
+    """
+    Per worker chunk queues fed by a single producer thread.
+
+    Attributes:
+    worker_count (int): Number of workers taking chunks.
+    chunk_size (int): Requests per chunk.
+    affinity (bool): Whether a key always goes to the same worker.
+    chunks (int): Chunks dispatched.
+    requests (int): Requests dispatched.
+    producer_waits (int): Chunks the producer had to wait for a free slot for.
+    producer_wait_ns (int): Time the producer waited for free slots.
+    worker_wait_ns (list): Time each worker waited for a chunk.
+    """
+
+    def __init__(self, worker_count, chunk_size=64, affinity=False, max_chunks=0):
+        """
+        Parameters:
+        worker_count (int): Number of workers taking chunks.
+        chunk_size (int): Requests per chunk.
+        affinity (bool): Whether to send a key to the same worker every time.
+        max_chunks (int): Chunks that can be queued before the producer blocks, 0 for four
+            per worker.
+
+        Raises:
+        ValueError: If worker_count or chunk_size is less than 1.
+        """
+        if worker_count < 1 or chunk_size < 1:
+            raise ValueError("worker_count and chunk_size must be at least 1")
+        self.worker_count = worker_count
+        self.chunk_size = chunk_size
+        self.affinity = affinity
+        self.queues = [queue.SimpleQueue() for _ in range(worker_count)]
+        # requests a worker put back, taken before its next chunk
+        self.retries = [deque() for _ in range(worker_count)]
+        # one token per chunk that may be queued, the producer blocks while none is left
+        self.slots = queue.SimpleQueue()
+        for _ in range(max_chunks or 4 * worker_count):
+            self.slots.put(None)
+        # chunks being filled, one per worker with affinity
+        self.pending = [[] for _ in range(worker_count if affinity else 1)]
+        self.chunks = 0
+        self.requests = 0
+        self.producer_waits = 0
+        self.producer_wait_ns = 0
+        self.worker_wait_ns = [0] * worker_count
+
+    def put(self, key, count):
+        """
+        Adds a request to the chunk being filled, dispatching the chunk once it is full.
+        """
+        index = zlib.crc32(key.encode()) % self.worker_count if self.affinity else 0
+        chunk = self.pending[index]
+        chunk.append((key, count))
+        if len(chunk) >= self.chunk_size:
+            self.pending[index] = []
+            self.dispatch(chunk, index if self.affinity else None)
+
+    def flush(self):
+        """
+        Dispatches the chunks being filled without waiting for them to fill up.
+        """
+        for index, chunk in enumerate(self.pending):
+            if chunk:
+                self.pending[index] = []
+                self.dispatch(chunk, index if self.affinity else None)
+
+    def dispatch(self, chunk, worker=None):
+        try:
+            self.slots.get_nowait()
+        except queue.Empty:
+            stime = time.perf_counter_ns()
+            self.slots.get()
+            self.producer_waits += 1
+            self.producer_wait_ns += time.perf_counter_ns() - stime
+        if worker is None:
+            worker = 0
+            if self.worker_count > 1:
+                worker = min(range(self.worker_count), key=lambda index: self.queues[index].qsize())
+        self.queues[worker].put(chunk)
+        self.chunks += 1
+        self.requests += len(chunk)
+
+    def retry(self, worker, key, count):
+        """
+        Queues a request again ahead of the next chunk of a worker, to be called by that
+        worker while it processes the request.
+        """
+        self.retries[worker].append((key, count))
+
+    def close(self):
+        """
+        Dispatches the remaining requests and the end of trace sentinel of every worker.
+        """
+        self.flush()
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+
+    def get_chunk(self, worker):
+        """
+        Waits for the next chunk of a worker.
+
+        Returns:
+        list: (key, count) tuples, None once the trace ended.
+        """
+        retries = self.retries[worker]
+        if retries:
+            return [retries.popleft()]
+        worker_queue = self.queues[worker]
+        try:
+            chunk = worker_queue.get_nowait()
+        except queue.Empty:
+            stime = time.perf_counter_ns()
+            chunk = worker_queue.get()
+            self.worker_wait_ns[worker] += time.perf_counter_ns() - stime
+        if chunk is not None:
+            self.slots.put(None)
+        return chunk
+
+    def worker_chunks(self, worker):
+        """
+        Yields the chunks of a worker until the end of the trace.
+        """
+        while True:
+            chunk = self.get_chunk(worker)
+            if chunk is None:
+                return
+            yield chunk
+
+    def stats(self):
+        """
+        Returns:
+        dict: Chunks and requests dispatched, mean chunk size, producer waits for a free
+        slot and their time in ms, and the total time workers waited for chunks in ms.
+        """
+        return {"chunks": self.chunks,
+                "requests": self.requests,
+                "mean_chunk": self.requests / max(1, self.chunks),
+                "producer_waits": self.producer_waits,
+                "producer_wait_ms": self.producer_wait_ns / 1e6,
+                "worker_wait_ms": sum(self.worker_wait_ns) / 1e6}
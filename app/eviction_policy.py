@@ -0,0 +1,789 @@
+"""
+Eviction policies for the byte bounded LRUCache.
+
+A policy owns the replacement order of the cache entries while LRUCache owns the
+key lookup and the byte accounting. LRUCache inserts a new entry first and then asks
+the policy for victims until the cache fits its byte limit again, so a policy may
+also reject the entry it was just given.
+
+Policies:
+- LRUPolicy: least recently used.
+- ARCPolicy: adaptive replacement cache, balances recency and frequency with ghost lists.
+- TwoQPolicy: 2Q, a FIFO probation queue in front of a main LRU.
+- ClockPolicy: second chance FIFO, a hit only sets a bit.
+- SievePolicy: SIEVE, a FIFO with a moving hand, a hit only sets a bit.
+- WTinyLFUPolicy: window LRU and segmented main LRU behind a frequency admission filter.
+- GDSFPolicy: GreedyDual-Size-Frequency, prefers evicting large and rarely used entries.
+"""
+
+import heapq
+import itertools
+from collections import OrderedDict
+
+from cache_enum import EvictionPolicyType
+from frequency_sketch import CountMinSketch
+
+
+class LRUEntry:
+    """
+    A cache entry that is also its own node in an LRUList.
+
+    Attributes:
+        key (str): The entry key.
+        value (bytes): The cached value.
+        prev (LRUEntry): The neighbour nearer the front of the list.
+        next (LRUEntry): The neighbour nearer the back of the list.
+        expires (int): perf_counter_ns time the entry expires, 0 if it does not.
+        timer (set): The TimerWheel slot the entry is scheduled in, None if it is not.
+    """
+    __slots__ = ("key", "value", "prev", "next", "expires", "timer")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.prev = None
+        self.next = None
+        self.expires = 0
+        self.timer = None
+
+
+class LRUList:
+    """
+    Intrusive doubly linked list of LRUEntry nodes.
+
+    A sentinel node closes the list into a ring, so linking and unlinking never
+    allocate and never branch on empty ends. The front entry is sentinel.next and
+    the back entry is sentinel.prev.
+
+    Attributes:
+        sentinel (LRUEntry): Ring head, holds no data.
+        size (int): Number of entries in the list.
+    """
+    __slots__ = ("sentinel", "size")
+
+    def __init__(self):
+        self.sentinel = LRUEntry(None, None)
+        self.sentinel.prev = self.sentinel
+        self.sentinel.next = self.sentinel
+        self.size = 0
+
+    def appendleft(self, entry):
+        head = self.sentinel
+        first = head.next
+        entry.prev = head
+        entry.next = first
+        first.prev = entry
+        head.next = entry
+        self.size += 1
+
+    def remove(self, entry):
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+        entry.prev = None
+        entry.next = None
+        self.size -= 1
+
+    def move_to_front(self, entry):
+        head = self.sentinel
+        if head.next is entry:
+            return
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+        first = head.next
+        entry.prev = head
+        entry.next = first
+        first.prev = entry
+        head.next = entry
+
+    def back(self):
+        entry = self.sentinel.prev
+        if entry is self.sentinel:
+            return None
+        return entry
+
+    def pop(self):
+        entry = self.back()
+        if entry is not None:
+            self.remove(entry)
+        return entry
+
+
+class EvictionPolicy:
+    """
+    Base class for eviction policies.
+
+    Attributes:
+        max_size (int): Byte limit of the cache the policy serves.
+        lock_free_hits (bool): True when on_hit only sets a flag on the entry, so hits
+            can be served without taking the cache lock.
+    """
+    lock_free_hits = False
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+    def new_entry(self, key, value):
+        """
+        Creates the entry object the policy keeps its state in.
+        """
+        return LRUEntry(key, value)
+
+    def on_hit(self, entry):
+        """
+        Records a hit on a cached entry.
+        """
+        pass
+
+    def on_miss(self, key):
+        """
+        Records a lookup of a key that is not cached.
+        """
+        pass
+
+    def on_insert(self, entry):
+        """
+        Adds a new entry to the policy.
+        """
+        raise NotImplementedError
+
+    def evict(self):
+        """
+        Picks and removes a victim entry.
+
+        Returns:
+        - LRUEntry: The victim, or None if the policy holds no entries.
+        """
+        raise NotImplementedError
+
+    def remove(self, entry):
+        """
+        Removes an entry that is being replaced or deleted.
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        Returns policy specific counters for reporting.
+        """
+        return {}
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+    Least recently used eviction.
+    """
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.queue = LRUList()
+
+    def on_hit(self, entry):
+        self.queue.move_to_front(entry)
+
+    def on_insert(self, entry):
+        self.queue.appendleft(entry)
+
+    def evict(self):
+        return self.queue.pop()
+
+    def remove(self, entry):
+        self.queue.remove(entry)
+
+    def __len__(self):
+        return self.queue.size
+
+
+class ARCEntry(LRUEntry):
+    """
+    LRUEntry that knows whether it is in ARC's frequency list.
+    """
+    __slots__ = ("frequent",)
+
+    def __init__(self, key, value):
+        super().__init__(key, value)
+        self.frequent = False
+
+
+class ARCPolicy(EvictionPolicy):
+    """
+    Adaptive Replacement Cache (Megiddo and Modha) measured in bytes.
+
+    T1 holds entries seen once recently and T2 entries seen at least twice. The ghost
+    lists B1 and B2 remember the keys and sizes evicted from T1 and T2. A miss that hits
+    a ghost list moves the target byte size p of T1 towards the list that would have
+    kept the key.
+
+    Attributes:
+        p (float): Target byte size of T1.
+        t1 (LRUList): Recency list.
+        t2 (LRUList): Frequency list.
+        b1 (OrderedDict): Ghost keys evicted from T1 mapped to their size, oldest first.
+        b2 (OrderedDict): Ghost keys evicted from T2 mapped to their size, oldest first.
+    """
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.p = 0
+        self.t1 = LRUList()
+        self.t2 = LRUList()
+        self.t1_bytes = 0
+        self.t2_bytes = 0
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        self.b1_bytes = 0
+        self.b2_bytes = 0
+        self.incoming = None
+        self.incoming_from_b2 = False
+        self.ghost_hits = 0
+
+    def new_entry(self, key, value):
+        return ARCEntry(key, value)
+
+    def on_hit(self, entry):
+        if entry.frequent:
+            self.t2.move_to_front(entry)
+            return
+        size = len(entry.value)
+        self.t1.remove(entry)
+        self.t1_bytes -= size
+        entry.frequent = True
+        self.t2.appendleft(entry)
+        self.t2_bytes += size
+
+    def on_insert(self, entry):
+        key = entry.key
+        size = len(entry.value)
+        self.incoming = entry
+        self.incoming_from_b2 = False
+
+        if key in self.b1:
+            ratio = self.b2_bytes / self.b1_bytes if self.b1_bytes else 1
+            self.p = min(self.max_size, self.p + max(1, ratio) * size)
+            self.b1_bytes -= self.b1.pop(key)
+            entry.frequent = True
+            self.ghost_hits += 1
+        elif key in self.b2:
+            ratio = self.b1_bytes / self.b2_bytes if self.b2_bytes else 1
+            self.p = max(0, self.p - max(1, ratio) * size)
+            self.b2_bytes -= self.b2.pop(key)
+            entry.frequent = True
+            self.incoming_from_b2 = True
+            self.ghost_hits += 1
+
+        if entry.frequent:
+            self.t2.appendleft(entry)
+            self.t2_bytes += size
+        else:
+            self.t1.appendleft(entry)
+            self.t1_bytes += size
+        self.trim_ghosts()
+
+    def evict(self):
+        if self.t1.size == 0 and self.t2.size == 0:
+            return None
+
+        from_t1 = self.t1.size > 0 and (
+            self.t1_bytes > self.p or
+            (self.incoming_from_b2 and self.t1_bytes >= self.p))
+        if self.t2.size == 0:
+            from_t1 = True
+        elif self.t1.size == 0:
+            from_t1 = False
+        elif from_t1 and self.t1.back() is self.incoming:
+            # keep the entry being inserted while the other list has a victim
+            from_t1 = False
+        elif not from_t1 and self.t2.back() is self.incoming:
+            from_t1 = True
+
+        if from_t1:
+            victim = self.t1.pop()
+            size = len(victim.value)
+            self.t1_bytes -= size
+            self.b1[victim.key] = size
+            self.b1_bytes += size
+        else:
+            victim = self.t2.pop()
+            size = len(victim.value)
+            self.t2_bytes -= size
+            self.b2[victim.key] = size
+            self.b2_bytes += size
+        self.trim_ghosts()
+        return victim
+
+    def trim_ghosts(self):
+        # |T1| + |B1| <= c and |T1| + |T2| + |B1| + |B2| <= 2c, in bytes
+        while self.b1 and self.t1_bytes + self.b1_bytes > self.max_size:
+            _, size = self.b1.popitem(last=False)
+            self.b1_bytes -= size
+        total = self.t1_bytes + self.t2_bytes + self.b1_bytes + self.b2_bytes
+        while self.b2 and total > 2 * self.max_size:
+            _, size = self.b2.popitem(last=False)
+            self.b2_bytes -= size
+            total -= size
+
+    def remove(self, entry):
+        size = len(entry.value)
+        if entry.frequent:
+            self.t2.remove(entry)
+            self.t2_bytes -= size
+        else:
+            self.t1.remove(entry)
+            self.t1_bytes -= size
+        if self.incoming is entry:
+            self.incoming = None
+
+    def stats(self):
+        return {"p": int(self.p),
+                "t1_bytes": self.t1_bytes, "t2_bytes": self.t2_bytes,
+                "ghost_hits": self.ghost_hits}
+
+    def __len__(self):
+        return self.t1.size + self.t2.size
+
+
+class TwoQEntry(LRUEntry):
+    """
+    LRUEntry that knows whether it is in 2Q's main LRU queue.
+    """
+    __slots__ = ("in_main",)
+
+    def __init__(self, key, value):
+        super().__init__(key, value)
+        self.in_main = False
+
+
+class TwoQPolicy(EvictionPolicy):
+    """
+    Full 2Q (Johnson and Shasha) measured in bytes.
+
+    New keys enter the A1in FIFO. A hit in A1in does not promote the entry, so a burst of
+    correlated references does not look frequent. Keys evicted from A1in are remembered in
+    the A1out ghost FIFO, and a miss on a remembered key goes straight to the Am LRU.
+
+    Attributes:
+        kin (int): Byte size A1in may grow to before it is evicted from first.
+        kout (int): Byte size of the sizes remembered by A1out.
+        a1in (LRUList): Probation FIFO.
+        am (LRUList): Main LRU.
+        a1out (OrderedDict): Ghost keys evicted from A1in mapped to their size, oldest first.
+    """
+    KIN_RATIO = 0.25
+    KOUT_RATIO = 0.5
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.kin = int(max_size * self.KIN_RATIO)
+        self.kout = int(max_size * self.KOUT_RATIO)
+        self.a1in = LRUList()
+        self.am = LRUList()
+        self.a1in_bytes = 0
+        self.a1out = OrderedDict()
+        self.a1out_bytes = 0
+        self.incoming = None
+
+    def new_entry(self, key, value):
+        return TwoQEntry(key, value)
+
+    def on_hit(self, entry):
+        if entry.in_main:
+            self.am.move_to_front(entry)
+
+    def on_insert(self, entry):
+        self.incoming = entry
+        size = self.a1out.pop(entry.key, None)
+        if size is not None:
+            self.a1out_bytes -= size
+            entry.in_main = True
+            self.am.appendleft(entry)
+        else:
+            self.a1in.appendleft(entry)
+            self.a1in_bytes += len(entry.value)
+
+    def evict(self):
+        from_a1in = self.a1in.size > 0 and (
+            self.a1in_bytes > self.kin or self.am.size == 0)
+        if from_a1in and self.a1in.back() is self.incoming and self.am.size > 0:
+            # keep the entry being inserted while the main queue has a victim
+            from_a1in = False
+        elif not from_a1in and self.am.back() is self.incoming and self.a1in.size > 0:
+            from_a1in = True
+
+        if from_a1in:
+            victim = self.a1in.pop()
+            size = len(victim.value)
+            self.a1in_bytes -= size
+            self.a1out[victim.key] = size
+            self.a1out_bytes += size
+            while self.a1out_bytes > self.kout:
+                _, size = self.a1out.popitem(last=False)
+                self.a1out_bytes -= size
+            return victim
+        return self.am.pop()
+
+    def remove(self, entry):
+        if entry.in_main:
+            self.am.remove(entry)
+        else:
+            self.a1in.remove(entry)
+            self.a1in_bytes -= len(entry.value)
+        if self.incoming is entry:
+            self.incoming = None
+
+    def stats(self):
+        return {"a1in_bytes": self.a1in_bytes, "a1out_keys": len(self.a1out)}
+
+    def __len__(self):
+        return self.a1in.size + self.am.size
+
+
+class ClockEntry(LRUEntry):
+    """
+    LRUEntry with a reference bit.
+    """
+    __slots__ = ("visited",)
+
+    def __init__(self, key, value):
+        super().__init__(key, value)
+        self.visited = False
+
+
+class ClockPolicy(EvictionPolicy):
+    """
+    CLOCK, a FIFO that gives referenced entries a second chance.
+
+    A hit only sets the entry's reference bit. On eviction entries with the bit set are
+    cleared and moved back to the front until an unreferenced entry reaches the back.
+    """
+    lock_free_hits = True
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.queue = LRUList()
+
+    def new_entry(self, key, value):
+        return ClockEntry(key, value)
+
+    def on_hit(self, entry):
+        entry.visited = True
+
+    def on_insert(self, entry):
+        self.queue.appendleft(entry)
+
+    def evict(self):
+        entry = self.queue.back()
+        while entry is not None and entry.visited:
+            entry.visited = False
+            self.queue.move_to_front(entry)
+            entry = self.queue.back()
+        if entry is not None:
+            self.queue.remove(entry)
+        return entry
+
+    def remove(self, entry):
+        self.queue.remove(entry)
+
+    def __len__(self):
+        return self.queue.size
+
+
+class SievePolicy(EvictionPolicy):
+    """
+    SIEVE (Zhang et al.), a FIFO with a hand that sweeps from old to new entries.
+
+    A hit only sets the entry's visited bit. The hand clears visited bits as it passes and
+    evicts the first unvisited entry, leaving survivors where they are, so neither hits
+    nor evictions move entries in the list.
+
+    Attributes:
+        queue (LRUList): Entries, newest at the front.
+        hand (ClockEntry): Next entry to inspect, None to start from the back.
+    """
+    lock_free_hits = True
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.queue = LRUList()
+        self.hand = None
+
+    def new_entry(self, key, value):
+        return ClockEntry(key, value)
+
+    def on_hit(self, entry):
+        entry.visited = True
+
+    def on_insert(self, entry):
+        self.queue.appendleft(entry)
+
+    def evict(self):
+        if self.queue.size == 0:
+            return None
+        sentinel = self.queue.sentinel
+        entry = self.hand if self.hand is not None else sentinel.prev
+        while entry.visited:
+            entry.visited = False
+            entry = entry.prev
+            if entry is sentinel:
+                entry = sentinel.prev
+        self.hand = entry
+        self.remove(entry)
+        return entry
+
+    def remove(self, entry):
+        if self.hand is entry:
+            hand = entry.prev
+            self.hand = hand if hand is not self.queue.sentinel else None
+        self.queue.remove(entry)
+
+    def __len__(self):
+        return self.queue.size
+
+
+class TinyLFUEntry(LRUEntry):
+    """
+    LRUEntry that knows which W-TinyLFU segment it is in.
+    """
+    __slots__ = ("segment",)
+
+    def __init__(self, key, value):
+        super().__init__(key, value)
+        self.segment = WTinyLFUPolicy.WINDOW
+
+
+class WTinyLFUPolicy(EvictionPolicy):
+    """
+    W-TinyLFU (Einziger, Friedman and Manes) measured in bytes.
+
+    New entries go to a small window LRU. Entries pushed out of the window become admission
+    candidates at the front of the main segmented LRU's probation segment. When the cache
+    has to evict, a pending candidate is compared with the main victim using a count-min
+    sketch of recent request frequencies, and the candidate is only kept if it was
+    requested more often. One-hit wonders of a scan therefore evict each other rather than
+    the hot entries in the main segments. A hit in probation promotes the entry to the
+    protected segment.
+
+    Attributes:
+        sketch (CountMinSketch): Request frequencies of cached and uncached keys.
+        window (LRUList): Window LRU.
+        probation (LRUList): Main LRU segment for entries seen once in main.
+        protected (LRUList): Main LRU segment for entries hit in main.
+        candidates (list): Entries moved out of the window since the last insert.
+    """
+    WINDOW, PROBATION, PROTECTED = 0, 1, 2
+    WINDOW_RATIO = 0.01
+    PROTECTED_RATIO = 0.8
+    # sketch width is sized for entries of this many bytes
+    SKETCH_ENTRY_BYTES = 16
+    SKETCH_MAX_WIDTH = 1 << 24
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.window_max = max(1, int(max_size * self.WINDOW_RATIO))
+        self.protected_max = int((max_size - self.window_max) * self.PROTECTED_RATIO)
+        self.window = LRUList()
+        self.probation = LRUList()
+        self.protected = LRUList()
+        self.window_bytes = 0
+        self.protected_bytes = 0
+        self.candidates = []
+        self.sketch = CountMinSketch(
+            min(self.SKETCH_MAX_WIDTH, max(256, max_size // self.SKETCH_ENTRY_BYTES)))
+        self.admitted = 0
+        self.rejected = 0
+
+    def new_entry(self, key, value):
+        return TinyLFUEntry(key, value)
+
+    def on_hit(self, entry):
+        self.sketch.increment(entry.key)
+        if entry.segment == self.WINDOW:
+            self.window.move_to_front(entry)
+        elif entry.segment == self.PROTECTED:
+            self.protected.move_to_front(entry)
+        else:
+            self.probation.remove(entry)
+            entry.segment = self.PROTECTED
+            self.protected.appendleft(entry)
+            self.protected_bytes += len(entry.value)
+            while self.protected_bytes > self.protected_max and self.protected.size > 1:
+                demoted = self.protected.pop()
+                self.protected_bytes -= len(demoted.value)
+                demoted.segment = self.PROBATION
+                self.probation.appendleft(demoted)
+
+    def on_miss(self, key):
+        self.sketch.increment(key)
+
+    def on_insert(self, entry):
+        # candidates that survived the previous insert are admitted
+        self.admitted += len(self.candidates)
+        self.candidates.clear()
+        self.window.appendleft(entry)
+        self.window_bytes += len(entry.value)
+        while self.window_bytes > self.window_max and self.window.size > 0:
+            candidate = self.window.pop()
+            self.window_bytes -= len(candidate.value)
+            candidate.segment = self.PROBATION
+            self.probation.appendleft(candidate)
+            self.candidates.append(candidate)
+
+    def evict(self):
+        victim = self.probation.back()
+        if victim is None:
+            victim = self.protected.back()
+        if victim is None:
+            victim = self.window.back()
+            if victim is not None:
+                self.remove(victim)
+            return victim
+
+        while self.candidates:
+            candidate = self.candidates.pop(0)
+            if candidate is victim:
+                continue
+            if self.sketch.frequency(candidate.key) > self.sketch.frequency(victim.key):
+                self.candidates.insert(0, candidate)
+                break
+            self.rejected += 1
+            self.remove(candidate)
+            return candidate
+
+        self.remove(victim)
+        return victim
+
+    def remove(self, entry):
+        if entry.segment == self.WINDOW:
+            self.window.remove(entry)
+            self.window_bytes -= len(entry.value)
+        elif entry.segment == self.PROTECTED:
+            self.protected.remove(entry)
+            self.protected_bytes -= len(entry.value)
+        else:
+            self.probation.remove(entry)
+            if entry in self.candidates:
+                self.candidates.remove(entry)
+
+    def stats(self):
+        return {"admitted": self.admitted, "rejected": self.rejected,
+                "sketch_bytes": self.sketch.memory_bytes(),
+                "sketch_ops": self.sketch.ops,
+                "sketch_ns": self.sketch.elapsed_ns,
+                "sketch_resets": self.sketch.resets}
+
+    def __len__(self):
+        return self.window.size + self.probation.size + self.protected.size
+
+
+class GDSFEntry(LRUEntry):
+    """
+    LRUEntry with a GreedyDual-Size-Frequency priority.
+    """
+    __slots__ = ("frequency", "priority", "live")
+
+    def __init__(self, key, value):
+        super().__init__(key, value)
+        self.frequency = 1
+        self.priority = 0.0
+        self.live = True
+
+
+class GDSFPolicy(EvictionPolicy):
+    """
+    GreedyDual-Size-Frequency (Cherkasova) with a uniform fetch cost.
+
+    An entry's priority is L + frequency / size, where the inflation value L is the
+    priority of the last evicted entry, so entries that are not hit again age relative to
+    newer ones. The lowest priority entry is evicted, which keeps many small hot values
+    instead of one large cold one.
+
+    Priorities live in a binary heap. An update pushes a new heap item and leaves the old
+    one behind; stale items are skipped when popped and the heap is rebuilt when stale
+    items outnumber live ones, so updates and evictions are amortized O(log n).
+
+    Attributes:
+        inflation (float): The aging value L.
+        heap (list): (priority, sequence, entry) items, some of them stale.
+    """
+    COMPACT_MIN = 1024
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self.inflation = 0.0
+        self.heap = []
+        self.sequence = itertools.count()
+        self.count = 0
+        self.compactions = 0
+
+    def new_entry(self, key, value):
+        return GDSFEntry(key, value)
+
+    def push(self, entry):
+        entry.priority = self.inflation + entry.frequency / max(1, len(entry.value))
+        heapq.heappush(self.heap, (entry.priority, next(self.sequence), entry))
+        if len(self.heap) > max(self.COMPACT_MIN, 2 * self.count):
+            self.compact()
+
+    def compact(self):
+        self.heap = [item for item in self.heap
+                     if item[2].live and item[0] == item[2].priority]
+        heapq.heapify(self.heap)
+        self.compactions += 1
+
+    def on_hit(self, entry):
+        entry.frequency += 1
+        self.push(entry)
+
+    def on_insert(self, entry):
+        self.count += 1
+        self.push(entry)
+
+    def evict(self):
+        while self.heap:
+            priority, _, entry = heapq.heappop(self.heap)
+            if entry.live and priority == entry.priority:
+                self.inflation = priority
+                entry.live = False
+                self.count -= 1
+                return entry
+        return None
+
+    def remove(self, entry):
+        # the heap item goes stale and is dropped when popped or compacted
+        entry.live = False
+        self.count -= 1
+
+    def stats(self):
+        return {"heap_items": len(self.heap), "compactions": self.compactions}
+
+    def __len__(self):
+        return self.count
+
+
+POLICIES = {
+    EvictionPolicyType.LRU: LRUPolicy,
+    EvictionPolicyType.ARC: ARCPolicy,
+    EvictionPolicyType.TWO_Q: TwoQPolicy,
+    EvictionPolicyType.CLOCK: ClockPolicy,
+    EvictionPolicyType.SIEVE: SievePolicy,
+    EvictionPolicyType.W_TINYLFU: WTinyLFUPolicy,
+    EvictionPolicyType.GDSF: GDSFPolicy,
+}
+
+
+def create_policy(policy_type, max_size):
+    """
+    Creates an eviction policy.
+
+    Parameters:
+    - policy_type (EvictionPolicyType): The policy to create.
+    - max_size (int): Byte limit of the cache the policy serves.
+
+    Returns:
+    - EvictionPolicy: The created policy.
+    """
+    if policy_type not in POLICIES:
+        raise ValueError("Invalid eviction policy. Supported policies are: {}".format(
+            [p.value for p in POLICIES]))
+    return POLICIES[policy_type](max_size)
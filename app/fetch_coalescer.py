@@ -0,0 +1,110 @@
+"""
+Coalescing of source table fetches across concurrent misses.
+
+Workers that miss at about the same time hand their keys to a shared FetchCoalescer, which
+collects them for a short window (or until a batch is full) and fetches the batch with a
+single query. Identical keys share one fetch, including keys whose batch is already being
+fetched. There is no dispatcher thread: the worker that opens a batch waits out the window
+and runs the query for everyone in it.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class FetchCoalescer:
+    """
+    Batches single key fetches into multi key fetches.
+
+    Attributes:
+        fetch_many (callable): Fetches a list of keys, returns a dict of the values found.
+        window_secs (float): How long a batch collects keys.
+        max_keys (int): Batch size that is fetched without waiting out the window.
+        requests (int): Number of fetch calls.
+        queries (int): Number of fetch_many calls.
+        keys_fetched (int): Number of keys fetched.
+        deduped (int): Fetch calls that shared the fetch of another call.
+    """
+
+    def __init__(self, fetch_many, window_ms=2, max_keys=64):
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.fetch_many = fetch_many
+        self.window_secs = window_ms / 1000
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        # key -> Future of the batch fetching it, until the batch finished
+        self.pending = {}
+        # keys and full event of the batch that still takes keys
+        self.open_batch = None
+        self.requests = 0
+        self.queries = 0
+        self.keys_fetched = 0
+        self.deduped = 0
+
+    def fetch(self, key):
+        """
+        Fetches the value of a key together with the keys other workers fetch meanwhile.
+
+        Returns:
+        - any: The value, or None if the key is not in the source table.
+        """
+        leader_batch = None
+        with self.lock:
+            self.requests += 1
+            future = self.pending.get(key)
+            if future is not None:
+                self.deduped += 1
+            else:
+                future = Future()
+                self.pending[key] = future
+                if self.open_batch is None:
+                    self.open_batch = ([], threading.Event())
+                    leader_batch = self.open_batch
+                keys, full = self.open_batch
+                keys.append(key)
+                if len(keys) >= self.max_keys:
+                    full.set()
+                    self.open_batch = None
+
+        if leader_batch is not None:
+            self.run_batch(leader_batch)
+        return future.result()
+
+    def run_batch(self, batch):
+        """
+        Waits until the batch is full or the window ran out and fetches it.
+        """
+        keys, full = batch
+        full.wait(self.window_secs)
+        with self.lock:
+            if self.open_batch is batch:
+                self.open_batch = None
+            futures = [self.pending[key] for key in keys]
+
+        try:
+            values = self.fetch_many(keys)
+        except Exception as ex:
+            values = None
+            for future in futures:
+                future.set_exception(ex)
+        if values is not None:
+            for key, future in zip(keys, futures):
+                future.set_result(values.get(key))
+
+        with self.lock:
+            self.queries += 1
+            self.keys_fetched += len(keys)
+            for key in keys:
+                del self.pending[key]
+
+    def stats(self):
+        """
+        Returns:
+        - dict: Fetch calls, queries, keys fetched, deduplicated calls and mean batch size.
+        """
+        return {"requests": self.requests,
+                "queries": self.queries,
+                "keys": self.keys_fetched,
+                "deduped": self.deduped,
+                "mean_batch": self.keys_fetched / max(1, self.queries)}
@@ -0,0 +1,110 @@
+"""
+Count-min sketch used to estimate how often keys were requested.
+
+Counters are single bytes saturating at 15 (the 4 bit counters of TinyLFU stored a byte
+each, which keeps updates to plain bytearray indexing). After a sample of additions every
+counter is halved, so old popularity fades and the sketch follows the current workload.
+"""
+
+import time
+
+DEPTH = 4
+MAX_COUNT = 15
+# translate table that halves every counter in one pass
+HALVE_TABLE = bytes(i >> 1 for i in range(256))
+
+
+class CountMinSketch:
+    """
+    Count-min sketch with four rows, saturating counters and periodic aging.
+
+    The four row indexes are derived from one key hash by double hashing (the low bits
+    plus multiples of an odd step taken from the high bits), unrolled so an access costs
+    a hash and a handful of integer operations.
+
+    Attributes:
+        width (int): Counters per row, a power of two.
+        table (bytearray): DEPTH * width counters, one row after the other.
+        sample_size (int): Additions between two agings.
+        additions (int): Additions since the last aging.
+        resets (int): Number of agings so far.
+        ops (int): Number of increments and estimates.
+        elapsed_ns (int): Time spent in increments and estimates.
+    """
+
+    def __init__(self, expected_entries, sample_factor=10):
+        width = 1
+        while width < expected_entries:
+            width <<= 1
+        self.width = width
+        self.mask = width - 1
+        self.row1 = width
+        self.row2 = 2 * width
+        self.row3 = 3 * width
+        self.table = bytearray(DEPTH * width)
+        self.sample_size = sample_factor * width
+        self.additions = 0
+        self.resets = 0
+        self.ops = 0
+        self.elapsed_ns = 0
+
+    def indexes(self, key):
+        h = hash(key)
+        mask = self.mask
+        # keep every intermediate value small so it stays a single digit int
+        low = h & mask
+        step = ((h >> 40) & mask) | 1
+        return (low,
+                self.row1 + ((low + step) & mask),
+                self.row2 + ((low + 2 * step) & mask),
+                self.row3 + ((low + 3 * step) & mask))
+
+    def increment(self, key):
+        """
+        Counts one request for a key, aging the sketch when the sample is full.
+        """
+        stime = time.perf_counter_ns()
+        table = self.table
+        i0, i1, i2, i3 = self.indexes(key)
+        c0, c1, c2, c3 = table[i0], table[i1], table[i2], table[i3]
+        if min(c0, c1, c2, c3) < MAX_COUNT:
+            if c0 < MAX_COUNT:
+                table[i0] = c0 + 1
+            if c1 < MAX_COUNT:
+                table[i1] = c1 + 1
+            if c2 < MAX_COUNT:
+                table[i2] = c2 + 1
+            if c3 < MAX_COUNT:
+                table[i3] = c3 + 1
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self.reset()
+        self.ops += 1
+        self.elapsed_ns += time.perf_counter_ns() - stime
+
+    def frequency(self, key):
+        """
+        Estimates how often a key was requested.
+
+        Returns:
+        - int: The smallest counter of the key, never below the true recent count unless
+          the key saturated or was aged.
+        """
+        stime = time.perf_counter_ns()
+        table = self.table
+        i0, i1, i2, i3 = self.indexes(key)
+        count = min(table[i0], table[i1], table[i2], table[i3])
+        self.ops += 1
+        self.elapsed_ns += time.perf_counter_ns() - stime
+        return count
+
+    def reset(self):
+        """
+        Halves every counter.
+        """
+        self.table = bytearray(self.table.translate(HALVE_TABLE))
+        self.additions //= 2
+        self.resets += 1
+
+    def memory_bytes(self):
+        return len(self.table)
@@ -0,0 +1,110 @@
+"""
+Log bucketed latency histograms in the style of HdrHistogram.
+
+Values below 2 ** SUB_BUCKET_BITS nanoseconds get a bucket each. Above that every power of
+two range is split into 2 ** (SUB_BUCKET_BITS - 1) equal buckets, so a recorded value is
+known to within 1 / 2 ** (SUB_BUCKET_BITS - 1) of itself (under 1% with 8 bits) from
+nanoseconds up to MAX_NS in a few thousand counters. Recording is an index computation and
+an array increment, histograms of different threads are merged by adding their counters.
+"""
+
+from array import array
+
+SUB_BUCKET_BITS = 8
+HALF_COUNT = 1 << (SUB_BUCKET_BITS - 1)
+# larger values are counted as MAX_NS, about 18 minutes
+MAX_NS = 1 << 40
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(value):
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    if shift <= 0:
+        return value
+    return shift * HALF_COUNT + (value >> shift)
+
+
+def bucket_value(index):
+    """
+    Middle of the range of values counted in a bucket.
+    """
+    if index < 2 * HALF_COUNT:
+        return index
+    shift = index // HALF_COUNT - 1
+    low = (index - shift * HALF_COUNT) << shift
+    return low + ((1 << shift) >> 1)
+
+
+BUCKET_COUNT = bucket_index(MAX_NS) + 1
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies in nanoseconds.
+
+    Attributes:
+        counts (array): Count per bucket.
+        count (int): Number of recorded values.
+        total (int): Sum of the recorded values.
+        max (int): Largest recorded value.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = array('q', [0]) * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        if value > MAX_NS:
+            value = MAX_NS
+        elif value < 0:
+            value = 0
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Adds the values of another histogram to this one.
+        """
+        counts = self.counts
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """
+        Returns:
+        - int: The value at or below which percent of the recorded values lie, 0 when empty.
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / max(1, self.count)
+
+    def summary(self):
+        """
+        Returns:
+        - str: Count, mean, percentiles and max in milliseconds.
+        """
+        parts = [f"count {self.count}", f"mean {self.mean() / 1e6:.4f}"]
+        for percent in PERCENTILES:
+            parts.append(f"p{percent:g} {self.percentile(percent) / 1e6:.4f}")
+        parts.append(f"max {self.max / 1e6:.4f}")
+        return " ".join(parts)
@@ -0,0 +1,154 @@
+"""
+Open loop replay at a target request rate.
+
+The closed loop replay of app.py queues keys as fast as the workers take them, so a
+saturated cache only slows the producer down and the time requests would have waited never
+shows up in the latencies (coordinated omission). Here every request gets a due time from a
+fixed or Poisson arrival schedule, the producer sends it no earlier than that, and the
+cache measures its latency from the due time. A request that waits behind a backlog, in the
+key queue or because the producer itself was blocked, is charged for the wait.
+
+rate_sweep replays the trace at increasing rates and reports the highest rate whose p99
+latency stays within an SLO.
+"""
+
+import csv
+import random
+import time
+
+ARRIVALS = ("fixed", "poisson")
+SWEEP_HEADER = ["cache_type", "rate", "requests", "achieved_per_sec", "p50_ms", "p99_ms",
+                "max_ms", "late_sends", "max_lag_ms", "within_slo"]
+
+
+def arrival_offsets(rate, arrival="fixed", seed=0):
+    """
+    Yields the due times of successive requests in nanoseconds from the start.
+
+    Parameters:
+    rate (float): Requests per second.
+    arrival (str): "fixed" for evenly spaced requests, "poisson" for exponentially
+        distributed gaps with the same mean.
+    seed (int): Seed of the Poisson gaps.
+    """
+    if rate <= 0:
+        raise ValueError("rate must be greater than 0")
+    if arrival not in ARRIVALS:
+        raise ValueError("Invalid arrival process. Supported processes are: {}".format(ARRIVALS))
+    if arrival == "fixed":
+        gap_ns = 1e9 / rate
+        count = 0
+        while True:
+            yield int(count * gap_ns)
+            count += 1
+    rng = random.Random(seed)
+    offset = 0.0
+    while True:
+        yield int(offset)
+        offset += rng.expovariate(rate) * 1e9
+
+
+def feed_open_loop(cache, keys, rate, arrival="fixed", seed=0):
+    """
+    Queues keys at their due times and registers the due times with the cache.
+
+    Parameters:
+    cache (Cache): Cache whose workers process the keys.
+    keys (iterable): Keys in trace order.
+    rate (float): Requests per second.
+    arrival (str): Arrival process, see arrival_offsets.
+    seed (int): Seed of the Poisson gaps.
+
+    Returns:
+    dict: Requests sent, sends more than a millisecond late and the largest lag in ms.
+    """
+    sent = late = 0
+    max_lag_ns = 0
+    start_ns = time.perf_counter_ns()
+    for count, (key, due_offset) in enumerate(zip(keys, arrival_offsets(rate, arrival, seed)), 1):
+        due_ns = start_ns + due_offset
+        wait_ns = due_ns - time.perf_counter_ns()
+        if wait_ns > 0:
+            time.sleep(wait_ns / 1e9)
+        cache.scheduled_ns[count] = due_ns
+        # sent on its own, a chunk would hold the request until later ones are due
+        cache.dispatcher.put(key, count)
+        cache.dispatcher.flush()
+        lag_ns = time.perf_counter_ns() - due_ns
+        if lag_ns > 1_000_000:
+            late += 1
+        max_lag_ns = max(max_lag_ns, lag_ns)
+        sent += 1
+    return {"sent": sent, "late": late, "max_lag_ms": max_lag_ns / 1e6}
+
+
+def label_rate(cache, rate):
+    """
+    Adds the request rate to the log label of a cache, so logs of different rates differ.
+    """
+    rate_label = f"r{rate:g}"
+    cache.log_label = f"{cache.log_label}-{rate_label}" if cache.log_label else rate_label
+    return cache
+
+
+def sustainable_rate(rows, slo_ms):
+    """
+    Returns:
+    float: The highest rate before the first one whose p99 exceeds slo_ms, None when even
+    the lowest rate misses the SLO.
+    """
+    best = None
+    for row in sorted(rows, key=lambda row: row["rate"]):
+        if row["p99_ms"] > slo_ms:
+            break
+        best = row["rate"]
+    return best
+
+
+def rate_sweep(create, keys, rates, slo_ms, arrival="fixed", seed=0):
+    """
+    Replays keys open loop at each rate with a fresh cache, stopping after the first rate
+    whose p99 exceeds the SLO.
+
+    Parameters:
+    create (callable): Returns a new cache for a rate.
+    keys (list): Keys in trace order.
+    rates (list): Request rates to try, in increasing order.
+    slo_ms (float): p99 latency objective in milliseconds.
+    arrival (str): Arrival process, see arrival_offsets.
+    seed (int): Seed of the Poisson gaps.
+
+    Returns:
+    list: One dict per rate tried, with the SWEEP_HEADER fields except cache_type.
+    """
+    rows = []
+    for rate in sorted(rates):
+        cache = create(rate)
+        send_stats = feed_open_loop(cache, keys, rate, arrival, seed)
+        cache.close()
+        _, _, all_histogram, secs = cache.latency_histograms()
+        row = {"rate": rate,
+               "requests": all_histogram.count,
+               "achieved_per_sec": round(all_histogram.count / max(secs, 1e-9), 4),
+               "p50_ms": all_histogram.percentile(50) / 1e6,
+               "p99_ms": all_histogram.percentile(99) / 1e6,
+               "max_ms": all_histogram.max / 1e6,
+               "late_sends": send_stats["late"],
+               "max_lag_ms": round(send_stats["max_lag_ms"], 4),
+               "within_slo": all_histogram.percentile(99) / 1e6 <= slo_ms}
+        rows.append(row)
+        print("rate_sweep", f"rate {rate}", f"achieved {row['achieved_per_sec']}",
+              f"p99_ms {row['p99_ms']:.4f}", f"within_slo {row['within_slo']}")
+        if not row["within_slo"]:
+            break
+    return rows
+
+
+def write_sweep(rows, csv_path):
+    """
+    Writes rate sweep rows of one or more cache types to a csv file.
+    """
+    with open(csv_path, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=SWEEP_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -2,16 +2,18 @@
 Memcache cache class for caching data.
 """
 
-from pymemcache.client.base import Client
 
 import random
-import json
+import math
 import os
 import time
 
 from cache import Cache
 from cache_enum import CacheType
-from postgres_db import fetch_data_auto
+from connection_pool import BlockingPooledClient
+from postgres_db import fetch_data_many
+
+LEASE_PREFIX = "lease:"
 
 
 class MemcacheCache(Cache):
@@ -24,7 +26,7 @@ class MemcacheCache(Cache):
     log_dir_path (str): Path to the log directory.
     table_name (str): Name of the cache table.
     """
-    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name):
+    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name, **kwargs):
         """
         Initializes the Memcache cache instance.
         
@@ -33,26 +35,42 @@ class MemcacheCache(Cache):
         trace_file_name (str): Name of the trace file.
         log_dir_path (str): Path to the log directory.
         table_name (str): Name of the cache table.
+        kwargs: Options passed on to Cache.
         """
-        super().__init__(thread_count, trace_file_name, log_dir_path, table_name)
+        super().__init__(thread_count, trace_file_name, log_dir_path, table_name, **kwargs)
         self.cache_type = CacheType.MEMCACHE
+        # one pooled client of pool_size connections shared by all workers
+        self.client = self.create_pool()
 
-        self.prep_cache()
+        if self.prep:
+            self.prep_cache()
 
         self.worker_threads()
 
-    def create_connection(self):
+    def create_pool(self):
         """
-        Creates a connection to the Memcache server.
-        
+        Creates the pooled client shared by the workers.
+
+        Workers wait for a free connection when all pool_size connections are in use.
+
         Returns:
-        Client: A Memcache client object.
+        BlockingPooledClient: A pooled Memcache client object.
         """
         MEMCACHED_HOSTNAME = os.getenv('MEMCACHED_HOSTNAME')
         MEMCACHED_PORT = os.getenv('MEMCACHED_PORT')
 
         # print(MEMCACHED_HOSTNAME, MEMCACHED_PORT)
-        return Client((MEMCACHED_HOSTNAME, MEMCACHED_PORT))
+        return BlockingPooledClient((MEMCACHED_HOSTNAME, MEMCACHED_PORT), self.pool_wait,
+                                    self.pool_size)
+
+    def create_connection(self):
+        """
+        Creates a connection to the Memcache server.
+        
+        Returns:
+        BlockingPooledClient: The shared pooled Memcache client object.
+        """
+        return self.client
 
     @staticmethod
     def close_connection(conn):
@@ -72,6 +90,51 @@ class MemcacheCache(Cache):
         conn.flush_all()
         conn.close()
 
+    def bulk_load(self, keys):
+        """
+        Stores warm-up values with set_many, which sends a batch as one pipelined request.
+
+        Returns:
+        int: Number of values stored.
+        """
+        loaded = 0
+        for batch in self.warmup_batches(keys):
+            failed = self.client.set_many(
+                {key: self.codec.encode(value) for key, value in batch.items()},
+                expire=self.ttl)
+            loaded += len(batch) - len(failed)
+        return loaded
+
+    def lookup_value(self, conn, key, threadNumber):
+        """
+        Gets a value for a single flight waiter.
+        """
+        value = conn.get(key)
+        if value is None:
+            return None
+        return self.decode_value(value, threadNumber)
+
+    def store_value(self, conn, key, value, threadNumber):
+        """
+        Sets a value after a single flight fetch.
+        """
+        conn.set(key, self.encode_value(value, threadNumber), expire=self.ttl)
+
+    def acquire_lease(self, conn, key):
+        """
+        Takes the fill lease with add, which only stores a key that does not exist.
+
+        Memcached expiry has a resolution of seconds, so the lease lasts at least one second.
+        """
+        expire = max(1, math.ceil(self.lease_ms / 1000))
+        return conn.add(LEASE_PREFIX + key, b"1", expire=expire, noreply=False)
+
+    def release_lease(self, conn, key):
+        """
+        Gives up the fill lease.
+        """
+        conn.delete(LEASE_PREFIX + key, noreply=False)
+
     def process_key(self, conn, key, count, threadNumber):
         """
         Processes a cache key.
@@ -82,12 +145,62 @@ class MemcacheCache(Cache):
         count (int): Count to process.
         threadNumber (int): Thread number.
         """
-        stime = time.time()
+        stime = time.perf_counter_ns()
         value = conn.get(key)
-        if value:
-            value = json.loads(value)
+        if value is not None:
+            value = self.decode_value(value, threadNumber)
             self.log_cache(threadNumber, count, stime, key, value, True, False)
+        elif self.single_flight:
+            value = self.lease_fetch(conn, key, threadNumber)
+            self.log_cache(threadNumber, count, stime, key, value, False, False)
         else:
-            value = fetch_data_auto(self.SourceTable, key, None, self.Session)
-            conn.set(key, json.dumps(value))
+            value = self.fetch_source(key)
+            conn.set(key, self.encode_value(value, threadNumber), expire=self.ttl)
             self.log_cache(threadNumber, count, stime, key, value, False, False)
+
+    def process_batch(self, conn, items, threadNumber):
+        """
+        Processes a batch of cache keys with one get_many and one set_many.
+
+        Every request is timed from the start of the batch, hits until get_many returns
+        and misses until their values are fetched and written back. A key that misses more
+        than once in a batch is fetched once, its repeats are logged as hits.
+
+        Parameters:
+        conn (Client): Memcache client object.
+        items (list): (key, count) tuples to process.
+        threadNumber (int): Thread number.
+        """
+        stime = time.perf_counter_ns()
+        values = conn.get_many([key for key, _ in items])
+        misses = []
+        for key, count in items:
+            value = values.get(key)
+            if value is not None:
+                self.log_cache(threadNumber, count, stime, key,
+                               self.decode_value(value, threadNumber), True, False)
+            else:
+                misses.append((key, count))
+
+        if not misses:
+            return
+
+        misses, repeats = self.split_repeats(misses)
+        if self.single_flight:
+            # leases are per key, so misses are filled one at a time
+            fetched = {}
+            for key, count in misses:
+                fetched[key] = self.lease_fetch(conn, key, threadNumber)
+                self.log_cache(threadNumber, count, stime, key, fetched[key], False, False)
+        else:
+            fetched = fetch_data_many(self.SourceTable, [key for key, _ in misses], self.Session)
+            if fetched:
+                conn.set_many({key: self.encode_value(value, threadNumber)
+                               for key, value in fetched.items()}, expire=self.ttl)
+            for key, count in misses:
+                self.log_cache(threadNumber, count, stime, key, fetched.get(key), False, False)
+
+        # repeats of a key are served by its fetch
+        for key, count in repeats:
+            value = fetched.get(key)
+            self.log_cache(threadNumber, count, stime, key, value, value is not None, False)
@@ -0,0 +1,149 @@
+"""
+LRU miss ratio curve from byte stack distances.
+
+A byte bounded LRU cache always holds the longest run of most recently used distinct keys
+that fits, so a request hits a cache of C bytes exactly when the bytes of the distinct keys
+used since the previous request of the same key, its own value included, add up to at most
+C. One pass over the trace therefore gives the hit rate of every cache size.
+
+The bytes between two requests are summed with a Fenwick tree indexed by request position,
+where every key keeps its value size at the position of its latest request. With SHARDS
+sampling (Waldspurger et al.) only keys whose hash falls under the sampling threshold are
+tracked and their distances are scaled up by the inverse rate, which keeps the tree small
+for very large traces.
+"""
+
+import bisect
+import math
+import zlib
+from array import array
+
+from trace_file import BLOCK_BYTES
+
+SHARDS_MODULUS = 1 << 24
+# the default sizes start at 1 KB
+MIN_DEFAULT_SIZE_BITS = 10
+
+
+class FenwickTree:
+    """
+    Fenwick tree of integer sums over positions 1..capacity that doubles when full.
+
+    Attributes:
+        tree (array): Partial sums, tree[0] is unused.
+        capacity (int): Number of positions, a power of two.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.tree = array('q', bytes(8 * (capacity + 1)))
+
+    def grow(self):
+        # the new root covers both halves, every other new node covers only the empty half
+        total = self.prefix_sum(self.capacity)
+        self.tree.extend(array('q', bytes(8 * self.capacity)))
+        self.capacity *= 2
+        self.tree[self.capacity] = total
+
+    def add(self, position, delta):
+        while position > self.capacity:
+            self.grow()
+        tree = self.tree
+        capacity = self.capacity
+        while position <= capacity:
+            tree[position] += delta
+            position += position & -position
+
+    def prefix_sum(self, position):
+        tree = self.tree
+        total = 0
+        while position > 0:
+            total += tree[position]
+            position &= position - 1
+        return total
+
+
+def power_of_two_bucket(distance):
+    """
+    Index of the smallest default size 2 ** (10 + index) that holds a distance.
+    """
+    return max(0, (math.ceil(distance) - 1).bit_length() - MIN_DEFAULT_SIZE_BITS)
+
+
+def miss_ratio_curve(requests, sizes=None, sample_rate=1.0):
+    """
+    Computes LRU hit rates for a list of cache byte sizes in one pass.
+
+    Parameters:
+    - requests (iterable): (key, num_blocks) tuples as yielded by trace_file.read_trace. A
+      key keeps the size of the request that first used it, as in the source tables
+      make_sql_dump.py builds.
+    - sizes (list, optional): Cache byte sizes. Defaults to powers of two from 1 KB up to
+      the size holding every sampled key.
+    - sample_rate (float, optional): SHARDS spatial sampling rate in (0, 1]. Defaults to 1.0.
+
+    Returns:
+    - list: (cache bytes, hit rate) rows in increasing size order.
+    """
+    if not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be in (0, 1]")
+    threshold = int(sample_rate * SHARDS_MODULUS)
+    if sizes is not None:
+        sizes = sorted(sizes)
+
+    tree = FenwickTree()
+    last_position = {}
+    # byte size of every key, the one added to the tree at its last position
+    key_bytes = {}
+    # hits per size bucket, a distance counts for the first size that holds it
+    bucket_hits = [0] * (len(sizes) + 1 if sizes is not None else 1)
+    sampled = 0
+    unique_bytes = 0
+
+    for key, num_blocks in requests:
+        if sample_rate < 1 and zlib.crc32(key.encode()) % SHARDS_MODULUS >= threshold:
+            continue
+        sampled += 1
+
+        previous = last_position.get(key)
+        if previous is None:
+            value_size = BLOCK_BYTES * num_blocks
+            key_bytes[key] = value_size
+            unique_bytes += value_size
+        else:
+            value_size = key_bytes[key]
+            between = tree.prefix_sum(sampled - 1) - tree.prefix_sum(previous)
+            distance = (between + value_size) / sample_rate
+            if sizes is not None:
+                bucket_hits[bisect.bisect_left(sizes, distance)] += 1
+            else:
+                bucket = power_of_two_bucket(distance)
+                if bucket >= len(bucket_hits):
+                    bucket_hits.extend([0] * (bucket + 1 - len(bucket_hits)))
+                bucket_hits[bucket] += 1
+            tree.add(previous, -value_size)
+        tree.add(sampled, value_size)
+        last_position[key] = sampled
+
+    if sizes is None:
+        buckets = max(len(bucket_hits),
+                      power_of_two_bucket(unique_bytes / sample_rate) + 1)
+        sizes = [1 << (MIN_DEFAULT_SIZE_BITS + index) for index in range(buckets)]
+
+    rows = []
+    hits = 0
+    for index, size in enumerate(sizes):
+        if index < len(bucket_hits):
+            hits += bucket_hits[index]
+        rows.append((size, hits / max(1, sampled)))
+    return rows
+
+
+def write_curve(rows, csv_path):
+    """
+    Writes miss ratio curve rows to a CSV file.
+    """
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write("cache_bytes,hit_rate %,miss_rate %\n")
+        for size, hit_rate in rows:
+            csv_file.write(f"{size},{hit_rate:.4f},{1 - hit_rate:.4f}\n")
@@ -0,0 +1,238 @@
+"""
+Two tier near cache: an in-process L1 in front of a shared Redis or Memcache L2.
+
+A request is served from the byte bounded L1 of the process when it holds a fresh copy of
+the key. Otherwise the L2 is read, and on an L2 miss the source value is fetched and
+stored in the L2. Either way the value is copied into the L1, where it stays for at most
+the L1 time to live. Requests are logged with the tier that served them (l1, l2 or source),
+and close reports the requests and latencies of every tier, so the L2 round trips and tail
+latency the L1 removes can be read off against a plain Redis or Memcache run.
+
+With invalidation every process publishes the keys it writes to the L2 on a Redis pub/sub
+channel, and the other processes drop their L1 copies of these keys, so an L1 only serves
+a value until another process replaces it.
+"""
+
+import os
+import time
+
+import redis
+
+from cache_enum import CacheType, EvictionPolicyType
+from latency_histogram import LatencyHistogram
+from memcache_cache import MemcacheCache
+from python_cache import ShardedLRUCache
+from redis_cache import RedisCache
+from request_log import TIERS, TIER_L1, TIER_L2, TIER_SOURCE
+
+INVALIDATION_CHANNEL = "near_cache:invalidate"
+
+
+class NearCache:
+    """
+    Mixin that puts an L1 ShardedLRUCache in front of a Redis or Memcache cache class.
+
+    It goes before the backend class in the bases, the backend class is the L2 and keeps
+    its connections, codec and warm-up.
+
+    Attributes:
+    l1 (ShardedLRUCache): The in-process cache, values are stored as bytes.
+    l1_ttl_ms (int): How long an L1 copy is served, 0 for as long as it is cached.
+    invalidate (bool): Whether L2 writes are published to the other processes.
+    node_id (str): Identifies the invalidations this cache published itself.
+    tier_histograms (list): L1, L2 and source latency histograms, one row per worker.
+    """
+
+    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name,
+                 l1_size=0, l1_ttl_ms=0, l1_shard_count=16,
+                 l1_policy=EvictionPolicyType.LRU, invalidate=False, **kwargs):
+        """
+        Initializes the near cache instance.
+
+        Parameters:
+        thread_count (int): Number of threads to use for caching.
+        trace_file_name (str): Name of the trace file.
+        log_dir_path (str): Path to the log directory.
+        table_name (str): Name of the cache table.
+        l1_size (int): Maximum byte size of the L1, 0 for no limit.
+        l1_ttl_ms (int): L1 time to live in milliseconds, 0 for no expiry.
+        l1_shard_count (int): Number of independently locked L1 segments.
+        l1_policy (EvictionPolicyType): Eviction policy of the L1.
+        invalidate (bool): Whether to publish L2 writes and drop the L1 copies other
+            processes publish, through Redis pub/sub.
+        kwargs: Options passed on to the L2 cache class.
+        """
+        # the backend constructor starts the workers, so the L1 has to exist first
+        self.l1 = ShardedLRUCache(l1_size, l1_shard_count, l1_policy, l1_ttl_ms)
+        self.l1_ttl_ms = l1_ttl_ms
+        self.tier_histograms = [[LatencyHistogram() for _ in TIERS] for _ in range(thread_count)]
+        self.invalidate = invalidate
+        self.node_id = f"{os.getpid()}:{id(self)}"
+        self.publisher = None
+        self.subscriber = None
+        self.subscriber_thread = None
+        # invalidations published, one per worker
+        self.published = [0] * thread_count
+        # invalidations received from other processes and L1 copies they dropped
+        self.invalidations_received = 0
+        self.invalidations_dropped = 0
+        if invalidate:
+            self.subscribe()
+        super().__init__(thread_count, trace_file_name, log_dir_path, table_name, **kwargs)
+
+    def worker_threads(self):
+        """
+        Names the log after the near cache and the L2 and starts the workers.
+        """
+        self.log_label = self.cache_type.name.lower()
+        self.l2_type = self.cache_type
+        self.cache_type = CacheType.NEAR_CACHE
+        super().worker_threads()
+
+    def subscribe(self):
+        """
+        Subscribes to the invalidation channel on a thread of its own.
+        """
+        REDIS_HOSTNAME = os.getenv('REDIS_HOSTNAME')
+        REDIS_PORT = os.getenv('REDIS_PORT')
+        self.publisher = redis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT)
+        self.subscriber = self.publisher.pubsub(ignore_subscribe_messages=True)
+        self.subscriber.subscribe(**{INVALIDATION_CHANNEL: self.on_invalidation})
+        self.subscriber_thread = self.subscriber.run_in_thread(sleep_time=0.1, daemon=True)
+
+    def on_invalidation(self, message):
+        """
+        Drops the L1 copy of a key another process wrote to the L2.
+        """
+        node_id, key = message["data"].decode().split(" ", 1)
+        if node_id == self.node_id:
+            return
+        self.invalidations_received += 1
+        if self.l1.remove(key):
+            self.invalidations_dropped += 1
+
+    def l1_put(self, key, value):
+        """
+        Copies a source value into the L1.
+
+        Returns:
+        bool: Whether the value was cached, values larger than an L1 segment are not and
+        are read from the L2 every time.
+        """
+        if value is None:
+            # keys missing from the source are not cached
+            return False
+        return self.l1.put(key, bytes.fromhex(value))
+
+    def l2_fill(self, conn, key, threadNumber):
+        """
+        Fetches a value that missed both tiers and stores it in the L2.
+
+        Returns:
+        str: The source value.
+        """
+        if self.single_flight:
+            return self.lease_fetch(conn, key, threadNumber)
+        value = self.fetch_source(key)
+        self.store_value(conn, key, value, threadNumber)
+        return value
+
+    def store_value(self, conn, key, value, threadNumber):
+        """
+        Stores a value in the L2 and publishes the write, a single flight waiter that was
+        handed the value of another worker stores and publishes nothing.
+        """
+        super().store_value(conn, key, value, threadNumber)
+        if self.invalidate:
+            self.publisher.publish(INVALIDATION_CHANNEL, f"{self.node_id} {key}")
+            self.published[threadNumber] += 1
+
+    def warmup_batches(self, keys):
+        """
+        Copies the warm-up values the L2 stores into the L1 as well.
+        """
+        for batch in super().warmup_batches(keys):
+            for key, value in batch.items():
+                self.l1_put(key, value)
+            yield batch
+
+    def process_key(self, conn, key, count, threadNumber):
+        """
+        Serves a request from the first tier that holds the key.
+
+        Parameters:
+        conn (Client): L2 connection object.
+        key (str): Key to process.
+        count (int): Count to process.
+        threadNumber (int): Thread number.
+        """
+        stime = time.perf_counter_ns()
+        # an expired L1 copy is a miss
+        value = self.l1.get(key)
+        if value is not None:
+            tier = TIER_L1
+            value = bytes.hex(value)
+        else:
+            value = self.lookup_value(conn, key, threadNumber)
+            tier = TIER_L2
+            if value is None:
+                value = self.l2_fill(conn, key, threadNumber)
+                tier = TIER_SOURCE
+            self.l1_put(key, value)
+        latency_ns = self.log_cache(threadNumber, count, stime, key, value,
+                                    tier != TIER_SOURCE, False, tier)
+        self.tier_histograms[threadNumber][tier].record(latency_ns)
+
+    def process_batch(self, conn, items, threadNumber):
+        """
+        Processes the keys of a batch one at a time, L1 hits need no round trip to batch.
+        """
+        for key, count in items:
+            self.process_key(conn, key, count, threadNumber)
+
+    def close(self):
+        """
+        Closes the workers and prints the requests and latencies of every tier.
+        """
+        super().close()
+        if self.subscriber_thread is not None:
+            self.subscriber_thread.stop()
+            self.subscriber.close()
+            self.publisher.close()
+
+        tier_histograms = [LatencyHistogram() for _ in TIERS]
+        for thread_histograms in self.tier_histograms:
+            for tier, histogram in enumerate(thread_histograms):
+                tier_histograms[tier].merge(histogram)
+        l1_hits = tier_histograms[TIER_L1].count
+        l2_hits = tier_histograms[TIER_L2].count
+        fills = tier_histograms[TIER_SOURCE].count
+        requests = max(1, l1_hits + l2_hits + fills)
+        print("near_cache", f"l2 {self.l2_type.name.lower()}",
+              f"l1_hits {l1_hits}",
+              f"l2_hits {l2_hits}",
+              f"source {fills}",
+              f"l1_hit_rate {l1_hits / requests:.4f}",
+              f"l2_hit_rate {l2_hits / requests:.4f}",
+              self.l1.stats())
+        for tier in (TIER_L1, TIER_L2, TIER_SOURCE):
+            print("latency_ms", "near_cache", TIERS[tier], tier_histograms[tier].summary())
+        if self.invalidate:
+            print("near_cache_invalidation",
+                  f"published {sum(self.published)}",
+                  f"received {self.invalidations_received}",
+                  f"l1_dropped {self.invalidations_dropped}")
+
+
+class NearRedisCache(NearCache, RedisCache):
+    """
+    Near cache with a Redis L2.
+    """
+    pass
+
+
+class NearMemcacheCache(NearCache, MemcacheCache):
+    """
+    Near cache with a Memcache L2.
+    """
+    pass
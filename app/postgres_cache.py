@@ -4,8 +4,8 @@ Cache management class for SQLAlchemy database.
 
 from sqlalchemy.sql import func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, DateTime, Index, String
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Integer, DateTime, Index, String, select, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
 from sqlalchemy.exc import IntegrityError
 
 import datetime
@@ -16,6 +16,26 @@ from cache_enum import CacheType
 from cache import Cache
 from postgres_db import fetch_data_auto
 
+# Looks the key up and on a miss copies the source row into the cache in one statement.
+# Inserts that lose a race to another worker are skipped by ON CONFLICT, so nothing is
+# re-queued. The fill runs although nothing selects from it, as data modifying CTEs
+# always do. The source table name is filled in when the statement is prepared.
+LOOKUP_FILL_SQL = """
+PREPARE cache_lookup_fill(text) AS
+WITH hit AS (
+    SELECT value FROM cache WHERE key = $1
+), src AS (
+    SELECT orig_value FROM {source_table}
+    WHERE orig_key = $1 AND NOT EXISTS (SELECT 1 FROM hit)
+), fill AS (
+    INSERT INTO cache (key, value) SELECT $1, orig_value FROM src
+    ON CONFLICT (key) DO NOTHING
+)
+SELECT true, value FROM hit
+UNION ALL
+SELECT false, orig_value FROM src
+"""
+
 class Base(DeclarativeBase):
     """
     Base class for all database tables.
@@ -51,8 +71,10 @@ class PostgresCache(Cache):
     trace_file_name (str): Name of the trace file.
     log_dir_path (str): Path to the log directory.
     table_name (str): Name of the cache table.
+    fast_path (bool): Whether workers use a prepared statement on a raw psycopg connection.
     """
-    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name):
+    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name,
+                 fast_path=False, **kwargs):
         """
         Initializes the Postgres cache instance.
         
@@ -61,11 +83,18 @@ class PostgresCache(Cache):
         trace_file_name (str): Name of the trace file.
         log_dir_path (str): Path to the log directory.
         table_name (str): Name of the cache table.
+        fast_path (bool): Whether workers use a prepared statement on a raw psycopg
+            connection instead of ORM sessions.
+        kwargs: Options passed on to Cache.
         """
-        super().__init__(thread_count, trace_file_name, log_dir_path, table_name)
+        super().__init__(thread_count, trace_file_name, log_dir_path, table_name, **kwargs)
         self.cache_type = CacheType.SQLALCHEMY
+        self.fast_path = fast_path
+        if fast_path:
+            self.log_label = "fast"
 
-        self.prep_cache()
+        if self.prep:
+            self.prep_cache()
 
         self.worker_threads()
 
@@ -74,9 +103,39 @@ class PostgresCache(Cache):
         Creates a connection to the database.
         
         Returns:
-        Session: A SQLAlchemy session object.
+        Session: A SQLAlchemy session object, or with fast_path a pooled autocommit psycopg
+        connection with the lookup statement prepared, checked out until release_connection.
+        """
+        if not self.fast_path:
+            return self.Session
+
+        # the pool proxy has to stay referenced, a dropped proxy hands the psycopg
+        # connection back to the pool while the worker still uses it
+        conn = self.engine.raw_connection()
+        # every request is its own single statement transaction
+        conn.driver_connection.autocommit = True
+        source_table = self.engine.dialect.identifier_preparer.quote(self.table_name)
+        with conn.cursor() as cursor:
+            cursor.execute(LOOKUP_FILL_SQL.format(source_table=source_table))
+        return conn
+
+    def release_connection(self, conn):
         """
-        return self.Session
+        Returns a fast_path connection to the pool without its prepared statement, so the
+        next checkout can prepare it again.
+
+        Parameters:
+        conn (PoolProxiedConnection): Connection from create_connection.
+        """
+        if not self.fast_path:
+            return
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("DEALLOCATE cache_lookup_fill")
+            conn.driver_connection.autocommit = False
+        finally:
+            conn.close()
 
     def prep_cache(self):
         """
@@ -108,6 +167,31 @@ class PostgresCache(Cache):
 
         session.close()
 
+    def bulk_load(self, keys):
+        """
+        Copies the source rows of warm-up keys into the cache table with one
+        INSERT ... SELECT, so the values never leave the server.
+
+        Parameters:
+        keys (list): Distinct keys to load.
+
+        Returns:
+        int: Number of rows inserted.
+        """
+        source = self.SourceTable
+        stmt = insert(CacheTable).from_select(
+            ["key", "value"],
+            select(source.orig_key, source.orig_value).where(
+                source.orig_key == any_(bindparam("keys", list(keys), type_=ARRAY(String))))
+        ).on_conflict_do_nothing(index_elements=["key"])
+
+        session = self.Session()
+        session.begin()
+        result = session.execute(stmt)
+        session.commit()
+        session.close()
+        return result.rowcount
+
     def postres_cache_get(self, key, session):
         """
         Retrieves a cache entry by key.
@@ -133,12 +217,16 @@ class PostgresCache(Cache):
         Processes a cache key.
         
         Parameters:
-        Session (Session): SQLAlchemy session object.
+        Session (Session): SQLAlchemy session object, or a pooled psycopg connection with fast_path.
         key (str): Key to process.
         count (int): Count to process.
         threadNumber (int): Thread number.
         """
-        stime = time.time()
+        if self.fast_path:
+            self.process_key_prepared(Session, key, count, threadNumber)
+            return
+
+        stime = time.perf_counter_ns()
         session = Session()
         session.begin()
         try:
@@ -167,7 +255,7 @@ class PostgresCache(Cache):
             # Either a key was written to the cache right before writing here or a different issue occured that needs a rollback. So just rollback and put value back on the queue. In this application only performance is being tested so ignoring the error will suffice
 
             # or the key could be thrown back on the queue
-            self.keyQueue.put((key, count))
+            self.dispatcher.retry(threadNumber, key, count)
 
             session.rollback()
             print(error)
@@ -177,3 +265,28 @@ class PostgresCache(Cache):
             traceback.print_exc()
 
         session.close()
+
+    def process_key_prepared(self, conn, key, count, threadNumber):
+        """
+        Processes a cache key with one execution of the prepared lookup and fill statement.
+
+        Parameters:
+        conn (PoolProxiedConnection): Pooled psycopg connection with the statement prepared.
+        key (str): Key to process.
+        count (int): Count to process.
+        threadNumber (int): Thread number.
+        """
+        stime = time.perf_counter_ns()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("EXECUTE cache_lookup_fill(%s)", (key,))
+                row = cursor.fetchone()
+            if row is None:
+                # no source row, nothing was cached
+                self.log_cache(threadNumber, count, stime, key, None, False, False)
+            else:
+                hit, value = row
+                self.log_cache(threadNumber, count, stime, key, value, hit, False)
+        except Exception as ex:
+            print(ex)
+            traceback.print_exc()
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine, text, select
+from sqlalchemy import create_engine, text, select, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import create_async_engine
 import os
 
 
@@ -30,6 +32,32 @@ def get_engine():
     return engine
 
 
+def get_async_engine(pool_size=5):
+    """
+    Creates an asyncio database connection using SQLAlchemy and asyncpg.
+
+    Uses the same environment variables as get_engine.
+
+    Parameters:
+    - pool_size (int, optional): Number of pooled connections. Defaults to 5.
+
+    Returns:
+        engine (sqlalchemy.ext.asyncio.AsyncEngine): The created engine object.
+    """
+    POSTGRES_HOSTNAME = os.getenv('POSTGRES_HOSTNAME')
+    POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+    POSTGRES_DATABASE = os.getenv('POSTGRES_DATABASE')
+    POSTGRES_USERNAME = os.getenv('POSTGRES_USERNAME')
+    POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+
+    # requests wait for a pooled connection rather than opening more
+    engine = create_async_engine(
+        f"postgresql+asyncpg://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOSTNAME}:{POSTGRES_PORT}/{POSTGRES_DATABASE}",
+        pool_size=pool_size, max_overflow=0)
+
+    return engine
+
+
 def fetch_data(table_name, key, Session, session=None):
     """
     Fetches a value from a table in the database.
@@ -102,3 +130,57 @@ def fetch_data_auto(SourceTable, key, Session, session=None):
 
     # Return the fetched value
     return res[0].orig_value
+
+
+def fetch_data_many(SourceTable, keys, Session):
+    """
+    Fetches the values of several keys from a table in one query.
+
+    Parameters:
+    - SourceTable (sqlalchemy.Table): The table to fetch from.
+    - keys (list): The keys to search for.
+    - Session (sqlalchemy.orm.Session): The database session object.
+
+    Returns:
+    - values (dict): The fetched values by key, keys that were not found are left out.
+    """
+    # one array parameter keeps the statement text the same for any number of keys
+    stmt = select(SourceTable).where(
+        SourceTable.orig_key == any_(bindparam("keys", list(keys), type_=ARRAY(String))))
+
+    # Create a new session and begin a transaction
+    session1 = Session()
+    session1.begin()
+    # Execute the query and retrieve the results
+    res = session1.scalars(stmt).all()
+    # Commit the transaction
+    session1.commit()
+    # Close the session
+    session1.close()
+
+    return {row.orig_key: row.orig_value for row in res}
+
+
+async def fetch_data_auto_async(SourceTable, key, AsyncSession):
+    """
+    Fetches a value from a table in the database with an asyncio session.
+
+    Parameters:
+    - SourceTable (sqlalchemy.Table): The table to fetch from.
+    - key (str): The key to search for.
+    - AsyncSession (sqlalchemy.ext.asyncio.async_sessionmaker): The async session factory.
+
+    Returns:
+    - value (any): The fetched value, or None if not found.
+    """
+    stmt = select(SourceTable).where(SourceTable.orig_key == key)
+
+    async with AsyncSession() as session:
+        res = (await session.scalars(stmt)).all()
+
+    # Check if a result was found
+    if len(res) < 1:
+        return None
+
+    # Return the fetched value
+    return res[0].orig_value
@@ -0,0 +1,323 @@
+"""
+Multi-process replay engine.
+
+The trace is split across worker processes, each running its own Cache with its own
+threads, connections and log worker, so JSON encoding, logging and SQLAlchemy are no longer
+bound to one interpreter. Requests keep their global trace count, and at the end the
+per-process logs are merged into one log ordered by count that gen_test_stats.py reads like
+any other.
+"""
+
+import heapq
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import time
+import zlib
+
+from cache_enum import CacheType
+from cache_factory import create_cache
+from request_log import CSV_HEADER, csv_line, log_file_name, parse_log_name, read_binary_log
+from trace_file import read_trace
+
+# round robin spreads requests evenly, hash sends every request of a key to the same process
+PARTITIONS = ("rr", "hash")
+# how often waiting processes and the parent check whether the run was aborted
+POLL_SECS = 1
+# rows a process log may be out of count order by and still be merged while it is read
+MERGE_WINDOW = 1 << 16
+
+
+def in_partition(key, count, process_index, process_count, partition="rr"):
+    """
+    Tells whether a request belongs to a process.
+
+    Parameters:
+    - key (str): Key of the request.
+    - count (int): Global count of the request, starting at 1.
+    - process_index (int): Index of the process.
+    - process_count (int): Number of processes.
+    - partition (str, optional): "rr" or "hash". Defaults to "rr".
+
+    Returns:
+    - bool: True if the process replays the request.
+    """
+    if partition == "hash":
+        # crc32 rather than hash() so every process computes the same value
+        return zlib.crc32(key.encode()) % process_count == process_index
+    return (count - 1) % process_count == process_index
+
+
+def replay_partition(process_index, process_count, partition, prepared, warmed, start, abort,
+                     cache_type, thread_count, tracefile_path, log_dir_path, table_name, limit,
+                     warm_keys, skip, options):
+    """
+    Replays the share of the trace of one process.
+
+    The first process flushes and warms up the backend and the others wait for it before
+    they create their caches. Python caches and near cache L1s are private, so every process
+    warms up its own.
+    All processes start replaying together once the parent sees every warm-up done, and
+    give up without replaying when the parent aborts the run because a process failed.
+    """
+    if process_index > 0:
+        while not prepared.wait(timeout=POLL_SECS):
+            if abort.is_set():
+                return
+    cache = create_cache(cache_type, thread_count, tracefile_path, log_dir_path, table_name,
+                         prep=process_index == 0, **options)
+    if warm_keys and (process_index == 0
+                      or cache_type in (CacheType.PYTHON_CACHE, CacheType.NEAR_CACHE)):
+        cache.warm_up(warm_keys)
+    if process_index == 0:
+        prepared.set()
+    warmed.release()
+    start.wait()
+    if abort.is_set():
+        cache.close()
+        return
+    cache.start_ns = time.perf_counter_ns()
+
+    for count, (key, _) in enumerate(read_trace(tracefile_path, limit), 1):
+        if count <= skip:
+            continue
+        if in_partition(key, count, process_index, process_count, partition):
+            cache.dispatcher.put(key, count)
+
+    cache.close()
+
+
+class LogOrderError(Exception):
+    """
+    Raised when a request log is further out of count order than the merge window.
+    """
+    pass
+
+
+def read_log_part(part_path, thread_offset):
+    """
+    Reads a process log with its thread numbers shifted past those of earlier processes.
+
+    Binary logs are read as CSV lines.
+
+    Returns:
+    - tuple: The header line and a generator of (count, line) rows in the order they were
+      logged.
+    """
+    if part_path.endswith(".bin"):
+        rows = ((row[2], csv_line(row[:1] + (row[1] + thread_offset,) + row[2:]))
+                for row in read_binary_log(part_path))
+        return CSV_HEADER, rows
+
+    with open(part_path) as part_file:
+        header = part_file.readline()
+
+    def csv_rows():
+        with open(part_path) as part_file:
+            part_file.readline()
+            for line in part_file:
+                cache_action, thread_number, count, rest = line.split(',', 3)
+                yield (int(count),
+                       f"{cache_action},{int(thread_number) + thread_offset},{count},{rest}")
+
+    return header, csv_rows()
+
+
+def count_ordered(rows, window=MERGE_WINDOW):
+    """
+    Puts rows that are logged in completion order back into count order while they are read.
+
+    Workers log their requests in the order they finish them, so a row is never far from its
+    place in count order. The rows are held in a heap of at most window rows, and the lowest
+    count is passed on whenever it is full.
+
+    Parameters:
+    - rows (iterable): (count, line) rows.
+    - window (int, optional): Rows held back, 0 to sort all rows in memory.
+
+    Yields:
+    - tuple: (count, line) rows in count order.
+
+    Raises:
+    - LogOrderError: If a row comes after a higher count was already passed on.
+    """
+    if window == 0:
+        yield from sorted(rows)
+        return
+
+    heap = []
+    last_count = 0
+    for row in rows:
+        if row[0] < last_count:
+            raise LogOrderError(f"count {row[0]} logged more than {window} rows after {last_count}")
+        if len(heap) < window:
+            heapq.heappush(heap, row)
+            continue
+        row = heapq.heappushpop(heap, row)
+        last_count = row[0]
+        yield row
+    while heap:
+        yield heapq.heappop(heap)
+
+
+def merge_logs(part_paths, out_path, thread_count, window=MERGE_WINDOW):
+    """
+    Merges process logs into one log ordered by global count.
+
+    The logs are streamed and merged as they are read, so at most window rows of every log
+    are held in memory. A log that is further out of order than that is merged again with
+    every log sorted in memory.
+
+    Parameters:
+    - part_paths (list): Paths of the process logs.
+    - out_path (str): Path of the merged log.
+    - thread_count (int): Number of threads of every process, the threads of a later log
+      are numbered after those of the earlier ones.
+    - window (int, optional): Rows of a log held back to put it in count order, 0 to sort
+      every log in memory.
+
+    Returns:
+    - int: Number of requests in the merged log.
+    """
+    header = None
+    parts = []
+    for index, part_path in enumerate(part_paths):
+        header, rows = read_log_part(part_path, index * thread_count)
+        parts.append(count_ordered(rows, window))
+
+    requests = 0
+    try:
+        with open(out_path, 'w') as out_file:
+            out_file.write(header)
+            for _, line in heapq.merge(*parts):
+                out_file.write(line)
+                requests += 1
+    except LogOrderError as error:
+        if window == 0:
+            raise
+        print(f"{error}, merging the logs in memory")
+        return merge_logs(part_paths, out_path, thread_count, 0)
+    return requests
+
+
+def merged_log_name(part_name, process_count):
+    """
+    Adds the process count to the label of a process log name, e.g. trace_lru-p4_... .
+
+    The merged log is always CSV.
+    """
+    trace_name, label, date, cache_type = parse_log_name(part_name)
+    label = f"{label}-p{process_count}" if label else f"p{process_count}"
+    return log_file_name(trace_name, label, date, cache_type)
+
+
+def stop_processes(processes, abort):
+    """
+    Aborts the run, the processes that are still running are terminated.
+    """
+    abort.set()
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def join_processes(processes, abort):
+    """
+    Waits for the processes to end, terminating the others as soon as one of them fails.
+    """
+    running = list(processes)
+    while running:
+        multiprocessing.connection.wait([process.sentinel for process in running])
+        for process in [process for process in running if process.exitcode is not None]:
+            running.remove(process)
+            if process.exitcode != 0 and not abort.is_set():
+                stop_processes(running, abort)
+
+
+def replay_processes(process_count, partition, cache_type, thread_count, tracefile_path,
+                     log_dir_path, table_name, limit=0, warm_keys=None, skip=0, **options):
+    """
+    Replays a trace with several processes and merges their logs.
+
+    Parameters:
+    - process_count (int): Number of processes.
+    - partition (str): How requests are split, "rr" or "hash".
+    - cache_type (CacheType): Type of cache every process creates.
+    - thread_count (int): Number of threads per process.
+    - tracefile_path (str): Path to the trace file.
+    - log_dir_path (str): Path to the log directory.
+    - table_name (str): Name of the cache table.
+    - limit (int, optional): Maximum number of requests to read, 0 for all. Defaults to 0.
+    - warm_keys (list, optional): Keys loaded before the measured run, None for a cold start.
+    - skip (int, optional): Number of first requests not replayed, as the warm-up did.
+    - options: Options passed on to create_cache.
+
+    Returns:
+    - str: Path of the merged log, None when the processes wrote no request logs.
+
+    Raises:
+    - ValueError: If the partition is not supported.
+    - Exception: If a process fails.
+    """
+    if partition not in PARTITIONS:
+        raise ValueError("Invalid partition. Supported partitions are: {}".format(PARTITIONS))
+
+    # log names only differ by the minute, so every process logs to its own folder
+    parts_dir = os.path.join(log_dir_path, f"parts_{os.getpid()}")
+    part_dirs = [os.path.join(parts_dir, f"p{index}") for index in range(process_count)]
+    for part_dir in part_dirs:
+        os.makedirs(part_dir)
+
+    prepared = multiprocessing.Event()
+    warmed = multiprocessing.Semaphore(0)
+    start = multiprocessing.Event()
+    abort = multiprocessing.Event()
+    processes = [multiprocessing.Process(
+        target=replay_partition,
+        args=(index, process_count, partition, prepared, warmed, start, abort, cache_type,
+              thread_count, tracefile_path, part_dirs[index], table_name, limit, warm_keys,
+              skip, options))
+        for index in range(process_count)]
+
+    for process in processes:
+        process.start()
+    # the measured run starts once every process is set up and warmed up
+    ready = 0
+    while ready < process_count and not abort.is_set():
+        if warmed.acquire(timeout=POLL_SECS):
+            ready += 1
+        elif any(process.exitcode not in (None, 0) for process in processes):
+            stop_processes(processes, abort)
+    start.set()
+    stime = time.time()
+    join_processes(processes, abort)
+    secs = time.time() - stime
+
+    failed = [index for index, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        # report the process that failed rather than the ones terminated after it
+        index = min(failed, key=lambda index: processes[index].exitcode == -signal.SIGTERM)
+        raise Exception(f"replay process {index} exited with {processes[index].exitcode}, logs kept in {parts_dir}")
+
+    part_paths = []
+    for part_dir in part_dirs:
+        part_paths += [os.path.join(part_dir, name) for name in sorted(os.listdir(part_dir))
+                       if name.endswith(".log") or name.endswith(".bin")]
+    if not part_paths:
+        # request logging was off, every process printed its own latency report
+        shutil.rmtree(parts_dir)
+        print("processes", process_count, f"secs {secs:.4f}")
+        return None
+
+    out_path = os.path.join(log_dir_path,
+                            merged_log_name(os.path.basename(part_paths[0]), process_count))
+    requests = merge_logs(part_paths, out_path, thread_count)
+    shutil.rmtree(parts_dir)
+
+    print("processes", process_count,
+          f"requests {requests}",
+          f"secs {secs:.4f}",
+          f"throughput {requests / max(secs, 1e-9):.4f}")
+    return out_path
@@ -5,32 +5,41 @@ PythonCache Class
 This class implements a caching mechanism using a Python dictionary. It provides methods for getting and setting cache entries, as well as logging cache hits and misses.
 
 Attributes:
-    lock (threading.Lock): A lock object used for thread safety.
     cache_type (CacheType): The type of cache, which is set to CacheType.PYTHON_CACHE.
+    lrucache (ShardedLRUCache): Lock striped LRU segments shared by the worker threads.
     max_size (int): The maximum size of the cache. Defaults to 0, which means the cache has no size limit.
     size (int): The current size of the cache.
-    cache_d (dict): A dictionary that stores the cache entries.
-    lru_queue (llist.dllist): A doubly linked list that stores the least recently used (LRU) cache entries.
+    cache_d (dict): A dictionary that maps keys to their LRUEntry.
+    policy (EvictionPolicy): The eviction policy that orders the entries, LRU by default.
+    ttl_ms (int): Default time to live of the entries in milliseconds, 0 for no expiry.
+    timers (TimerWheel): Expiry times of the entries with a time to live.
 """
 
 import time
 import threading
-import llist
+from concurrent.futures import Future
 
 from cache import Cache
-from cache_enum import CacheType
-from postgres_db import fetch_data_auto
+from cache_enum import CacheType, EvictionPolicyType
+from eviction_policy import LRUEntry, create_policy
+from timer_wheel import TimerWheel
 
 
 class LRUCache:
     OVERSIZED_EX_MSG = "Value size large than max LRUCache size"
     VALUE_TYPE_EX_MSG = "Value must be bytes type"
 
-    def __init__(self, max_size=0):
+    def __init__(self, max_size=0, policy_type=EvictionPolicyType.LRU, ttl_ms=0):
         self.size = 0
         self.max_size = max_size
         self.cache_d = {}
-        self.lru_queue = llist.dllist()
+        self.policy = create_policy(policy_type, max_size)
+        # an unbounded cache never touches the policy, so its hits never need the lock
+        self.lock_free_hits = max_size == 0 or self.policy.lock_free_hits
+        self.ttl_ms = ttl_ms
+        # expired entries are reaped by the wheel as its clock passes them, writes move it
+        self.timers = TimerWheel(time.perf_counter_ns())
+        self.expired = 0
 
     def has(self, key):
         if key in self.cache_d:
@@ -40,66 +49,315 @@ class LRUCache:
     """
     Gets a value from the cache.
 
+    An entry past its expiry time is a miss. It is removed right away unless the caller
+    does not hold the lock of the cache, then the timer wheel or the next write of the key
+    removes it.
+
     Parameters:
     - key (str): The key to get the value for.
+    - remove_expired (bool, optional): Whether an expired entry is removed. Defaults to True.
 
     Returns:
     - value (any): The value associated with the key, or None if the key is not in the cache.
     """
 
-    def get_from_cache(self, key):
-        if key not in self.cache_d:
+    def get_from_cache(self, key, remove_expired=True):
+        entry = self.cache_d.get(key)
+        if entry is not None and entry.expires and entry.expires <= time.perf_counter_ns():
+            if remove_expired:
+                self.remove_entry(entry)
+                self.expired += 1
+            entry = None
+        if self.max_size == 0:
+            return entry.value if entry is not None else None
+
+        if entry is None:
+            self.policy.on_miss(key)
             return None
-
-        cache_entry = self.cache_d[key]
-        if self.max_size > 0:
-            sameKey = self.lru_queue.remove(cache_entry["noderef"])
-            assert key == sameKey
-            self.lru_queue.appendleft(key)
-            self.cache_d[key] = {
-                "value": cache_entry["value"], "noderef": self.lru_queue.first}
-        return cache_entry["value"]
+        self.policy.on_hit(entry)
+        return entry.value
     """
     Sets a value in the cache.
 
+    The entry is handed to the eviction policy first and victims are evicted until the
+    cache fits max_size again. A policy with an admission filter may pick the new entry
+    itself as the victim, in which case the value is not cached. Entries that expired are
+    reaped first, so they free their bytes before anything is evicted.
+
     Parameters:
     - key (str): The key to set the value for.
     - value (any): The value to set.
+    - ttl_ms (int, optional): Time to live in milliseconds, 0 for no expiry. Defaults to
+      the ttl_ms of the cache.
 
     Returns:
     - None
     """
 
-    def set_cache(self, key, value):
+    def set_cache(self, key, value, ttl_ms=None):
         if not isinstance(value, bytes):
             raise Exception(self.VALUE_TYPE_EX_MSG)
-
-        if key in self.cache_d:
-            self.cache_d[key] = {"value": value,
-                                 "noderef": self.cache_d[key]["noderef"]}
+        if ttl_ms is None:
+            ttl_ms = self.ttl_ms
+        if self.timers.count:
+            self.expire()
+
+        if self.max_size == 0:
+            entry = self.cache_d.get(key)
+            if entry is None:
+                entry = LRUEntry(key, value)
+                self.cache_d[key] = entry
+            else:
+                entry.value = value
+            self.set_expiry(entry, ttl_ms)
             return
 
+        # data is stored as bytes in this test application. Adjust for differences in testing
+        value_size = len(value)
+        if value_size > self.max_size:
+            raise Exception(self.OVERSIZED_EX_MSG)
+
+        entry = self.cache_d.get(key)
+        if entry is not None:
+            # replacing a value is accounted as a remove and a fresh insert
+            self.remove_entry(entry)
+
+        entry = self.policy.new_entry(key, value)
+        self.size += value_size
+        self.cache_d[key] = entry
+        self.policy.on_insert(entry)
+
+        while self.size > self.max_size:
+            victim = self.policy.evict()
+            if victim is None:
+                raise Exception(
+                    "cache has size greater than zero but no entries.")
+            self.size -= len(victim.value)
+            del self.cache_d[victim.key]
+            self.timers.cancel(victim)
+
+        if ttl_ms and self.cache_d.get(key) is entry:
+            self.set_expiry(entry, ttl_ms)
+
+    def set_expiry(self, entry, ttl_ms):
+        if ttl_ms:
+            entry.expires = time.perf_counter_ns() + ttl_ms * 1_000_000
+            self.timers.schedule(entry)
+        elif entry.expires:
+            entry.expires = 0
+            self.timers.cancel(entry)
+
+    def remove_entry(self, entry):
+        del self.cache_d[entry.key]
+        self.timers.cancel(entry)
         if self.max_size > 0:
-            # data is stored as bytes in this test application. Adjust for differences in testing
-            value_size = len(value)
-            if value_size > self.max_size:
-                raise Exception(self.OVERSIZED_EX_MSG)
-
-            while self.size + value_size > self.max_size:
-                if self.lru_queue.size > 0:
-                    end_node = self.lru_queue.pop()
-                    rvalue = self.cache_d[end_node]["value"]
-                    self.size -= len(rvalue)
-                    del self.cache_d[end_node]
+            self.policy.remove(entry)
+            self.size -= len(entry.value)
+
+    """
+    Removes a key from the cache.
+
+    Parameters:
+    - key (str): The key to remove.
+
+    Returns:
+    - bool: Whether the key was cached.
+    """
+
+    def remove(self, key):
+        entry = self.cache_d.get(key)
+        if entry is None:
+            return False
+        self.remove_entry(entry)
+        return True
+
+    """
+    Removes the entries whose expiry time passed, visiting only the timer wheel slots of
+    the time that passed since the last call.
+
+    Parameters:
+    - now_ns (int, optional): perf_counter_ns time to expire up to. Defaults to now.
+
+    Returns:
+    - int: Number of entries removed.
+    """
+
+    def expire(self, now_ns=None):
+        expired = self.timers.advance(now_ns or time.perf_counter_ns())
+        for entry in expired:
+            self.remove_entry(entry)
+        self.expired += len(expired)
+        return len(expired)
+
+
+class ShardedLRUCache:
+    """
+    Thread safe cache made of independent LRUCache segments.
+
+    A key is mapped to one segment by its hash and each segment has its own lock, so
+    requests for keys in different segments never contend. The byte limit is split
+    evenly between the segments and every segment runs its own eviction policy. A value
+    larger than a segment is served without being cached. Policies whose hits only set a
+    flag (CLOCK, SIEVE) serve hits without the lock. Misses are loaded with the segment
+    lock released, and concurrent misses for the same key wait on a single in-flight
+    future instead of loading the value again.
+
+    Attributes:
+        shard_count (int): Number of LRUCache segments.
+        shards (list): The LRUCache segments.
+        locks (list): One lock per segment.
+        in_flight (list): One dictionary per segment mapping a key to its pending Future.
+        shard_size (int): Byte limit of every segment, 0 for no limit.
+        oversized (list): Values too large for a segment, one count per segment.
+    """
+    SHARD_SIZE_EX_MSG = "max_size must be at least one byte per shard"
+
+    def __init__(self, max_size=0, shard_count=1, policy_type=EvictionPolicyType.LRU, ttl_ms=0):
+        if shard_count < 1:
+            raise Exception("shard_count less than 1")
+
+        shard_size = 0
+        if max_size > 0:
+            shard_size = max_size // shard_count
+            if shard_size < 1:
+                raise Exception(self.SHARD_SIZE_EX_MSG)
+
+        self.shard_count = shard_count
+        self.shard_size = shard_size
+        self.shards = [LRUCache(shard_size, policy_type, ttl_ms)
+                       for _ in range(shard_count)]
+        self.locks = [threading.Lock() for _ in range(shard_count)]
+        self.in_flight = [{} for _ in range(shard_count)]
+        self.oversized = [0] * shard_count
+
+    def shard_index(self, key):
+        return hash(key) % self.shard_count
+
+    def fits(self, value):
+        return self.shard_size == 0 or len(value) <= self.shard_size
+
+    def get_or_load(self, key, loader):
+        """
+        Gets a value from the cache, loading and storing it on a miss.
+
+        Parameters:
+        - key (str): The key to get the value for.
+        - loader (callable): Called with the key on a miss, must return the value as bytes.
+
+        Returns:
+        - tuple: The value and whether it was a cache hit.
+        """
+        index = self.shard_index(key)
+        shard = self.shards[index]
+        lock = self.locks[index]
+        in_flight = self.in_flight[index]
+
+        if shard.lock_free_hits:
+            # hits only set a flag on the entry, no list is changed
+            value = shard.get_from_cache(key, remove_expired=False)
+            if value is not None:
+                return value, True
+
+        with lock:
+            value = shard.get_from_cache(key)
+            if value is not None:
+                return value, True
+
+            future = in_flight.get(key)
+            loading = future is None
+            if loading:
+                future = Future()
+                in_flight[key] = future
+
+        if not loading:
+            # another thread is already fetching this key
+            return future.result(), False
+
+        try:
+            value = loader(key)
+            with lock:
+                if self.fits(value):
+                    shard.set_cache(key, value)
                 else:
-                    raise Exception(
-                        "cache has size greater than zero but no entries.")
-            self.size += value_size
-            self.lru_queue.appendleft(key)
-            self.cache_d[key] = {"value": value,
-                                 "noderef": self.lru_queue.first}
+                    self.oversized[index] += 1
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
         else:
-            self.cache_d[key] = {"value": value}
+            future.set_result(value)
+        finally:
+            with lock:
+                del in_flight[key]
+
+        return value, False
+
+    def get(self, key):
+        """
+        Gets a value from the segment of its key without loading it on a miss.
+
+        Returns:
+        - bytes: The value, or None if the key is not cached.
+        """
+        index = self.shard_index(key)
+        shard = self.shards[index]
+        if shard.lock_free_hits:
+            value = shard.get_from_cache(key, remove_expired=False)
+            if value is not None:
+                return value
+        with self.locks[index]:
+            return shard.get_from_cache(key)
+
+    def put(self, key, value, ttl_ms=None):
+        """
+        Stores a value in the segment of its key, with the default time to live of the
+        segments unless ttl_ms is given.
+
+        Returns:
+        - bool: Whether the value was cached, False if it is larger than a segment.
+        """
+        index = self.shard_index(key)
+        with self.locks[index]:
+            if not self.fits(value):
+                # an older copy must not be served in place of the new value
+                self.shards[index].remove(key)
+                self.oversized[index] += 1
+                return False
+            self.shards[index].set_cache(key, value, ttl_ms)
+        return True
+
+    def remove(self, key):
+        """
+        Removes a key from the segment of its key.
+
+        Returns:
+        - bool: Whether the key was cached.
+        """
+        index = self.shard_index(key)
+        with self.locks[index]:
+            return self.shards[index].remove(key)
+
+    def stats(self):
+        """
+        Sums the entry counts, byte sizes and policy counters of all segments.
+
+        Returns:
+        - dict: The summed statistics.
+        """
+        totals = {"entries": 0, "bytes": 0}
+        for index, shard in enumerate(self.shards):
+            with self.locks[index]:
+                totals["entries"] += len(shard.cache_d)
+                totals["bytes"] += shard.size
+                if self.oversized[index]:
+                    totals["oversized"] = totals.get("oversized", 0) + self.oversized[index]
+                if shard.ttl_ms or shard.expired:
+                    totals["expired"] = totals.get("expired", 0) + shard.expired
+                for name, value in shard.policy.stats().items():
+                    totals[name] = totals.get(name, 0) + value
+        if totals.get("sketch_ops"):
+            totals["sketch_ns_per_op"] = round(
+                totals["sketch_ns"] / totals["sketch_ops"], 1)
+        return totals
 
 
 class PythonCache(Cache):
@@ -115,18 +373,26 @@ class PythonCache(Cache):
     - table_name (str): The name of the table.
     - max_size (int, optional): The maximum byte size of the cache. Defaults to 0.
     - init_workers (bool, optional): Whether to initialize the workers. Defaults to True.
+    - shard_count (int, optional): The number of independently locked LRU segments. Defaults to 1.
+    - policy_type (EvictionPolicyType, optional): The eviction policy of every segment. Defaults to LRU.
+    - kwargs: Options passed on to Cache, its ttl is the time to live of the entries.
     """
-    lock = threading.Lock()
 
     def __init__(self, thread_count,
                  trace_file_name,
                  log_dir_path,
                  table_name,
-                 max_size=0, init_workers=True):
-        super().__init__(thread_count, trace_file_name, log_dir_path, table_name)
+                 max_size=0, init_workers=True, shard_count=1,
+                 policy_type=EvictionPolicyType.LRU, **kwargs):
+        super().__init__(thread_count, trace_file_name, log_dir_path, table_name, **kwargs)
         self.cache_type = CacheType.PYTHON_CACHE
-        self.lrucache = LRUCache(max_size)
-        self.prep_cache()
+        # runs with different policies on the same trace get separate logs
+        self.log_label = policy_type.value
+        self.lrucache = ShardedLRUCache(max_size, shard_count, policy_type, self.ttl * 1000)
+        # hits, misses, hit bytes and miss bytes, one row per worker so no lock is needed
+        self.request_stats = [[0, 0, 0, 0] for _ in range(thread_count)]
+        if self.prep:
+            self.prep_cache()
 
         if init_workers:
             self.worker_threads()
@@ -163,6 +429,51 @@ class PythonCache(Cache):
     def prep_cache(self):
         pass
 
+    """
+    Stores warm-up values in the cache segments.
+
+    Returns:
+    - int: Number of values stored.
+    """
+
+    def bulk_load(self, keys):
+        loaded = 0
+        for batch in self.warmup_batches(keys):
+            for key, value in batch.items():
+                self.lrucache.put(key, bytes.fromhex(value))
+            loaded += len(batch)
+        return loaded
+
+    """
+    Closes all threads and prints the object and byte hit rates and the cache statistics.
+
+    Returns:
+    - None
+    """
+
+    def close(self):
+        super().close()
+        hits, misses, hit_bytes, miss_bytes = map(sum, zip(*self.request_stats))
+        requests = max(1, hits + misses)
+        print(f"policy {self.log_label}",
+              f"hit_rate {hits / requests:.4f}",
+              f"byte_hit_rate {hit_bytes / max(1, hit_bytes + miss_bytes):.4f}",
+              self.lrucache.stats())
+
+    """
+    Loads a value from the source table as bytes.
+
+    Parameters:
+    - key (str): The key to load.
+
+    Returns:
+    - bytes: The source value.
+    """
+
+    def load_value(self, key):
+        value = self.fetch_source(key)
+        return bytes.fromhex(value)
+
     """
     Processes a cache request.
 
@@ -175,23 +486,16 @@ class PythonCache(Cache):
     """
 
     def process_key(self, _, key, count, threadNumber):
-        stime = time.time()
-
-        # Python dictionaries aren't thread safe
-        self.lock.acquire()
-        try:
-            if self.lrucache.has(key):
-                valueBytes = self.lrucache.get_from_cache(key)
-
-                self.log_cache(threadNumber, count, stime,
-                               key, bytes.hex(valueBytes), True, False)
-            else:
-                value = fetch_data_auto(
-                    self.SourceTable, key, None, self.Session)
-                cacheBytes = bytes.fromhex(value)
-                self.lrucache.set_cache(key, cacheBytes)
-                self.log_cache(threadNumber, count, stime,
-                               key, value, False, False)
-        finally:
-            # Release the lock
-            self.lock.release()
+        stime = time.perf_counter_ns()
+
+        # the shard lock is never held while the source table is queried
+        valueBytes, hit = self.lrucache.get_or_load(key, self.load_value)
+        stats = self.request_stats[threadNumber]
+        if hit:
+            stats[0] += 1
+            stats[2] += len(valueBytes)
+        else:
+            stats[1] += 1
+            stats[3] += len(valueBytes)
+        self.log_cache(threadNumber, count, stime,
+                       key, bytes.hex(valueBytes), hit, False)
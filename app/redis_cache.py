@@ -9,13 +9,15 @@ import redis
 
 from cache_enum import CacheType
 from cache import Cache
+from connection_pool import TimedBlockingConnectionPool
 
 import random
-import json
 import os
 import time
 
-from postgres_db import fetch_data_auto
+from postgres_db import fetch_data_many
+
+LEASE_PREFIX = "lease:"
 
 
 class RedisCache(Cache):
@@ -26,27 +28,40 @@ class RedisCache(Cache):
     Sets the cache type to Redis and prepares the cache.
     """
 
-    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name):
-        super().__init__(thread_count, trace_file_name, log_dir_path, table_name)
+    def __init__(self, thread_count, trace_file_name, log_dir_path, table_name, **kwargs):
+        super().__init__(thread_count, trace_file_name, log_dir_path, table_name, **kwargs)
         self.cache_type = CacheType.REDIS
+        # one pool of pool_size connections shared by all workers
+        self.pool = self.create_pool()
 
         # Prepare the cache
-        self.prep_cache()
+        if self.prep:
+            self.prep_cache()
 
         # Create worker threads
         self.worker_threads()
 
     """
-    Creates a connection to the Redis database.
+    Creates the connection pool shared by the workers.
 
-    Returns a Redis connection object.
+    Workers wait for a free connection when all pool_size connections are in use.
     """
 
-    def create_connection(self):
+    def create_pool(self):
         # Get Redis hostname and port from environment variables
         REDIS_HOSTNAME = os.getenv('REDIS_HOSTNAME')
         REDIS_PORT = os.getenv('REDIS_PORT')
-        return redis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT)
+        return TimedBlockingConnectionPool(self.pool_wait, host=REDIS_HOSTNAME, port=REDIS_PORT,
+                                           max_connections=self.pool_size, timeout=None)
+
+    """
+    Creates a connection to the Redis database.
+
+    Returns a Redis connection object on the shared pool.
+    """
+
+    def create_connection(self):
+        return redis.Redis(connection_pool=self.pool)
 
     """
     Prepares the cache by flushing all existing data.
@@ -62,6 +77,61 @@ class RedisCache(Cache):
         # Close the Redis connection
         conn.close()
 
+    """
+    Stores warm-up values with MSET batches sent through one pipeline.
+
+    Returns the number of values stored.
+    """
+
+    def bulk_load(self, keys):
+        conn = self.create_connection()
+        loaded = 0
+        pipe = conn.pipeline(transaction=False)
+        for batch in self.warmup_batches(keys):
+            self.store_many(pipe, {key: self.codec.encode(value) for key, value in batch.items()})
+            loaded += len(batch)
+            # bounds the replies and commands buffered by the pipeline
+            if len(pipe) >= 16:
+                pipe.execute()
+        pipe.execute()
+        conn.close()
+        return loaded
+
+    """
+    Queues encoded values on a pipeline with one MSET, or with a time to live as one
+    SET EX per key, as MSET takes no expiry.
+
+    Parameters:
+    - pipe (Redis pipeline): The pipeline the commands are queued on.
+    - values (dict): Encoded values by key.
+    """
+
+    def store_many(self, pipe, values):
+        if not self.ttl:
+            pipe.mset(values)
+            return
+        for key, data in values.items():
+            pipe.set(key, data, ex=self.ttl)
+
+    """
+    Single flight hooks, the lease is a key set with NX and a millisecond expiry.
+    """
+
+    def lookup_value(self, conn, key, threadNumber):
+        value = conn.get(key)
+        if value is None:
+            return None
+        return self.decode_value(value, threadNumber)
+
+    def store_value(self, conn, key, value, threadNumber):
+        conn.set(key, self.encode_value(value, threadNumber), ex=self.ttl or None)
+
+    def acquire_lease(self, conn, key):
+        return bool(conn.set(LEASE_PREFIX + key, 1, nx=True, px=self.lease_ms))
+
+    def release_lease(self, conn, key):
+        conn.delete(LEASE_PREFIX + key)
+
     """
     Processes a cache request.
 
@@ -77,18 +147,80 @@ class RedisCache(Cache):
 
     def process_key(self, conn, key, count, threadNumber):
         # Get the current time
-        stime = time.time()
+        stime = time.perf_counter_ns()
 
-        # Check if the key already exists in the cache
-        if conn.exists(key):
-            # Get the cached value
-            value = json.loads(conn.get(key))
+        # Get the cached value in one round trip, nil is a miss
+        value = conn.get(key)
+        if value is not None:
+            value = self.decode_value(value, threadNumber)
             # Log the cache hit
             self.log_cache(threadNumber, count, stime, key, value, True)
+        elif self.single_flight:
+            # Only the lease holder grabs the database value, the others wait for it
+            value = self.lease_fetch(conn, key, threadNumber)
+            # Log the cache miss
+            self.log_cache(threadNumber, count, stime, key, value, False)
         else:
             # No key in the cache, grab the database value and populate the cache
-            value = fetch_data_auto(self.SourceTable, key, None, self.Session)
+            value = self.fetch_source(key)
             # Log the cache miss
             self.log_cache(threadNumber, count, stime, key, value, False)
             # Set the key in the cache
-            conn.set(key, json.dumps(value))
+            conn.set(key, self.encode_value(value, threadNumber), ex=self.ttl or None)
+
+    """
+    Processes a batch of cache requests with one MGET and one pipelined MSET (or SET EX
+    per key with a time to live).
+
+    Every request is timed from the start of the batch, hits until the MGET returns and
+    misses until their values are fetched and written back. A key that misses more than
+    once in a batch is fetched once, its repeats are logged as hits.
+
+    Parameters:
+    - conn (Redis connection): The Redis connection object.
+    - items (list): (key, count) tuples to process.
+    - threadNumber (int): The thread number.
+
+    Returns:
+    - None
+    """
+
+    def process_batch(self, conn, items, threadNumber):
+        # Get the current time
+        stime = time.perf_counter_ns()
+
+        # Get all cached values in one round trip, missing keys come back as None
+        values = conn.mget([key for key, _ in items])
+        misses = []
+        for (key, count), value in zip(items, values):
+            if value is None:
+                misses.append((key, count))
+            else:
+                self.log_cache(threadNumber, count, stime, key,
+                               self.decode_value(value, threadNumber), True)
+
+        if not misses:
+            return
+
+        misses, repeats = self.split_repeats(misses)
+        if self.single_flight:
+            # leases are per key, so misses are filled one at a time
+            fetched = {}
+            for key, count in misses:
+                fetched[key] = self.lease_fetch(conn, key, threadNumber)
+                self.log_cache(threadNumber, count, stime, key, fetched[key], False)
+        else:
+            # Fetch all missing values in one query and set them in one round trip
+            fetched = fetch_data_many(self.SourceTable, [key for key, _ in misses], self.Session)
+            if fetched:
+                pipe = conn.pipeline(transaction=False)
+                self.store_many(pipe, {key: self.encode_value(value, threadNumber)
+                                       for key, value in fetched.items()})
+                pipe.execute()
+            for key, count in misses:
+                self.log_cache(threadNumber, count, stime, key, fetched.get(key), False)
+
+        # repeats of a key are served by its fetch
+        for key, count in repeats:
+            value = fetched.get(key)
+            self.log_cache(threadNumber, count, stime, key, value, value is not None)
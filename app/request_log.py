@@ -0,0 +1,349 @@
+"""
+Request log pipeline.
+
+Workers append records to a buffer of their own thread, a set of preallocated arrays, and
+hand a full buffer to the writer thread in one queue put. The queue is bounded, so a
+writer that falls behind slows the workers down instead of growing memory, and the time
+workers spend waiting on it is reported. Written buffers go back to a free list for reuse.
+
+The writer produces the CSV log gen_test_stats.py reads, or a compact binary log of one
+column block per buffer which this module converts back to CSV:
+
+    python request_log.py LOG.bin [OUT.log]
+"""
+
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from cache_enum import CacheType, EvictionPolicyType
+
+CSV_HEADER = "cache_action,thread_number,count,delta_time,pool_wait,timestamp,tier,key,value\n"
+LOG_FORMATS = ("csv", "binary")
+# where a request was served from, by tier code. Single tier caches log source or cache,
+# a near cache logs l1, l2 or source
+TIERS = ("source", "cache", "l1", "l2")
+TIER_SOURCE, TIER_CACHE, TIER_L1, TIER_L2 = range(len(TIERS))
+BINARY_MAGIC = b"RLOG2\n"
+# binary logs written before the tier column
+BINARY_MAGIC_V1 = b"RLOG1\n"
+# record count of a binary block, followed by the columns in native byte order
+BLOCK_HEADER = struct.Struct("<I")
+TEXT_HEADER = struct.Struct("<I")
+# log names end in the start time (day, month, year, hour and minute) and the cache type
+LOG_DATE_FORMAT = "%d_%m_%Y_%H_%M"
+LOG_DATE_PARTS = LOG_DATE_FORMAT.count("_") + 1
+# log labels: Python cache policies, Postgres fast path, asyncio and near cache L2 names,
+# optionally followed by a -r<rate> request rate and a -p<count> process count
+LABEL_WORDS = ([policy.value for policy in EvictionPolicyType]
+               + ["fast", "asyncio", CacheType.REDIS.name.lower(), CacheType.MEMCACHE.name.lower()])
+LABEL_SUFFIX = r"(?:r[0-9.e+-]+|p[0-9]+)"
+LABEL_PATTERN = re.compile(
+    rf"(?:{'|'.join(map(re.escape, LABEL_WORDS))}|{LABEL_SUFFIX})(?:-{LABEL_SUFFIX})*")
+
+
+class RecordBuffer:
+    """
+    Fixed capacity column buffer of request records.
+
+    Attributes:
+        hits (array): 1 for a hit, 0 for a miss.
+        thread_numbers (array): Worker thread or task numbers.
+        counts (array): Global request counts.
+        delta_times (array): Request latencies in milliseconds.
+        pool_waits (array): Connection checkout times in milliseconds.
+        timestamps (array): Unix times the requests ended, in seconds.
+        tiers (array): Tier codes, indexes into TIERS.
+        keys (list): Request keys.
+        values (list): Logged values as text.
+        length (int): Number of records in use.
+    """
+
+    __slots__ = ("hits", "thread_numbers", "counts", "delta_times", "pool_waits",
+                 "timestamps", "tiers", "keys", "values", "length")
+
+    def __init__(self, capacity):
+        self.hits = array('B', bytes(capacity))
+        self.thread_numbers = array('I', [0]) * capacity
+        self.counts = array('q', [0]) * capacity
+        self.delta_times = array('d', [0.0]) * capacity
+        self.pool_waits = array('d', [0.0]) * capacity
+        self.timestamps = array('d', [0.0]) * capacity
+        self.tiers = array('B', bytes(capacity))
+        self.keys = [None] * capacity
+        self.values = [None] * capacity
+        self.length = 0
+
+    def rows(self):
+        """
+        Yields the records as (hit, thread number, count, delta time, pool wait, timestamp,
+        tier, key, value).
+        """
+        for i in range(self.length):
+            yield (bool(self.hits[i]), self.thread_numbers[i], self.counts[i],
+                   self.delta_times[i], self.pool_waits[i], self.timestamps[i],
+                   self.tiers[i], self.keys[i], self.values[i])
+
+
+class RequestLog:
+    """
+    Per thread record buffers, a bounded handoff queue and the writer loop.
+
+    Attributes:
+        log_format (str): "csv" or "binary".
+        buffer_size (int): Records per buffer.
+        batches (int): Buffers handed to the writer.
+        records (int): Records handed to the writer.
+        full_waits (int): Handoffs that found the queue full.
+        wait_ns (int): Time workers waited on a full queue.
+        max_depth (int): Largest queue length seen at a handoff.
+    """
+
+    def __init__(self, log_format="csv", buffer_size=1024, queue_size=64):
+        if log_format not in LOG_FORMATS:
+            raise ValueError("Invalid log format. Supported formats are: {}".format(LOG_FORMATS))
+        if buffer_size < 1 or queue_size < 1:
+            raise ValueError("buffer_size and queue_size must be at least 1")
+        self.log_format = log_format
+        self.buffer_size = buffer_size
+        self.batch_queue = queue.Queue(maxsize=queue_size)
+        self.free_buffers = queue.SimpleQueue()
+        self.local = threading.local()
+        # every buffer handed out, so close can flush those of finished threads
+        self.thread_buffers = []
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.records = 0
+        self.full_waits = 0
+        self.wait_ns = 0
+        self.max_depth = 0
+
+    def thread_buffer(self):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            buffer = self.new_buffer()
+            with self.lock:
+                self.thread_buffers.append(buffer)
+        return buffer
+
+    def new_buffer(self):
+        try:
+            buffer = self.free_buffers.get_nowait()
+        except queue.Empty:
+            buffer = RecordBuffer(self.buffer_size)
+        self.local.buffer = buffer
+        return buffer
+
+    def record(self, hit, thread_number, count, delta_time, pool_wait, timestamp, tier, key,
+               value):
+        """
+        Appends a request record to the buffer of the calling thread.
+        """
+        buffer = self.thread_buffer()
+        i = buffer.length
+        buffer.hits[i] = hit
+        buffer.thread_numbers[i] = thread_number
+        buffer.counts[i] = count
+        buffer.delta_times[i] = delta_time
+        buffer.pool_waits[i] = pool_wait
+        buffer.timestamps[i] = timestamp
+        buffer.tiers[i] = tier
+        buffer.keys[i] = key
+        buffer.values[i] = value
+        buffer.length = i + 1
+        if buffer.length == self.buffer_size:
+            self.hand_off(buffer)
+            with self.lock:
+                self.thread_buffers.remove(buffer)
+            self.local.buffer = None
+
+    def hand_off(self, buffer):
+        """
+        Queues a buffer for the writer, waiting while the queue is full.
+        """
+        depth = self.batch_queue.qsize()
+        with self.lock:
+            self.batches += 1
+            self.records += buffer.length
+            self.max_depth = max(self.max_depth, depth)
+        try:
+            self.batch_queue.put_nowait(buffer)
+        except queue.Full:
+            stime = time.perf_counter_ns()
+            self.batch_queue.put(buffer)
+            with self.lock:
+                self.full_waits += 1
+                self.wait_ns += time.perf_counter_ns() - stime
+
+    def close(self):
+        """
+        Hands the partly filled buffers to the writer and tells it to stop.
+
+        Must only be called once every thread that records has finished.
+        """
+        with self.lock:
+            buffers, self.thread_buffers = self.thread_buffers, []
+        for buffer in buffers:
+            if buffer.length:
+                self.hand_off(buffer)
+        self.batch_queue.put(None)
+
+    def write(self, log_path):
+        """
+        Writes handed off buffers to the log file until close is called.
+        """
+        mode = 'wb' if self.log_format == "binary" else 'w'
+        with open(log_path, mode) as log_file:
+            if self.log_format == "binary":
+                log_file.write(BINARY_MAGIC)
+            else:
+                log_file.write(CSV_HEADER)
+            while True:
+                buffer = self.batch_queue.get()
+                if buffer is None:
+                    break
+                if self.log_format == "binary":
+                    write_binary_block(log_file, buffer)
+                else:
+                    log_file.write("".join(map(csv_line, buffer.rows())))
+                buffer.length = 0
+                self.free_buffers.put(buffer)
+
+    def stats(self):
+        return {"batches": self.batches,
+                "records": self.records,
+                "full_waits": self.full_waits,
+                "wait_ms": self.wait_ns / 1e6,
+                "max_depth": self.max_depth}
+
+
+def log_file_name(trace_name, label, date, cache_type, extension="log"):
+    """
+    Builds a request log file name, trace_label_date_cachetype.extension or without a
+    label trace_date_cachetype.extension.
+
+    Parameters:
+    - trace_name (str): Name of the trace file.
+    - label (str): Log label, empty or None for none.
+    - date (str): Start time formatted with LOG_DATE_FORMAT.
+    - cache_type (int or str): Cache type value.
+    - extension (str, optional): "log" or "bin". Defaults to "log".
+    """
+    name = f"{trace_name}_{label}" if label else trace_name
+    return f"{name}_{date}_{cache_type}.{extension}"
+
+
+def parse_log_name(file_name):
+    """
+    Splits a request log file name built by log_file_name.
+
+    The cache type and the date are taken from the right, so trace names may contain
+    underscores. The part before the date ends in a label when its last underscore
+    separated word is one of the labels the caches set (LABEL_PATTERN), so a trace name
+    that itself ends in such a word is read as having a label.
+
+    Returns:
+    - tuple: Trace name, label ('' for none), date and cache type value as strings.
+
+    Raises:
+    - ValueError: If the name has no date and cache type.
+    """
+    stem = file_name.rsplit('.', 1)[0]
+    tokens = stem.split('_')
+    if len(tokens) < LOG_DATE_PARTS + 2:
+        raise ValueError(f"{file_name} is not a request log name")
+    cache_type = tokens[-1]
+    date = '_'.join(tokens[-1 - LOG_DATE_PARTS:-1])
+    name_tokens = tokens[:-1 - LOG_DATE_PARTS]
+    label = ''
+    if len(name_tokens) > 1 and LABEL_PATTERN.fullmatch(name_tokens[-1]):
+        label = name_tokens.pop()
+    return '_'.join(name_tokens), label, date, cache_type
+
+
+def csv_line(row):
+    hit, thread_number, count, delta_time, pool_wait, timestamp, tier, key, value = row
+    return (f"{hit},{thread_number},{count},{delta_time:.4f},{pool_wait:.4f},"
+            f"{timestamp:.6f},{TIERS[tier]},{key},{value}\n")
+
+
+def write_text_column(log_file, texts):
+    data = "\n".join(texts).encode()
+    log_file.write(TEXT_HEADER.pack(len(data)))
+    log_file.write(data)
+
+
+def write_binary_block(log_file, buffer):
+    """
+    Writes a buffer as one block of columns.
+    """
+    n = buffer.length
+    log_file.write(BLOCK_HEADER.pack(n))
+    for column in (buffer.hits, buffer.thread_numbers, buffer.counts,
+                   buffer.delta_times, buffer.pool_waits, buffer.timestamps, buffer.tiers):
+        log_file.write(memoryview(column)[:n].tobytes())
+    write_text_column(log_file, buffer.keys[:n])
+    write_text_column(log_file, buffer.values[:n])
+
+
+def read_text_column(log_file, n):
+    (size,) = TEXT_HEADER.unpack(log_file.read(TEXT_HEADER.size))
+    return log_file.read(size).decode().split("\n") if n else []
+
+
+def read_binary_log(log_path):
+    """
+    Reads a binary request log.
+
+    Logs without the tier column get the tier of their hit column.
+
+    Yields:
+    - tuple: (hit, thread number, count, delta time, pool wait, timestamp, tier, key, value)
+      per record.
+    """
+    with open(log_path, 'rb') as log_file:
+        magic = log_file.read(len(BINARY_MAGIC))
+        if magic not in (BINARY_MAGIC, BINARY_MAGIC_V1):
+            raise ValueError(f"{log_path} is not a binary request log")
+        typecodes = ('B', 'I', 'q', 'd', 'd', 'd', 'B')
+        if magic == BINARY_MAGIC_V1:
+            typecodes = typecodes[:-1]
+        while True:
+            header = log_file.read(BLOCK_HEADER.size)
+            if not header:
+                break
+            (n,) = BLOCK_HEADER.unpack(header)
+            columns = []
+            for typecode in typecodes:
+                column = array(typecode)
+                column.frombytes(log_file.read(column.itemsize * n))
+                columns.append(column)
+            keys = read_text_column(log_file, n)
+            values = read_text_column(log_file, n)
+            hits, thread_numbers, counts, delta_times, pool_waits, timestamps = columns[:6]
+            tiers = columns[6] if len(columns) > 6 else hits
+            for i in range(n):
+                yield (bool(hits[i]), thread_numbers[i], counts[i], delta_times[i],
+                       pool_waits[i], timestamps[i], tiers[i], keys[i], values[i])
+
+
+def binary_log_to_csv(log_path, csv_path):
+    """
+    Converts a binary request log to the CSV log format.
+    """
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write(CSV_HEADER)
+        csv_file.write("".join(map(csv_line, read_binary_log(log_path))))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("usage: request_log.py LOG.bin [OUT.log]")
+        sys.exit(1)
+    binary_path = sys.argv[1]
+    csv_path = sys.argv[2] if len(sys.argv) == 3 else binary_path.rsplit(".", 1)[0] + ".log"
+    binary_log_to_csv(binary_path, csv_path)
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from async_cache import AsyncCache
+
+
+class FailingCache(AsyncCache):
+    """
+    Async cache whose requests of one key fail, built without a backend.
+    """
+
+    def __init__(self, failing_key):
+        self.failing_key = failing_key
+        self.processed = []
+
+    async def process_key_async(self, conn, key, count, task_number):
+        if key == self.failing_key:
+            raise Exception(f"request {count} failed")
+        self.processed.append(key)
+
+
+def test_worker_raises_failure_after_draining():
+    cache = FailingCache("b")
+
+    async def run():
+        requests = asyncio.Queue()
+        for count, key in enumerate(["a", "b", "c", "b"]):
+            requests.put_nowait((key, count))
+        requests.put_nowait(None)
+        with pytest.raises(Exception, match="request 1 failed"):
+            await cache.async_worker(None, requests, 0)
+        return requests.empty()
+
+    assert (asyncio.run(run()))
+    assert (cache.processed == ["a"])
@@ -0,0 +1,142 @@
+import threading
+import zlib
+
+import pytest
+
+from cache import Cache
+from dispatcher import Dispatcher
+
+
+class LeaseCache(Cache):
+    """
+    Cache with in-memory single flight hooks, built without a database.
+    """
+
+    def __init__(self, lease_ms=1000, lease_poll_ms=1):
+        self.lease_ms = lease_ms
+        self.lease_poll_ms = lease_poll_ms
+        self.coalescer = None
+        self.flight_stats = [[0, 0, 0, 0.0]]
+        self.backend = {}
+        self.leases = set()
+        self.fetched = []
+
+    def fetch_source(self, key):
+        self.fetched.append(key)
+        return f"value-{key}"
+
+    def lookup_value(self, cache_conn, key, threadNumber):
+        return self.backend.get(key)
+
+    def store_value(self, cache_conn, key, value, threadNumber):
+        self.backend[key] = value
+
+    def acquire_lease(self, cache_conn, key):
+        if key in self.leases:
+            return False
+        self.leases.add(key)
+        return True
+
+    def release_lease(self, cache_conn, key):
+        self.leases.discard(key)
+
+
+def test_holder_fetches_and_stores():
+    cache = LeaseCache()
+    assert (cache.lease_fetch(None, "k", 0) == "value-k")
+    assert (cache.fetched == ["k"])
+    assert (cache.backend == {"k": "value-k"})
+    assert (cache.leases == set())
+    assert (cache.flight_stats[0][:3] == [1, 0, 0])
+
+
+def test_holder_reads_value_filled_after_its_miss():
+    cache = LeaseCache()
+    # the previous holder stored the value and released the lease after this worker missed
+    cache.backend["k"] = "value-k"
+    assert (cache.lease_fetch(None, "k", 0) == "value-k")
+    assert (cache.fetched == [])
+    assert (cache.leases == set())
+    assert (cache.flight_stats[0][:3] == [0, 1, 0])
+
+
+def test_holder_releases_lease_on_error():
+    cache = LeaseCache()
+
+    def fail(key):
+        raise Exception("source unavailable")
+
+    cache.fetch_source = fail
+    with pytest.raises(Exception, match="source unavailable"):
+        cache.lease_fetch(None, "k", 0)
+    assert (cache.leases == set())
+
+
+def test_waiter_gets_holder_value():
+    cache = LeaseCache()
+    cache.leases.add("k")
+    filler = threading.Timer(0.02, cache.store_value, args=(None, "k", "filled", 0))
+    filler.start()
+    assert (cache.lease_fetch(None, "k", 0) == "filled")
+    filler.join()
+    assert (cache.fetched == [])
+    fetches, waits, timeouts, wait_secs = cache.flight_stats[0]
+    assert ((fetches, waits, timeouts) == (0, 1, 0))
+    assert (wait_secs > 0)
+
+
+def test_waiter_fetches_after_lease_timeout():
+    cache = LeaseCache(lease_ms=20)
+    cache.leases.add("k")
+    assert (cache.lease_fetch(None, "k", 0) == "value-k")
+    assert (cache.fetched == ["k"])
+    assert (cache.backend == {"k": "value-k"})
+    fetches, waits, timeouts, wait_secs = cache.flight_stats[0]
+    assert ((fetches, waits, timeouts) == (1, 0, 1))
+    assert (wait_secs >= 0.02)
+
+
+class FailingWorkerCache(Cache):
+    """
+    Cache whose worker 1 fails on its first request, built without a database.
+    """
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.batch_size = 1
+        self.processed = []
+
+    def process_key(self, cache_conn, key, count, threadNumber):
+        if threadNumber == 1:
+            raise Exception("worker failed")
+        self.processed.append(count)
+
+
+def test_failed_worker_does_not_block_affinity_producer():
+    dispatcher = Dispatcher(2, chunk_size=1, affinity=True, max_chunks=2)
+    cache = FailingWorkerCache(dispatcher)
+    errors = []
+
+    def worker(thread_number):
+        try:
+            cache.cache_worker(thread_number)
+        except Exception as e:
+            errors.append(e)
+
+    def produce():
+        for count in range(100):
+            dispatcher.put(str(count), count)
+        dispatcher.close()
+
+    threads = [threading.Thread(target=worker, args=(thread_number,), daemon=True)
+               for thread_number in range(2)]
+    threads.append(threading.Thread(target=produce, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert (not any(thread.is_alive() for thread in threads))
+    assert ([str(e) for e in errors] == ["worker failed"])
+    # worker 0 still processed every request of its keys
+    assert (cache.processed == [count for count in range(100)
+                                if zlib.crc32(str(count).encode()) % 2 == 0])
@@ -0,0 +1,15 @@
+import pytest
+
+from cache_enum import CacheType, ReplayEngine
+from cache_factory import create_cache
+
+
+@pytest.mark.parametrize("option", [
+    {"thread_count": 4}, {"batch_size": 8}, {"single_flight": True}, {"lease_ms": 50},
+    {"coalesce_ms": 1}, {"coalesce_keys": 8}, {"max_size": 1024}])
+def test_asyncio_rejects_unsupported_options(option):
+    arguments = {"thread_count": 1, **option}
+    thread_count = arguments.pop("thread_count")
+    with pytest.raises(ValueError, match=list(option)[0]):
+        create_cache(CacheType.REDIS, thread_count, "trace", ".", "source",
+                     engine=ReplayEngine.ASYNCIO, **arguments)
@@ -0,0 +1,38 @@
+import random
+import pytest
+
+from cache_enum import CodecType
+from codec import create_codec, RawCodec, ZlibCodec
+
+
+@pytest.mark.parametrize("codec_type", list(CodecType))
+@pytest.mark.parametrize("compress_threshold", [0, 1])
+def test_round_trip(codec_type, compress_threshold):
+    codec = create_codec(codec_type, compress_threshold)
+    value = random.randbytes(64).hex()
+    data = codec.encode(value)
+    assert isinstance(data, bytes)
+    assert codec.decode(data) == value
+
+
+@pytest.mark.parametrize("codec_type", list(CodecType))
+def test_missing_value(codec_type):
+    codec = create_codec(codec_type)
+    assert codec.decode(codec.encode(None)) is None
+
+
+def test_raw_halves_hex():
+    value = random.randbytes(32).hex()
+    assert len(RawCodec().encode(value)) == 32
+
+
+def test_zlib_threshold():
+    codec = create_codec(CodecType.JSON, 100)
+    assert isinstance(codec, ZlibCodec)
+    assert codec.name == "json+zlib"
+    small = random.randbytes(16).hex()
+    assert codec.encode(small)[1:] == create_codec(CodecType.JSON).encode(small)
+    # a hex string in JSON uses half of each byte, so it compresses
+    large = random.randbytes(1024).hex()
+    assert len(codec.encode(large)) < len(large)
+    assert codec.decode(codec.encode(large)) == large
@@ -0,0 +1,42 @@
+import threading
+import time
+
+from connection_pool import BlockingObjectPool, PoolWaitTimer
+
+
+class Dummy:
+    pass
+
+
+def test_wait_timer_is_per_thread():
+    timer = PoolWaitTimer()
+    timer.add(2_000_000)
+    other = []
+    worker = threading.Thread(target=lambda: other.append(timer.take()))
+    worker.start()
+    worker.join()
+    assert other == [0]
+    assert timer.take() == 2.0
+    assert timer.take() == 0
+
+
+def test_blocking_pool_waits_for_release():
+    timer = PoolWaitTimer()
+    pool = BlockingObjectPool(Dummy, timer, 1)
+    first = pool.get()
+    timer.take()
+    got = []
+
+    def checkout():
+        got.append(pool.get())
+        got.append(timer.take())
+
+    worker = threading.Thread(target=checkout)
+    worker.start()
+    time.sleep(0.05)
+    # the second checkout blocks instead of raising while the only object is in use
+    assert got == []
+    pool.release(first)
+    worker.join()
+    assert got[0] is first
+    assert got[1] >= 40
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from dispatcher import Dispatcher
+
+
+def drain(dispatcher, worker):
+    return list(dispatcher.worker_chunks(worker))
+
+
+def test_chunks_and_sentinel():
+    dispatcher = Dispatcher(1, chunk_size=3)
+    for count in range(1, 8):
+        dispatcher.put(str(count), count)
+    dispatcher.close()
+    chunks = drain(dispatcher, 0)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [count for chunk in chunks for _, count in chunk] == list(range(1, 8))
+    assert dispatcher.stats()["requests"] == 7
+
+
+def test_affinity_keeps_keys_on_one_worker():
+    dispatcher = Dispatcher(3, chunk_size=4, affinity=True, max_chunks=100)
+    for count in range(1, 301):
+        dispatcher.put(str(count % 17), count)
+    dispatcher.close()
+    owners = {}
+    for worker in range(3):
+        for chunk in drain(dispatcher, worker):
+            for key, count in chunk:
+                owners.setdefault(key, set()).add(worker)
+    assert len(owners) == 17
+    assert all(len(workers) == 1 for workers in owners.values())
+
+
+def test_workers_stop_at_the_end_of_the_trace():
+    dispatcher = Dispatcher(4, chunk_size=8, max_chunks=2)
+    seen = [[] for _ in range(4)]
+    workers = [threading.Thread(target=lambda worker=worker: seen[worker].extend(
+        count for chunk in dispatcher.worker_chunks(worker) for _, count in chunk))
+        for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    # two slots for 1000 chunks, the producer keeps waiting for the workers
+    for count in range(1, 8001):
+        dispatcher.put("k", count)
+    dispatcher.close()
+    for worker in workers:
+        worker.join(timeout=5)
+    assert not any(worker.is_alive() for worker in workers)
+    assert sorted(count for counts in seen for count in counts) == list(range(1, 8001))
+
+
+def test_retry_goes_before_the_sentinel():
+    dispatcher = Dispatcher(1)
+    dispatcher.put("a", 1)
+    dispatcher.close()
+    assert dispatcher.get_chunk(0) == [("a", 1)]
+    dispatcher.retry(0, "a", 1)
+    assert drain(dispatcher, 0) == [[("a", 1)]]
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        Dispatcher(0)
+    with pytest.raises(ValueError):
+        Dispatcher(2, chunk_size=0)
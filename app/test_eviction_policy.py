@@ -0,0 +1,131 @@
+import pytest
+
+from cache_enum import EvictionPolicyType
+from python_cache import LRUCache, ShardedLRUCache
+
+
+def fill(cache, keys, size=2):
+    for key in keys:
+        cache.set_cache(key, bytes(size))
+
+
+@pytest.mark.parametrize("policy_type", list(EvictionPolicyType))
+def test_respects_max_size(policy_type):
+    t1 = LRUCache(10, policy_type)
+    fill(t1, ["k_" + str(i) for i in range(50)])
+    for i in range(0, 50, 3):
+        t1.get_from_cache("k_" + str(i))
+    fill(t1, ["j_" + str(i) for i in range(50)], 3)
+    assert (t1.size <= 10)
+    assert (t1.size == sum(len(e.value) for e in t1.cache_d.values()))
+    assert (len(t1.policy) == len(t1.cache_d))
+
+
+@pytest.mark.parametrize("policy_type", list(EvictionPolicyType))
+def test_replace_value(policy_type):
+    t1 = LRUCache(10, policy_type)
+    fill(t1, ["k1", "k2"])
+    t1.set_cache("k1", b"abcd")
+    assert (t1.get_from_cache("k1") == b"abcd")
+    assert (t1.size == 6)
+    assert (len(t1.policy) == 2)
+
+
+def test_arc_ghost_hit_goes_to_t2():
+    t1 = LRUCache(10, EvictionPolicyType.ARC)
+    fill(t1, ["k_" + str(i) for i in range(5)])
+    t1.get_from_cache("k_3")
+    t1.get_from_cache("k_4")
+    t1.set_cache("k_5", bytes(2))
+
+    # k_0 was evicted from T1 into the B1 ghost list
+    assert (t1.get_from_cache("k_0") is None)
+    assert ("k_0" in t1.policy.b1)
+
+    t1.set_cache("k_0", bytes(2))
+    assert (t1.cache_d["k_0"].frequent)
+    assert (t1.policy.p > 0)
+
+
+def test_two_q_scan_keeps_main():
+    t1 = LRUCache(10, EvictionPolicyType.TWO_Q)
+    fill(t1, ["hot"])
+    # push hot out of A1in, then bring it back into the main queue
+    fill(t1, ["s_" + str(i) for i in range(5)])
+    t1.set_cache("hot", bytes(2))
+    assert (t1.cache_d["hot"].in_main)
+
+    fill(t1, ["scan_" + str(i) for i in range(20)])
+    assert (t1.get_from_cache("hot") is not None)
+
+
+@pytest.mark.parametrize("policy_type", [EvictionPolicyType.CLOCK, EvictionPolicyType.SIEVE])
+def test_visited_entry_survives(policy_type):
+    t1 = LRUCache(10, policy_type)
+    fill(t1, ["k_" + str(i) for i in range(5)])
+    t1.get_from_cache("k_0")
+
+    t1.set_cache("new", bytes(2))
+    assert (t1.get_from_cache("k_0") is not None)
+    assert (t1.get_from_cache("k_1") is None)
+
+
+def test_sieve_hit_does_not_move_entry():
+    t1 = LRUCache(10, EvictionPolicyType.SIEVE)
+    fill(t1, ["k_" + str(i) for i in range(5)])
+    back = t1.policy.queue.back()
+    t1.get_from_cache(back.key)
+    assert (t1.policy.queue.back() is back)
+    assert (back.visited)
+
+
+def test_sharded_lock_free_hits():
+    t1 = ShardedLRUCache(40, 4, EvictionPolicyType.SIEVE)
+    assert (all(shard.lock_free_hits for shard in t1.shards))
+    t1.get_or_load("k1", lambda key: b"ab")
+    assert (t1.get_or_load("k1", lambda key: None) == (b"ab", True))
+
+
+@pytest.mark.parametrize("policy_type, min_hot", [
+    (EvictionPolicyType.LRU, 0), (EvictionPolicyType.W_TINYLFU, 45)])
+def test_tinylfu_rejects_one_hit_wonders(policy_type, min_hot):
+    t1 = LRUCache(200, policy_type)
+    hot = ["hot_" + str(i) for i in range(50)]
+    for _ in range(5):
+        for key in hot:
+            if t1.get_from_cache(key) is None:
+                t1.set_cache(key, bytes(2))
+
+    for i in range(1000):
+        key = "scan_" + str(i)
+        if t1.get_from_cache(key) is None:
+            t1.set_cache(key, bytes(2))
+
+    # sketch collisions may let a few scan keys win against hot keys
+    hot_kept = sum(1 for key in hot if key in t1.cache_d)
+    assert (hot_kept >= min_hot)
+    if policy_type == EvictionPolicyType.LRU:
+        assert (hot_kept == 0)
+
+
+def test_gdsf_keeps_small_hot_entries():
+    t1 = LRUCache(20, EvictionPolicyType.GDSF)
+    for key in ["small_" + str(i) for i in range(5)]:
+        t1.set_cache(key, bytes(2))
+        t1.get_from_cache(key)
+
+    t1.set_cache("large", bytes(10))
+    t1.set_cache("large2", bytes(10))
+
+    # the large cold value is evicted rather than several small hot ones
+    assert (t1.get_from_cache("large") is None)
+    assert (all(t1.has("small_" + str(i)) for i in range(5)))
+
+
+def test_gdsf_compacts_stale_heap_items():
+    t1 = LRUCache(1000, EvictionPolicyType.GDSF)
+    t1.set_cache("k1", bytes(2))
+    for _ in range(5000):
+        t1.get_from_cache("k1")
+    assert (len(t1.policy.heap) <= t1.policy.COMPACT_MIN + 1)
+    assert (t1.policy.compactions > 0)
@@ -0,0 +1,63 @@
+import threading
+import time
+import pytest
+
+from fetch_coalescer import FetchCoalescer
+
+
+class SlowSource:
+    def __init__(self):
+        self.queries = []
+
+    def fetch_many(self, keys):
+        self.queries.append(list(keys))
+        time.sleep(0.01)
+        return {key: "v_" + key for key in keys if key != "missing"}
+
+
+def fetch_all(coalescer, keys):
+    results = {}
+
+    def worker(index, key):
+        results[index] = coalescer.fetch(key)
+
+    threads = [threading.Thread(target=worker, args=(index, key))
+               for index, key in enumerate(keys)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [results[index] for index in range(len(keys))]
+
+
+def test_concurrent_misses_share_queries():
+    source = SlowSource()
+    coalescer = FetchCoalescer(source.fetch_many, window_ms=50, max_keys=1000)
+    keys = [str(i % 20) for i in range(100)] + ["missing"]
+    assert fetch_all(coalescer, keys) == ["v_" + key for key in keys[:-1]] + [None]
+    # every key is fetched once and far fewer queries than misses run
+    fetched = [key for query in source.queries for key in query]
+    assert sorted(fetched) == sorted(set(keys))
+    assert len(source.queries) <= 5
+    stats = coalescer.stats()
+    assert stats["requests"] == 101
+    assert stats["deduped"] == 101 - len(fetched)
+    assert not coalescer.pending
+
+
+def test_full_batch_does_not_wait():
+    source = SlowSource()
+    coalescer = FetchCoalescer(source.fetch_many, window_ms=10000, max_keys=4)
+    stime = time.time()
+    assert fetch_all(coalescer, ["a", "b", "c", "d"]) == ["v_a", "v_b", "v_c", "v_d"]
+    assert time.time() - stime < 5
+
+
+def test_errors_reach_every_waiter():
+    def broken(keys):
+        raise RuntimeError("source down")
+
+    coalescer = FetchCoalescer(broken, window_ms=1)
+    with pytest.raises(RuntimeError, match="source down"):
+        coalescer.fetch("a")
+    assert not coalescer.pending
@@ -0,0 +1,30 @@
+from frequency_sketch import CountMinSketch, MAX_COUNT
+
+
+def test_counts_and_saturates():
+    sketch = CountMinSketch(64)
+    for _ in range(3):
+        sketch.increment("k1")
+    assert (sketch.frequency("k1") >= 3)
+    assert (sketch.frequency("never") <= sketch.frequency("k1"))
+
+    for _ in range(MAX_COUNT + 5):
+        sketch.increment("k2")
+    assert (sketch.frequency("k2") == MAX_COUNT)
+
+
+def test_reset_halves():
+    sketch = CountMinSketch(64)
+    for _ in range(8):
+        sketch.increment("k1")
+    sketch.reset()
+    assert (sketch.frequency("k1") == 4)
+    assert (sketch.resets == 1)
+
+
+def test_ages_after_sample():
+    sketch = CountMinSketch(16, sample_factor=1)
+    for i in range(sketch.sample_size):
+        sketch.increment("k" + str(i))
+    assert (sketch.resets == 1)
+    assert (sketch.memory_bytes() == 4 * 16)
@@ -0,0 +1,38 @@
+import random
+
+from latency_histogram import LatencyHistogram, bucket_index, bucket_value, MAX_NS
+
+
+def test_buckets_are_precise():
+    for value in [0, 1, 255, 256, 1000, 123456, 10 ** 9, MAX_NS]:
+        assert abs(bucket_value(bucket_index(value)) - value) <= value / 128
+
+
+def test_percentiles_match_sorted_values():
+    rng = random.Random(3)
+    values = [int(rng.lognormvariate(12, 1.5)) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for percent in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * percent / 100) - 1]
+        assert abs(histogram.percentile(percent) - exact) <= exact / 64
+    assert histogram.percentile(100) == values[-1] == histogram.max
+    assert histogram.count == len(values)
+
+
+def test_merge():
+    first = LatencyHistogram()
+    second = LatencyHistogram()
+    for value in range(1, 1001):
+        (first if value % 2 else second).record(value * 1000)
+    first.merge(second)
+    assert first.count == 1000
+    assert first.max == 1000000
+    assert abs(first.percentile(50) - 500000) <= 500000 / 128
+    assert first.mean() == 500500
+
+
+def test_empty():
+    assert LatencyHistogram().percentile(99) == 0
@@ -0,0 +1,58 @@
+import itertools
+
+import pytest
+
+from dispatcher import Dispatcher
+from load_generator import arrival_offsets, feed_open_loop, label_rate, sustainable_rate
+
+
+class FakeCache:
+    def __init__(self):
+        self.dispatcher = Dispatcher(1)
+        self.scheduled_ns = {}
+        self.log_label = None
+
+
+def test_fixed_arrivals_are_evenly_spaced():
+    offsets = list(itertools.islice(arrival_offsets(1000), 4))
+    assert offsets == [0, 1_000_000, 2_000_000, 3_000_000]
+
+
+def test_poisson_arrivals_keep_the_mean_rate():
+    offsets = list(itertools.islice(arrival_offsets(1000, "poisson", seed=3), 20001))
+    gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+    assert len(set(gaps)) > 1000
+    assert sum(gaps) / len(gaps) == pytest.approx(1_000_000, rel=0.05)
+    assert offsets == list(itertools.islice(arrival_offsets(1000, "poisson", seed=3), 20001))
+
+
+def test_invalid_arrivals():
+    with pytest.raises(ValueError):
+        next(arrival_offsets(0))
+    with pytest.raises(ValueError):
+        next(arrival_offsets(10, "bursty"))
+
+
+def test_feed_open_loop_registers_due_times():
+    cache = FakeCache()
+    stats = feed_open_loop(cache, ["a", "b", "c"], 500)
+    assert stats["sent"] == 3
+    # every request is dispatched on its own, when it is due
+    assert [cache.dispatcher.get_chunk(0) for _ in range(3)] == [[("a", 1)], [("b", 2)],
+                                                                  [("c", 3)]]
+    due = [cache.scheduled_ns[count] for count in (1, 2, 3)]
+    assert [b - a for a, b in zip(due, due[1:])] == [2_000_000, 2_000_000]
+
+
+def test_label_rate():
+    cache = FakeCache()
+    assert label_rate(cache, 2000.0).log_label == "r2000"
+    cache.log_label = "lru"
+    assert label_rate(cache, 500).log_label == "lru-r500"
+
+
+def test_sustainable_rate():
+    rows = [{"rate": 100, "p99_ms": 1.0}, {"rate": 400, "p99_ms": 30.0},
+            {"rate": 200, "p99_ms": 4.0}]
+    assert sustainable_rate(rows, 5.0) == 200
+    assert sustainable_rate(rows, 0.5) is None
@@ -0,0 +1,79 @@
+import random
+import pytest
+
+from mrc import FenwickTree, miss_ratio_curve
+from python_cache import LRUCache
+from trace_file import BLOCK_BYTES
+
+
+@pytest.fixture
+def random_trace():
+    rng = random.Random(7)
+    blocks = {}
+    requests = []
+    for _ in range(3000):
+        key = str(int(rng.paretovariate(0.8)) % 400)
+        num_blocks = blocks.setdefault(key, rng.choice([1, 2, 4]))
+        requests.append((key, num_blocks))
+    return requests
+
+
+def lru_hit_rate(requests, max_size):
+    t1 = LRUCache(max_size)
+    hits = 0
+    for key, num_blocks in requests:
+        if t1.get_from_cache(key) is not None:
+            hits += 1
+        else:
+            t1.set_cache(key, bytes(BLOCK_BYTES * num_blocks))
+    return hits / len(requests)
+
+
+def test_fenwick_grows():
+    tree = FenwickTree(2)
+    for position in range(1, 11):
+        tree.add(position, position)
+    assert (tree.capacity == 16)
+    assert (tree.prefix_sum(10) == 55)
+    assert (tree.prefix_sum(4) == 10)
+
+
+def test_matches_lru_replay(random_trace):
+    sizes = [64, 256, 1024, 4096, 16384]
+    rows = miss_ratio_curve(random_trace, sizes)
+    for size, hit_rate in rows:
+        assert (hit_rate == pytest.approx(lru_hit_rate(random_trace, size)))
+
+
+def test_mixed_block_counts_keep_first_size():
+    # a recurs with 4 blocks but stays a one block value
+    rows = miss_ratio_curve([('z', 1), ('a', 1), ('a', 4), ('z', 1)], [16, 32, 48, 64])
+    assert (rows == [(16, 0.25), (32, 0.5), (48, 0.5), (64, 0.5)])
+
+    rng = random.Random(3)
+    requests = [(str(rng.randint(0, 60)), rng.choice([1, 2, 4])) for _ in range(2000)]
+    first_blocks = {}
+    for key, num_blocks in requests:
+        first_blocks.setdefault(key, num_blocks)
+    sized = [(key, first_blocks[key]) for key, _ in requests]
+    sizes = [256, 512, 1024, 2048]
+    for size, hit_rate in miss_ratio_curve(requests, sizes):
+        assert (hit_rate == pytest.approx(lru_hit_rate(sized, size)))
+
+
+def test_default_sizes_cover_trace(random_trace):
+    rows = miss_ratio_curve(random_trace)
+    assert (rows[0][0] == 1024)
+    unique = len(set(key for key, _ in random_trace))
+    assert (rows[-1][1] == pytest.approx(1 - unique / len(random_trace)))
+
+
+def test_sampled_curve_close():
+    # sampling needs many keys with no single key dominating
+    rng = random.Random(11)
+    requests = [(str(rng.randint(0, 3000)), 1) for _ in range(30000)]
+    sizes = [4096, 16384, 32768]
+    exact = dict(miss_ratio_curve(requests, sizes))
+    sampled = dict(miss_ratio_curve(requests, sizes, sample_rate=0.25))
+    for size in sizes:
+        assert (abs(exact[size] - sampled[size]) < 0.05)
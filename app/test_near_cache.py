@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import source_value
+from near_cache import INVALIDATION_CHANNEL, NearCache, NearRedisCache
+from request_log import TIER_L1, TIER_L2, TIER_SOURCE
+
+
+def replay(cache, keys):
+    for count, key in enumerate(keys, 1):
+        cache.dispatcher.put(str(key), count)
+    cache.close()
+
+
+def tier_counts(cache):
+    return [sum(histograms[tier].count for histograms in cache.tier_histograms)
+            for tier in (TIER_L1, TIER_L2, TIER_SOURCE)]
+
+
+def test_tiers(source_table, fake_redis, tmp_path):
+    cache = NearRedisCache(1, "trace", str(tmp_path), source_table, prep=False,
+                           log_requests=False)
+    # another process already filled key 3
+    fake_redis.data["3"] = cache.codec.encode(source_value(3))
+    replay(cache, [1, 2, 1, 3, 3, 2])
+
+    # l1, l2 and source requests
+    assert (tier_counts(cache) == [3, 1, 2])
+    assert (cache.l1.get("3") == bytes.fromhex(source_value(3)))
+    for key in (1, 2, 3):
+        assert (cache.codec.decode(fake_redis.data[str(key)]) == source_value(key))
+
+
+def test_oversized_l1_values_are_read_from_l2(source_table, fake_redis, tmp_path):
+    # the 2 byte values do not fit 1 byte L1 segments
+    cache = NearRedisCache(1, "trace", str(tmp_path), source_table, prep=False,
+                           log_requests=False, l1_size=16, l1_shard_count=16)
+    replay(cache, [1, 1, 1])
+
+    assert (tier_counts(cache) == [0, 2, 1])
+    assert (cache.l1.stats()["oversized"] == 3)
+
+
+def test_only_stored_fills_are_published(source_table, fake_redis, tmp_path, monkeypatch):
+    monkeypatch.setattr(NearCache, "subscribe",
+                        lambda self: setattr(self, "publisher", fake_redis))
+    cache = NearRedisCache(1, "trace", str(tmp_path), source_table, prep=False,
+                           log_requests=False, invalidate=True, single_flight=True,
+                           lease_ms=200)
+
+    try:
+        # another worker holds the lease of key 1 and fills it
+        fake_redis.data["lease:1"] = 1
+        fake_redis.data["1"] = cache.codec.encode(source_value(1))
+        assert (cache.l2_fill(fake_redis, "1", 0) == source_value(1))
+        assert (fake_redis.published == [])
+
+        assert (cache.l2_fill(fake_redis, "2", 0) == source_value(2))
+        assert (fake_redis.published == [(INVALIDATION_CHANNEL, f"{cache.node_id} 2")])
+        assert (sum(cache.published) == 1)
+    finally:
+        # the workers are waiting for requests
+        cache.close()
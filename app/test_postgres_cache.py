@@ -0,0 +1,111 @@
+import threading
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.pool import QueuePool
+
+from cache import Cache
+from postgres_cache import PostgresCache
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.execute(sql, params)
+        if params is not None:
+            self.row = (False, params[0])
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeConnection:
+    """
+    psycopg connection that fails like Postgres on a second PREPARE of a statement.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.autocommit = False
+        self.prepared = False
+        self.threads = set()
+        self.executes = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def execute(self, sql, params):
+        if "PREPARE cache_lookup_fill" in sql and "DEALLOCATE" not in sql:
+            if self.prepared:
+                raise Exception('prepared statement "cache_lookup_fill" already exists')
+            self.prepared = True
+        elif sql.startswith("DEALLOCATE"):
+            self.prepared = False
+        else:
+            assert self.prepared
+            self.threads.add(threading.get_ident())
+            self.executes += 1
+            self.engine.first_execute()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self, thread_count):
+        self.connections = []
+        self.pool = QueuePool(self.connect, pool_size=thread_count, max_overflow=0)
+        self.dialect = postgresql.dialect()
+        self.max_checked_out = 0
+        self.local = threading.local()
+        self.barrier = threading.Barrier(thread_count, timeout=5)
+
+    def connect(self):
+        conn = FakeConnection(self)
+        self.connections.append(conn)
+        return conn
+
+    def raw_connection(self):
+        return self.pool.connect()
+
+    def first_execute(self):
+        # every worker holds its connection before any worker goes on
+        if not getattr(self.local, "waited", False):
+            self.local.waited = True
+            self.max_checked_out = max(self.max_checked_out, self.pool.checkedout())
+            self.barrier.wait()
+
+
+def test_fast_path_workers_keep_their_connections(source_table, tmp_path, monkeypatch):
+    monkeypatch.setattr(PostgresCache, "worker_threads", lambda self: None)
+    cache = PostgresCache(2, "trace", str(tmp_path), source_table, fast_path=True,
+                          prep=False, dispatch_chunk=1, affinity=True, log_requests=False)
+    engine = FakeEngine(2)
+    cache.engine = engine
+    Cache.worker_threads(cache)
+
+    # keys 0 to 3 go to worker 1 and 4 to 7 to worker 0
+    for count, key in enumerate(range(8)):
+        cache.dispatcher.put(str(key), count)
+    cache.close()
+
+    assert (cache.latency_histograms()[2].count == 8)
+    assert (engine.max_checked_out == 2)
+    assert (len(engine.connections) == 2)
+    for conn in engine.connections:
+        assert (conn.executes == 4)
+        assert (len(conn.threads) == 1)
+        assert (not conn.prepared)
+        assert (not conn.autocommit)
+    assert (engine.pool.checkedout() == 0)
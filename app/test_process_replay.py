@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+
+import pytest
+
+import process_replay
+from cache_enum import CacheType
+from process_replay import (LogOrderError, count_ordered, in_partition, merge_logs,
+                            merged_log_name, replay_processes)
+
+HEADER = "cache_action,thread_number,count,delta_time,pool_wait,timestamp,key,value\n"
+
+
+def write_log(path, rows):
+    with open(path, 'w') as log_file:
+        log_file.write(HEADER)
+        for row in rows:
+            log_file.write(row + '\n')
+    return str(path)
+
+
+@pytest.mark.parametrize("partition", ["rr", "hash"])
+def test_partitions_cover_trace_once(partition):
+    keys = [str(i % 37) for i in range(500)]
+    owners = [[index for index in range(4) if in_partition(key, count, index, 4, partition)]
+              for count, key in enumerate(keys, 1)]
+    assert all(len(owner) == 1 for owner in owners)
+
+
+def test_hash_partition_keeps_keys_together():
+    for key in map(str, range(100)):
+        owners = {index for count in range(1, 20) for index in range(3)
+                  if in_partition(key, count, index, 3, "hash")}
+        assert len(owners) == 1
+
+
+def test_merge_logs(tmp_path):
+    # logs are written in completion order, not count order
+    part0 = write_log(tmp_path / "a.log", ["True,1,3,0.1,k3,v", "False,0,1,0.2,k1,v,w"])
+    part1 = write_log(tmp_path / "b.log", ["False,0,2,0.3,k2,v", "True,0,4,0.4,k4,v"])
+    out_path = tmp_path / "merged.log"
+    assert merge_logs([part0, part1], out_path, 2) == 4
+    lines = out_path.read_text().splitlines()
+    assert lines[0] + '\n' == HEADER
+    assert lines[1:] == ["False,0,1,0.2,k1,v,w", "False,2,2,0.3,k2,v",
+                         "True,1,3,0.1,k3,v", "True,2,4,0.4,k4,v"]
+
+
+def test_count_ordered_window():
+    rows = [(count, str(count)) for count in [2, 1, 4, 3, 6, 5, 8, 7]]
+    assert list(count_ordered(iter(rows), 2)) == sorted(rows)
+    # 1 comes more than two rows after 4 was passed on
+    with pytest.raises(LogOrderError):
+        list(count_ordered(iter([(3, ""), (4, ""), (5, ""), (6, ""), (1, "")]), 2))
+
+
+def test_merge_logs_falls_back_to_sorting(tmp_path):
+    part0 = write_log(tmp_path / "a.log", [f"True,0,{count},0.1,k,v" for count in [5, 3, 1]])
+    part1 = write_log(tmp_path / "b.log", [f"True,0,{count},0.1,k,v" for count in [2, 4, 6]])
+    out_path = tmp_path / "merged.log"
+    assert merge_logs([part0, part1], out_path, 1, window=1) == 6
+    counts = [int(line.split(',')[2]) for line in out_path.read_text().splitlines()[1:]]
+    assert counts == [1, 2, 3, 4, 5, 6]
+
+
+def failing_create_cache(*args, **kwargs):
+    raise Exception("backend unavailable")
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the patched create_cache only reaches forked processes")
+def test_failed_first_process_aborts_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_replay, "create_cache", failing_create_cache)
+    stime = time.time()
+    with pytest.raises(Exception, match="replay process 0 exited with 1"):
+        replay_processes(3, "rr", CacheType.PYTHON_CACHE, 1, "trace.txt", str(tmp_path),
+                         "source")
+    assert time.time() - stime < 10
+
+
+def test_merged_log_name():
+    assert merged_log_name("t1_lru_01_02_2024_10_30_4.log", 4) == "t1_lru-p4_01_02_2024_10_30_4.log"
+    assert merged_log_name("t1_01_02_2024_10_30_2.log", 2) == "t1_p2_01_02_2024_10_30_2.log"
+    assert merged_log_name("my_trace_fast_01_02_2024_10_30_1.bin", 3) == "my_trace_fast-p3_01_02_2024_10_30_1.log"
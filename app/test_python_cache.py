@@ -1,7 +1,9 @@
 import random
+import threading
+import time
 import pytest
 
-from python_cache import LRUCache
+from python_cache import LRUCache, ShardedLRUCache
 
 @pytest.fixture
 def demo1_setup():
@@ -12,7 +14,7 @@ def test_empty(demo1_setup):
     t1 = demo1_setup
     assert(t1.size == 0)
     assert(len(t1.cache_d) == 0)
-    assert(t1.lru_queue.size == 0)
+    assert(len(t1.policy) == 0)
 
 def test_fail_oversized(demo1_setup):
     t1 = demo1_setup
@@ -87,4 +89,143 @@ def test_full_ejects(demo1_setup_full):
 
     # second least recently used key removed
     assert (t1.get_from_cache(kvs[1][0]) == None)
-    
+
+
+def test_sharded_load_then_hit():
+    t1 = ShardedLRUCache(40, 4)
+    value = random.randbytes(2)
+    assert (t1.get_or_load("k1", lambda key: value) == (value, False))
+    assert (t1.get_or_load("k1", lambda key: None) == (value, True))
+
+
+def test_sharded_fail_too_small():
+    with pytest.raises(Exception, match=ShardedLRUCache.SHARD_SIZE_EX_MSG):
+        ShardedLRUCache(3, 4)
+
+
+def test_sharded_serves_oversized_values_uncached():
+    # 100 bytes fit the cache but not one of its 64 byte segments
+    t1 = ShardedLRUCache(1024, 16)
+    value = b'x' * 100
+    assert (t1.get_or_load("k", lambda key: value) == (value, False))
+    assert (t1.get_or_load("k", lambda key: value) == (value, False))
+    t1.put("k2", b'y')
+    assert (t1.put("k2", value) == False)
+    assert (t1.get("k2") is None)
+    assert (t1.stats()["oversized"] == 3)
+    assert (t1.stats()["bytes"] == 0)
+
+
+def test_sharded_single_flight():
+    t1 = ShardedLRUCache(0, 4)
+    value = random.randbytes(2)
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def slow_loader(key):
+        loads.append(key)
+        started.set()
+        release.wait()
+        return value
+
+    results = []
+    first = threading.Thread(
+        target=lambda: results.append(t1.get_or_load("k1", slow_loader)))
+    first.start()
+    started.wait()
+
+    # second miss on the same key waits on the in-flight load
+    second = threading.Thread(
+        target=lambda: results.append(t1.get_or_load("k1", slow_loader)))
+    second.start()
+    time.sleep(0.05)
+    release.set()
+    first.join()
+    second.join()
+
+    assert (loads == ["k1"])
+    assert (results[0] == (value, False))
+    assert (results[1][0] == value)
+
+
+def test_sharded_load_error_clears_in_flight():
+    t1 = ShardedLRUCache(0, 1)
+
+    def failing_loader(key):
+        raise ValueError("source down")
+
+    with pytest.raises(ValueError):
+        t1.get_or_load("k1", failing_loader)
+    assert (t1.in_flight[0] == {})
+    assert (t1.get_or_load("k1", lambda key: b"ab") == (b"ab", False))
+
+
+@pytest.mark.parametrize("max_size", [0, 10])
+def test_remove(max_size):
+    t1 = LRUCache(max_size)
+    t1.set_cache("k1", b"abcd")
+    t1.set_cache("k2", b"ef")
+    assert (t1.remove("k1"))
+    assert (not t1.remove("k1"))
+    assert (t1.get_from_cache("k1") is None)
+    assert (t1.get_from_cache("k2") == b"ef")
+    if max_size:
+        assert (t1.size == 2)
+        assert (len(t1.policy) == 1)
+
+
+def test_sharded_get_and_remove():
+    t1 = ShardedLRUCache(100, 4)
+    assert (t1.get("k1") is None)
+    t1.put("k1", b"ab")
+    assert (t1.get("k1") == b"ab")
+    assert (t1.remove("k1"))
+    assert (t1.get("k1") is None)
+    assert (t1.stats()["bytes"] == 0)
+
+
+@pytest.mark.parametrize("max_size", [0, 10])
+def test_ttl_expires_lazily_on_get(max_size):
+    t1 = LRUCache(max_size, ttl_ms=1)
+    t1.set_cache("k1", b"ab")
+    t1.set_cache("k2", b"cd", ttl_ms=0)
+    assert (t1.get_from_cache("k1") == b"ab")
+    time.sleep(0.005)
+    assert (t1.get_from_cache("k1") is None)
+    assert ("k1" not in t1.cache_d)
+    assert (t1.get_from_cache("k2") == b"cd")
+    assert (t1.expired == 1)
+    if max_size:
+        assert (t1.size == 2)
+        assert (len(t1.policy) == 1)
+
+
+def test_ttl_reaps_with_the_timer_wheel():
+    t1 = LRUCache(100, ttl_ms=50)
+    for i in range(10):
+        t1.set_cache(f"k{i}", b"ab", ttl_ms=None if i % 2 else 0)
+    t1.set_cache("k1", b"ef")
+    assert (t1.expire() == 0)
+    assert (t1.expire(time.perf_counter_ns() + 60_000_000) == 5)
+    assert (sorted(t1.cache_d) == ["k0", "k2", "k4", "k6", "k8"])
+    assert (t1.size == 10)
+    assert (len(t1.timers) == 0)
+
+
+def test_evicted_entries_leave_the_timer_wheel():
+    t1 = LRUCache(4, ttl_ms=1000)
+    for i in range(5):
+        t1.set_cache(f"k{i}", b"ab")
+    assert (len(t1.cache_d) == 2)
+    assert (len(t1.timers) == 2)
+
+
+def test_sharded_ttl():
+    t1 = ShardedLRUCache(0, 4, ttl_ms=1)
+    assert (t1.get_or_load("k1", lambda key: b"ab") == (b"ab", False))
+    time.sleep(0.005)
+    # the expired copy is loaded again
+    assert (t1.get_or_load("k1", lambda key: b"cd") == (b"cd", False))
+    assert (t1.get("k1") == b"cd")
+    assert (t1.stats()["expired"] == 1)
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from conftest import source_value
+from redis_cache import RedisCache
+
+
+def read_log(log_dir):
+    """
+    Returns the hit column and value of every request in the log, by count.
+    """
+    (name,) = [name for name in os.listdir(log_dir) if name.endswith(".log")]
+    with open(os.path.join(log_dir, name)) as log_file:
+        log_file.readline()
+        rows = [line.rstrip('\n').split(',') for line in log_file]
+    return {int(row[2]): (row[0] == "True", row[-1]) for row in rows}
+
+
+def replay(cache, keys):
+    for count, key in enumerate(keys, 1):
+        cache.dispatcher.put(str(key), count)
+    cache.close()
+
+
+@pytest.mark.parametrize("single_flight", [False, True])
+def test_batches(source_table, fake_redis, tmp_path, single_flight):
+    cache = RedisCache(1, "trace", str(tmp_path), source_table, prep=False, batch_size=4,
+                       single_flight=single_flight)
+    fake_redis.data["3"] = cache.codec.encode(source_value(3))
+    replay(cache, [1, 2, 1, 3, 2, 4, 4, 5])
+
+    hits = {count: hit for count, (hit, _) in read_log(tmp_path).items()}
+    # the second 1 and 4 are served by the fetch of the first
+    assert (hits == {1: False, 2: False, 3: True, 4: True,
+                     5: True, 6: False, 7: True, 8: False})
+    values = {count: value for count, (_, value) in read_log(tmp_path).items()}
+    assert (values == {count: source_value(key)
+                       for count, key in enumerate([1, 2, 1, 3, 2, 4, 4, 5], 1)})
+    for key in range(1, 6):
+        assert (cache.codec.decode(fake_redis.data[str(key)]) == source_value(key))
+    if not single_flight:
+        # one MGET and one MSET per batch
+        assert (fake_redis.round_trips == 4)
@@ -0,0 +1,84 @@
+import threading
+import pytest
+
+from request_log import (RequestLog, CSV_HEADER, TIER_L2, read_binary_log, binary_log_to_csv,
+                         log_file_name, parse_log_name)
+
+
+def record_all(request_log, thread_count, per_thread):
+    def worker(thread_number):
+        for i in range(per_thread):
+            count = thread_number * per_thread + i + 1
+            request_log.record(count % 2 == 0, thread_number, count, 0.5, 0.25,
+                               1700000000.5 + count, int(count % 2 == 0), f"k{count}",
+                               f"v{count}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize("log_format", ["csv", "binary"])
+def test_every_record_is_written(tmp_path, log_format):
+    # a tiny queue makes workers wait for the writer
+    request_log = RequestLog(log_format, buffer_size=8, queue_size=1)
+    log_path = str(tmp_path / "t.log")
+    writer = threading.Thread(target=request_log.write, args=(log_path,))
+    writer.start()
+    record_all(request_log, 4, 101)
+    request_log.close()
+    writer.join()
+
+    if log_format == "binary":
+        csv_path = str(tmp_path / "converted.log")
+        binary_log_to_csv(log_path, csv_path)
+        log_path = csv_path
+    with open(log_path) as log_file:
+        lines = log_file.readlines()
+    assert lines[0] == CSV_HEADER
+    rows = sorted((line.rstrip("\n").split(",") for line in lines[1:]), key=lambda r: int(r[2]))
+    assert len(rows) == 404
+    assert rows[0] == ["False", "0", "1", "0.5000", "0.2500", "1700000001.500000", "source",
+                       "k1", "v1"]
+    assert rows[-1] == ["True", "3", "404", "0.5000", "0.2500", "1700000404.500000", "cache",
+                        "k404", "v404"]
+    stats = request_log.stats()
+    assert stats["records"] == 404
+    assert stats["max_depth"] <= 1
+
+
+def test_binary_rows(tmp_path):
+    request_log = RequestLog("binary", buffer_size=4)
+    request_log.record(True, 2, 7, 1.5, 0.0, 12.25, TIER_L2, "key", "None")
+    request_log.close()
+    log_path = str(tmp_path / "t.bin")
+    request_log.write(log_path)
+    assert list(read_binary_log(log_path)) == [(True, 2, 7, 1.5, 0.0, 12.25, TIER_L2, "key",
+                                                "None")]
+
+
+def test_invalid_format():
+    with pytest.raises(ValueError):
+        RequestLog("parquet")
+
+
+@pytest.mark.parametrize("name,parts", [
+    ("t1_01_02_2024_10_30_4.log", ("t1", "", "01_02_2024_10_30", "4")),
+    ("t1_lru_01_02_2024_10_30_4.bin", ("t1", "lru", "01_02_2024_10_30", "4")),
+    # trace names may contain underscores
+    ("arc_P1_01_02_2024_10_30_2.log", ("arc_P1", "", "01_02_2024_10_30", "2")),
+    ("arc_P1_redis-r500-p4_01_02_2024_10_30_5.log",
+     ("arc_P1", "redis-r500-p4", "01_02_2024_10_30", "5")),
+    ("my_trace_r1e+06_01_02_2024_10_30_3.log", ("my_trace", "r1e+06", "01_02_2024_10_30", "3")),
+    ("my_trace_p2_01_02_2024_10_30_3.log", ("my_trace", "p2", "01_02_2024_10_30", "3"))])
+def test_parse_log_name(name, parts):
+    assert parse_log_name(name) == parts
+    trace_name, label, date, cache_type = parts
+    assert log_file_name(trace_name, label, date, cache_type, name.rsplit('.', 1)[1]) == name
+
+
+def test_parse_log_name_without_date():
+    with pytest.raises(ValueError):
+        parse_log_name("stats.log")
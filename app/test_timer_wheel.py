@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from timer_wheel import TimerWheel, SLOT_COUNT, LEVEL_COUNT
+
+
+class Entry:
+    __slots__ = ("expires", "timer")
+
+    def __init__(self, expires):
+        self.expires = expires
+        self.timer = None
+
+
+def test_expires_at_the_tick_after_the_expiry_time():
+    wheel = TimerWheel(0, tick_ns=10)
+    entry = Entry(25)
+    wheel.schedule(entry)
+    assert wheel.advance(29) == []
+    assert wheel.advance(30) == [entry]
+    assert entry.timer is None
+    assert len(wheel) == 0
+
+
+def test_cancel_and_reschedule():
+    wheel = TimerWheel(0, tick_ns=1)
+    first, second = Entry(5), Entry(5)
+    wheel.schedule(first)
+    wheel.schedule(second)
+    wheel.cancel(first)
+    second.expires = 5000
+    wheel.schedule(second)
+    assert len(wheel) == 1
+    assert wheel.advance(4999) == []
+    assert wheel.advance(5000) == [second]
+
+
+def test_entries_beyond_the_top_level():
+    wheel = TimerWheel(0, tick_ns=1)
+    far = Entry(3 * SLOT_COUNT ** LEVEL_COUNT + 7)
+    wheel.schedule(far)
+    assert far.timer is wheel.overflow
+    assert wheel.advance(far.expires - 1) == []
+    assert wheel.advance(far.expires) == [far]
+
+
+def test_random_schedules_expire_on_time():
+    rng = random.Random(7)
+    wheel = TimerWheel(0, tick_ns=1)
+    now = 0
+    live = set()
+    for _ in range(2000):
+        if rng.random() < 0.6:
+            entry = Entry(now + 1 + rng.choice([10, 10 ** 3, 10 ** 5, 10 ** 8]) * rng.random())
+            entry.expires = int(entry.expires)
+            wheel.schedule(entry)
+            live.add(entry)
+        else:
+            now += rng.choice([1, 100, 10 ** 4, 10 ** 6])
+            expired = wheel.advance(now)
+            assert all(entry.expires <= now for entry in expired)
+            live.difference_update(expired)
+            assert all(entry.expires > now for entry in live)
+    assert len(wheel) == len(live)
+
+
+def test_invalid_tick():
+    with pytest.raises(ValueError):
+        TimerWheel(0, tick_ns=0)
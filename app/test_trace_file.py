@@ -0,0 +1,43 @@
+import pytest
+
+from trace_file import is_binary_trace, read_trace, warmup_keys, write_binary_trace
+
+
+def write_text_trace(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+    return str(path)
+
+
+def test_binary_trace_round_trip(tmp_path):
+    text_path = write_text_trace(tmp_path / "t.txt", ["61", "42 3", "61 2", "kéy 7", "42"])
+    binary_path = str(tmp_path / "t.trace")
+    assert write_binary_trace(read_trace(text_path), binary_path) == (5, 3)
+    assert not is_binary_trace(text_path)
+    assert is_binary_trace(binary_path)
+    assert list(read_trace(binary_path)) == list(read_trace(text_path))
+    assert list(read_trace(binary_path, limit=2)) == [("61", 1), ("42", 3)]
+
+
+def test_binary_trace_stops_early(tmp_path):
+    text_path = write_text_trace(tmp_path / "t.txt", [str(i % 10) for i in range(100)])
+    binary_path = str(tmp_path / "t.trace")
+    write_binary_trace(read_trace(text_path), binary_path)
+    requests = read_trace(binary_path)
+    assert next(requests) == ("0", 1)
+    # closing the generator releases the memory map
+    requests.close()
+
+
+def test_empty_binary_trace(tmp_path):
+    binary_path = str(tmp_path / "empty.trace")
+    assert write_binary_trace([], binary_path) == (0, 0)
+    assert list(read_trace(binary_path)) == []
+
+
+def test_warmup_keys(tmp_path):
+    text_path = write_text_trace(tmp_path / "t.txt", ["a", "b", "a", "c", "c", "c", "d", "b"])
+    assert warmup_keys(text_path, 4) == ["b", "a", "c"]
+    assert warmup_keys(text_path, 8, limit=3) == ["b", "a"]
+    assert warmup_keys(text_path, 2, "top") == ["a", "c"]
+    with pytest.raises(ValueError):
+        warmup_keys(text_path, 2, "last")
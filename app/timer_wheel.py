@@ -0,0 +1,145 @@
+"""
+Hierarchical timing wheel for expiring cache entries.
+
+Time is counted in ticks. Level 0 has one slot per tick for the current block of
+SLOT_COUNT ticks, level 1 one slot per block of SLOT_COUNT ticks for the current block of
+SLOT_COUNT ** 2 ticks, and so on. An entry goes into the lowest level whose current block
+holds its expiry tick, so scheduling and cancelling are a set add and remove. When the
+clock enters a new block of a level, the one slot of that block is moved down a level,
+and every entry is moved at most once per level before it expires. Advancing the wheel
+only visits the slots of the ticks that passed, never the entries that did not expire,
+and jumps over the rest of any block that has nothing left in it.
+
+Entries further out than the top level wait in an overflow set that is scheduled again
+each time the clock enters a new top level block, which with the defaults is every
+SLOT_COUNT ** LEVEL_COUNT ticks (46 hours of 10 ms ticks).
+
+Entries need `expires` (a time in nanoseconds) and `timer` (the slot they are in) slots.
+"""
+
+SLOT_BITS = 6
+SLOT_COUNT = 1 << SLOT_BITS
+SLOT_MASK = SLOT_COUNT - 1
+LEVEL_COUNT = 4
+TICK_NS = 10_000_000
+
+
+class TimerWheel:
+    """
+    Expiry times of entries in hierarchical slot sets.
+
+    Attributes:
+        tick_ns (int): Nanoseconds per tick.
+        tick (int): The last tick advanced to.
+        levels (list): LEVEL_COUNT lists of SLOT_COUNT entry sets.
+        overflow (set): Entries expiring after the current top level block.
+        count (int): Number of scheduled entries.
+    """
+
+    __slots__ = ("tick_ns", "tick", "levels", "overflow", "count")
+
+    def __init__(self, now_ns, tick_ns=TICK_NS):
+        if tick_ns < 1:
+            raise ValueError("tick_ns must be at least 1")
+        self.tick_ns = tick_ns
+        self.tick = now_ns // tick_ns
+        self.levels = [[set() for _ in range(SLOT_COUNT)] for _ in range(LEVEL_COUNT)]
+        self.overflow = set()
+        self.count = 0
+
+    def schedule(self, entry):
+        """
+        Adds an entry to the slot of its expiry time, which must be set.
+        """
+        if entry.timer is None:
+            self.count += 1
+        else:
+            entry.timer.discard(entry)
+        # an entry that is already due expires at the next tick
+        expiry_tick = max(self.expiry_tick(entry), self.tick + 1)
+        slot = self.slot_of(expiry_tick)
+        slot.add(entry)
+        entry.timer = slot
+
+    def expiry_tick(self, entry):
+        # rounded up, so an entry is never reaped before its expiry time
+        return -(-entry.expires // self.tick_ns)
+
+    def slot_of(self, expiry_tick):
+        for level in range(LEVEL_COUNT):
+            shift = SLOT_BITS * (level + 1)
+            if expiry_tick >> shift == self.tick >> shift:
+                return self.levels[level][(expiry_tick >> (shift - SLOT_BITS)) & SLOT_MASK]
+        return self.overflow
+
+    def cancel(self, entry):
+        """
+        Removes an entry from its slot, if it is scheduled.
+        """
+        if entry.timer is not None:
+            entry.timer.discard(entry)
+            entry.timer = None
+            self.count -= 1
+
+    def advance(self, now_ns):
+        """
+        Moves the clock to now_ns.
+
+        Returns:
+            list: The entries that expired, no longer scheduled.
+        """
+        target = now_ns // self.tick_ns
+        expired = []
+        while self.tick < target:
+            if self.count == 0:
+                self.tick = target
+                break
+            tick = min(self.next_tick(), target)
+            self.tick = tick
+            # blocks that start at this tick hand their entries down, the largest first
+            if tick & SLOT_MASK == 0:
+                self.cascade(tick)
+            slot = self.levels[0][tick & SLOT_MASK]
+            if slot:
+                self.levels[0][tick & SLOT_MASK] = set()
+                for entry in slot:
+                    entry.timer = None
+                expired.extend(slot)
+                self.count -= len(slot)
+        return expired
+
+    def next_tick(self):
+        """
+        Returns the next tick with a level 0 slot or a block to visit, skipping the rest of
+        every block that has no entries left in it.
+        """
+        tick = self.tick
+        for level in range(LEVEL_COUNT):
+            shift = SLOT_BITS * level
+            if any(self.levels[level][((tick >> shift) & SLOT_MASK) + 1:]):
+                break
+            # nothing is due before the next block of the level above
+            block = 1 << (shift + SLOT_BITS)
+            tick = (tick // block + 1) * block - 1
+        return tick + 1
+
+    def cascade(self, tick):
+        # the highest level whose block starts at this tick, LEVEL_COUNT for the overflow
+        top = 1
+        while top < LEVEL_COUNT and tick & ((1 << (SLOT_BITS * (top + 1))) - 1) == 0:
+            top += 1
+        for level in range(top, 0, -1):
+            if level == LEVEL_COUNT:
+                entries, self.overflow = self.overflow, set()
+            else:
+                index = (tick >> (SLOT_BITS * level)) & SLOT_MASK
+                entries = self.levels[level][index]
+                self.levels[level][index] = set()
+            for entry in entries:
+                # lands in a lower level, or in the level 0 slot of this tick when due
+                slot = self.slot_of(max(self.expiry_tick(entry), tick))
+                slot.add(entry)
+                entry.timer = slot
+
+    def __len__(self):
+        return self.count
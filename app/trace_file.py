@@ -0,0 +1,182 @@
+"""
+Trace file reading.
+
+A trace file has one request per line: the key and an optional number of 16 byte blocks of
+the value (see scripts/make_sql_dump.py).
+
+Large traces can be converted to a binary trace, which read_trace recognises by its magic:
+
+    python trace_file.py TRACE [OUT.trace]
+
+A binary trace holds every distinct key once, in a key table, and the requests as two fixed
+width integer arrays of key numbers and block counts in native byte order. Replay maps the
+file into memory and reads the arrays in place, so there is no line parsing and processes
+replaying the same trace share its pages.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+
+BLOCK_BYTES = 16
+# warm-up with the keys of the first requests or with the most frequent keys
+WARMUP_MODES = ("first", "top")
+BINARY_MAGIC = b"TRACEB1\n"
+# magic, key count, request count and key table bytes, followed by the key table offsets,
+# the key table, padding to 4 bytes, the key numbers and the block counts
+BINARY_HEADER = struct.Struct("<8sIQQ")
+
+
+def is_binary_trace(tracefile_path):
+    with open(tracefile_path, 'rb') as tracefile:
+        return tracefile.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def read_trace(tracefile_path, limit=0):
+    """
+    Reads the requests of a text or binary trace file.
+
+    Parameters:
+    - tracefile_path (str): Path to the trace file.
+    - limit (int, optional): Maximum number of requests to read, 0 for all. Defaults to 0.
+
+    Yields:
+    - tuple: The key and the number of value blocks of each request.
+    """
+    if is_binary_trace(tracefile_path):
+        yield from read_binary_trace(tracefile_path, limit)
+        return
+
+    with open(tracefile_path) as tracefile:
+        count = 1
+        for line in tracefile:
+            lineSplit = line.split()
+            num_blocks = 1
+            if len(lineSplit) > 1:
+                num_blocks = int(lineSplit[1])
+            yield lineSplit[0], num_blocks
+
+            # Check if the limit is exceeded
+            if limit > 0 and count >= limit:
+                break
+
+            count += 1
+
+
+def warmup_keys(tracefile_path, count, mode="first", limit=0):
+    """
+    Selects the keys of a warm-up.
+
+    Parameters:
+    - tracefile_path (str): Path to the trace file.
+    - count (int): Number of requests ("first") or keys ("top").
+    - mode (str, optional): "first" for the keys of the first count requests, "top" for the
+      count most frequent keys of the trace. Defaults to "first".
+    - limit (int, optional): Maximum number of requests of the replay, 0 for all.
+
+    Returns:
+    - list: Distinct keys, the most recently or most frequently used last, so a recency
+      based cache keeps the hottest ones longest.
+    """
+    if mode not in WARMUP_MODES:
+        raise ValueError("Invalid warm-up mode. Supported modes are: {}".format(WARMUP_MODES))
+    if mode == "first":
+        keys = {}
+        for key, _ in read_trace(tracefile_path, min(count, limit) if limit > 0 else count):
+            keys.pop(key, None)
+            keys[key] = None
+        return list(keys)
+    counts = Counter(key for key, _ in read_trace(tracefile_path, limit))
+    return [key for key, _ in reversed(counts.most_common(count))]
+
+
+def read_binary_trace(tracefile_path, limit=0):
+    """
+    Reads the requests of a binary trace file from a memory map of it.
+
+    Parameters:
+    - tracefile_path (str): Path to the binary trace file.
+    - limit (int, optional): Maximum number of requests to read, 0 for all. Defaults to 0.
+
+    Yields:
+    - tuple: The key and the number of value blocks of each request.
+    """
+    with open(tracefile_path, 'rb') as tracefile:
+        trace_map = mmap.mmap(tracefile.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(trace_map)
+    key_ids = blocks = None
+    try:
+        magic, key_count, request_count, table_bytes = BINARY_HEADER.unpack_from(view)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{tracefile_path} is not a binary trace")
+        position = BINARY_HEADER.size
+        offsets = array('I')
+        offsets.frombytes(view[position:position + 4 * (key_count + 1)])
+        position += 4 * (key_count + 1)
+        table = bytes(view[position:position + table_bytes])
+        position += table_bytes + (-table_bytes % 4)
+        # one str per distinct key, the requests only hold key numbers
+        keys = [table[offsets[i]:offsets[i + 1]].decode() for i in range(key_count)]
+        del table
+
+        read_count = min(request_count, limit) if limit > 0 else request_count
+        key_ids = view[position:position + 4 * read_count].cast('I')
+        position += 4 * request_count
+        blocks = view[position:position + 4 * read_count].cast('I')
+        yield from zip(map(keys.__getitem__, key_ids), blocks)
+    finally:
+        # the map can only be closed once no view of it is left
+        for part in (key_ids, blocks, view):
+            if part is not None:
+                part.release()
+        trace_map.close()
+
+
+def write_binary_trace(requests, binary_path):
+    """
+    Writes requests to a binary trace file.
+
+    Parameters:
+    - requests (iterable): (key, num_blocks) tuples as yielded by read_trace.
+    - binary_path (str): Path of the binary trace file.
+
+    Returns:
+    - tuple: Number of requests and number of distinct keys written.
+    """
+    key_numbers = {}
+    key_ids = array('I')
+    blocks = array('I')
+    for key, num_blocks in requests:
+        key_id = key_numbers.get(key)
+        if key_id is None:
+            key_id = key_numbers[key] = len(key_numbers)
+        key_ids.append(key_id)
+        blocks.append(num_blocks)
+
+    encoded_keys = [key.encode() for key in key_numbers]
+    offsets = array('I', [0])
+    for encoded in encoded_keys:
+        offsets.append(offsets[-1] + len(encoded))
+    table_bytes = offsets[-1]
+
+    with open(binary_path, 'wb') as binary_file:
+        binary_file.write(BINARY_HEADER.pack(BINARY_MAGIC, len(encoded_keys), len(key_ids),
+                                             table_bytes))
+        binary_file.write(offsets.tobytes())
+        binary_file.write(b"".join(encoded_keys))
+        binary_file.write(bytes(-table_bytes % 4))
+        binary_file.write(key_ids.tobytes())
+        binary_file.write(blocks.tobytes())
+    return len(key_ids), len(encoded_keys)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("usage: trace_file.py TRACE [OUT.trace]")
+        sys.exit(1)
+    text_path = sys.argv[1]
+    binary_path = sys.argv[2] if len(sys.argv) == 3 else text_path.rsplit(".", 1)[0] + ".trace"
+    request_count, key_count = write_binary_trace(read_trace(text_path), binary_path)
+    print(f"{binary_path}: {request_count} requests, {key_count} keys")
@@ -1,65 +1,187 @@
-import os
-import sys
-
-import pandas as pd
-
-cache_types = {"1": "PostgreSQL", "2": "Redis",
-               "3": "Memcached", "4": "PythonDict"}
-
-tests_folder_path = sys.argv[1]
+"""
+Summarises the request logs of a test folder into stats.csv.
 
+Logs are read in chunks and several logs are processed at once. Latency percentiles come
+from a histogram of log spaced buckets, so memory does not grow with the log size.
+Throughput is the request count over the wall-clock time between the first request start
+and the last request end, which needs the timestamp column; older logs without it get an
+empty throughput. A per-second timeline of throughput and hit rate is written for every
+log to timelines/<log name>.csv to show the warm-up. Near cache logs also get the share
+of requests served by the L1 and by the L2 from their tier column.
 
-df_stats = pd.DataFrame()
-for file in os.listdir(tests_folder_path):
-    filename = os.fsdecode(file)
-    if filename.endswith(".log"):
-        test_csv_log_path = os.path.join(tests_folder_path, filename)
-        print(filename)
-        df = pd.read_csv(test_csv_log_path)
-        # print(df.sample())
+    python3 scripts/gen_test_stats.py TESTS_FOLDER [--workers N] [--chunk_size ROWS]
+"""
 
-        mean_response = df['delta_time'].mean()
-        print(mean_response)
-
-        delta_time_sum = df['delta_time'].sum()
-        print(delta_time_sum)
-
-        mean_hit_response = df.loc[df['cache_action'] == True, 'delta_time'].mean()
-        mean_miss_response = df.loc[df['cache_action'] == False, 'delta_time'].mean()
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-        row_count = len(df)
+import numpy as np
+import pandas as pd
 
-        hit_rate = df.loc[df['cache_action'] ==
-                          True, 'cache_action'].count() / row_count
-        miss_rate = df.loc[df['cache_action'] ==
-                           False, 'cache_action'].count() / row_count
+# log names are parsed with the rule the app builds them with
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from request_log import parse_log_name
 
+cache_types = {"1": "PostgreSQL", "2": "Redis",
+               "3": "Memcached", "4": "PythonDict", "5": "NearCache"}
+
+PERCENTILES = (50, 90, 99, 99.9)
+# bucket edges in milliseconds, 200 per decade from 1 us to 1000 s, about 1.2% wide
+BUCKET_EDGES = np.logspace(-3, 6, 9 * 200 + 1)
+COLUMNS = ['cache_action', 'delta_time', 'pool_wait', 'timestamp', 'tier', 'value']
+
+
+def percentile(counts, percent):
+    """
+    Returns:
+    - float: Upper edge of the bucket holding the percentile, NaN for an empty histogram.
+    """
+    total = counts.sum()
+    if total == 0:
+        return float('nan')
+    index = np.searchsorted(np.cumsum(counts), total * percent / 100)
+    # the last bucket counts the values above the largest edge
+    return float(BUCKET_EDGES[min(index, len(BUCKET_EDGES) - 1)])
+
+
+def latency_histogram(delta_times):
+    return np.bincount(np.searchsorted(BUCKET_EDGES, delta_times),
+                       minlength=len(BUCKET_EDGES) + 1)
+
+
+def summarise_log(log_path, chunk_size, timeline_dir):
+    """
+    Reads a log chunk by chunk.
+
+    Returns:
+    - dict: The stats.csv row of the log.
+    """
+    filename = os.path.basename(log_path)
+    rows = hits = 0
+    delta_time_sum = hit_time_sum = pool_wait_sum = 0.0
+    value_bytes = hit_value_bytes = 0.0
+    hit_counts = np.zeros(len(BUCKET_EDGES) + 1, dtype=np.int64)
+    miss_counts = np.zeros(len(BUCKET_EDGES) + 1, dtype=np.int64)
+    start = end = None
+    timeline = None
+    tier_counts = pd.Series(dtype=np.int64)
+
+    reader = pd.read_csv(log_path, chunksize=chunk_size,
+                         usecols=lambda column: column in COLUMNS)
+    for chunk in reader:
+        hit = chunk['cache_action'] == True
+        delta_time = chunk['delta_time']
+        rows += len(chunk)
+        hits += int(hit.sum())
+        delta_time_sum += delta_time.sum()
+        hit_time_sum += delta_time[hit].sum()
+        # connection pool checkout time, older logs have no pool_wait column
+        if 'pool_wait' in chunk:
+            pool_wait_sum += chunk['pool_wait'].sum()
+        # tier that served each request, older logs have no tier column
+        if 'tier' in chunk:
+            tier_counts = tier_counts.add(chunk['tier'].value_counts(), fill_value=0)
+
+        # values are logged as hex strings, two characters per byte
+        chunk_bytes = chunk['value'].astype(str).str.len() / 2
+        value_bytes += chunk_bytes.sum()
+        hit_value_bytes += chunk_bytes[hit].sum()
+
+        hit_counts += latency_histogram(delta_time[hit].to_numpy())
+        miss_counts += latency_histogram(delta_time[~hit].to_numpy())
+
+        if 'timestamp' in chunk:
+            ends = chunk['timestamp']
+            starts = ends - delta_time / 1000
+            start = starts.min() if start is None else min(start, starts.min())
+            end = ends.max() if end is None else max(end, ends.max())
+            per_second = pd.DataFrame({'second': np.floor(ends).astype(np.int64),
+                                       'requests': 1, 'hits': hit.astype(np.int64)})
+            per_second = per_second.groupby('second').sum()
+            timeline = per_second if timeline is None else timeline.add(per_second,
+                                                                        fill_value=0)
+
+    misses = rows - hits
+    if end is not None:
+        secs = end - start
+        throughput = "{:.4f}".format(rows / secs) if secs > 0 else ''
+    else:
+        # no timestamps, the latency sum is the best estimate of the run time
         secs = delta_time_sum / 1000
-        mins = secs / 60
-        hrs = mins / 60
-        splitDash = filename.split('_')
-        trace_file = splitDash[0]
-        cache_type = splitDash[-1][0]
-
-        throughput = row_count / secs
-        stats_row = {'cache_type': cache_types[cache_type],
-                     'trace_file': filename.split('_')[0],
-                     #  'secs': "{:.4f}".format(secs),
-                     'mins': "{:.4f}".format(mins),
-                     'hrs': "{:.4f}".format(hrs),
-                     'mean_response (m/s)': "{:.4f}".format(mean_response),
-                     'mean_hit_response (m/s)': "{:.4f}".format(mean_hit_response),
-                     'mean_miss_response (m/s)': "{:.4f}".format(mean_miss_response),
-                     'throughput (per sec)': "{:.4f}".format(throughput),
-                     'hit_rate %': "{:.4f}".format(hit_rate),
-                     'miss_rate %': "{:.4f}".format(miss_rate)}
-
-        df_stats = pd.concat(
-            [df_stats, pd.DataFrame([stats_row])], ignore_index=True)
-    # break
-
-
-# df_stats = pd.read_csv(os.path.join(tests_folder_path, 'stats.csv'))
-
-df_stats = df_stats.sort_values(by=['trace_file', 'mean_response (m/s)'])
-df_stats.to_csv(os.path.join(tests_folder_path, 'stats.csv'), index=False)
+        throughput = ''
+    if timeline is not None:
+        timeline = timeline.astype(np.int64)
+        timeline.index = timeline.index - timeline.index.min()
+        timeline['hit_rate'] = (timeline['hits'] / timeline['requests']).round(4)
+        timeline.to_csv(os.path.join(timeline_dir, filename.rsplit('.', 1)[0] + '.csv'))
+
+    mins = secs / 60
+    hrs = mins / 60
+    trace_name, log_label, _, cache_type = parse_log_name(filename)
+    all_counts = hit_counts + miss_counts
+
+    stats_row = {'cache_type': cache_types[cache_type],
+                 'trace_file': trace_name,
+                 'label': log_label,
+                 'requests': rows,
+                 'mins': "{:.4f}".format(mins),
+                 'hrs': "{:.4f}".format(hrs),
+                 'mean_response (m/s)': "{:.4f}".format(delta_time_sum / max(1, rows)),
+                 'mean_hit_response (m/s)': "{:.4f}".format(hit_time_sum / hits if hits
+                                                            else float('nan')),
+                 'mean_miss_response (m/s)': "{:.4f}".format(
+                     (delta_time_sum - hit_time_sum) / misses if misses else float('nan')),
+                 'mean_pool_wait (m/s)': "{:.4f}".format(pool_wait_sum / max(1, rows))}
+    for percent in PERCENTILES:
+        stats_row[f'p{percent:g}_response (m/s)'] = "{:.4f}".format(
+            percentile(all_counts, percent))
+    stats_row[f'p{PERCENTILES[-2]:g}_hit_response (m/s)'] = "{:.4f}".format(
+        percentile(hit_counts, PERCENTILES[-2]))
+    stats_row[f'p{PERCENTILES[-2]:g}_miss_response (m/s)'] = "{:.4f}".format(
+        percentile(miss_counts, PERCENTILES[-2]))
+    stats_row.update({'throughput (per sec)': throughput,
+                      'hit_rate %': "{:.4f}".format(hits / max(1, rows)),
+                      'miss_rate %': "{:.4f}".format(misses / max(1, rows)),
+                      'byte_hit_rate %': "{:.4f}".format(hit_value_bytes / value_bytes
+                                                         if value_bytes else 0.0)})
+    # only near caches serve requests from an l1 and an l2
+    for tier in ('l1', 'l2'):
+        stats_row[f'{tier}_hit_rate %'] = ("{:.4f}".format(tier_counts[tier] / max(1, rows))
+                                           if tier in tier_counts else '')
+    print(filename, rows, "requests")
+    return stats_row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise the request logs of a test folder")
+    parser.add_argument("tests_folder_path", help="Folder with the .log files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Logs processed at once")
+    parser.add_argument("--chunk_size", type=int, default=500_000,
+                        help="Log rows read at a time")
+    args = parser.parse_args()
+
+    tests_folder_path = args.tests_folder_path
+    timeline_dir = os.path.join(tests_folder_path, 'timelines')
+    os.makedirs(timeline_dir, exist_ok=True)
+    log_paths = [os.path.join(tests_folder_path, os.fsdecode(file))
+                 for file in sorted(os.listdir(tests_folder_path))
+                 if os.fsdecode(file).endswith(".log")]
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        stats_rows = list(executor.map(summarise_log, log_paths,
+                                       [args.chunk_size] * len(log_paths),
+                                       [timeline_dir] * len(log_paths)))
+
+    df_stats = pd.DataFrame(stats_rows)
+    if not df_stats.empty:
+        df_stats['sort_response'] = df_stats['mean_response (m/s)'].astype(float)
+        df_stats = df_stats.sort_values(by=['trace_file', 'sort_response'])
+        df_stats = df_stats.drop(columns='sort_response')
+    df_stats.to_csv(os.path.join(tests_folder_path, 'stats.csv'), index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,254 @@
+"""
+Generates the source table of a trace: one row per distinct key with a random hex value of
+16 bytes per block of the request that first used the key.
+
+The rows are written as COPY data. In the default text format they go into TRACE.sql
+between the table definition and the index creation, the way pg_dump writes them, so psql
+(and the postgres container init scripts) load the file with a single COPY. The binary
+format writes the rows to TRACE.copy for COPY ... WITH (FORMAT binary). With --load the
+rows are streamed straight into Postgres with COPY FROM STDIN instead, using the
+POSTGRES_* environment variables of the app.
+
+The primary key and the unique index on orig_key are created after the rows are loaded,
+which is much faster than maintaining them row by row. Values are generated in parts of
+--part_keys keys on all cores, each part from its own seed derived from --seed, so the output
+only depends on the trace and the seed and not on the number of processes.
+
+    python3 scripts/make_sql_dump.py FOLDER TRACE TABLE [--format text|binary] [--load]
+"""
+
+import argparse
+import os
 import random
+import struct
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+# traces are read with the reader the app replays them with
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from trace_file import read_trace
 
-def makesqlfile(foldername, trace_file_path, test_name):
-    filename = f'{foldername}/{trace_file_path}'
-    outfilename = f'{foldername}/{trace_file_path}.sql'
+COPY_FORMATS = ("text", "binary")
+BINARY_HEADER = b"PGCOPY\n\377\r\n\0" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+PART_KEYS = 100000
+# escapes of the COPY text format
+TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def read_trace_keys(filename):
+    """
+    Reads the distinct keys of a text or binary trace in order of first use.
+
+    Returns:
+    - tuple: List of (key, num_blocks) tuples and the number of requests.
+    """
+    blocks_by_key = {}
+    num_lines = 0
+    for key, num_blocks in read_trace(filename):
+        num_lines += 1
+        if key not in blocks_by_key:
+            blocks_by_key[key] = num_blocks
+    return list(blocks_by_key.items()), num_lines
+
+
+def part_seed(seed, part_index):
+    return seed * 1_000_003 + part_index
+
+
+def make_rows(part_index, keys, seed, copy_format):
+    """
+    Generates the COPY data of a part of the keys.
+
+    Returns:
+    - bytes: The rows in the COPY text or binary format.
+    """
+    rng = random.Random(part_seed(seed, part_index))
+    if copy_format == "binary":
+        rows = []
+        for key, num_blocks in keys:
+            key_bytes = key.encode()
+            value_bytes = rng.randbytes(16 * num_blocks).hex().encode()
+            rows.append(struct.pack("!hi", 2, len(key_bytes)) + key_bytes
+                        + struct.pack("!i", len(value_bytes)) + value_bytes)
+        return b"".join(rows)
+    return "".join(f"{key.translate(TEXT_ESCAPES)}\t{rng.randbytes(16 * num_blocks).hex()}\n"
+                   for key, num_blocks in keys).encode()
+
+
+def generate_rows(keys, seed, copy_format, workers, part_keys=PART_KEYS):
+    """
+    Generates the parts of the COPY data on worker processes.
+
+    Parts are yielded in order and at most two per worker are generated ahead of the
+    consumer, so memory stays bounded for any trace size.
 
-    num_lines = sum(1 for _ in open(filename))
-    chunk = 100000
-    # print('num_lines', num_lines)
-    keys = set()
+    Yields:
+    - bytes: The COPY data of each part.
+    """
+    parts = [keys[start:start + part_keys] for start in range(0, len(keys), part_keys)]
+    if workers <= 1 or len(parts) <= 1:
+        for part_index, part in enumerate(parts):
+            yield make_rows(part_index, part, seed, copy_format)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = deque()
+        for part_index, part in enumerate(parts):
+            futures.append(executor.submit(make_rows, part_index, part, seed, copy_format))
+            if len(futures) >= 2 * workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
 
-    f1 = open(filename, 'r')
-    f2 = open(outfilename, 'w')
 
-    start = f"""
-    CREATE TABLE IF NOT EXISTS {test_name} (
-        id SERIAL PRIMARY KEY,
-        orig_key VARCHAR NOT NULL UNIQUE,
+def create_table_sql(test_name):
+    return f"""
+    DROP TABLE IF EXISTS {test_name};
+    CREATE TABLE {test_name} (
+        id SERIAL,
+        orig_key VARCHAR NOT NULL,
         orig_value VARCHAR NOT NULL
     );
-    DELETE FROM {test_name};
-    """
-
-    f2.write(start)
-    count = 1
-    rows = []
-    for line in f1:
-
-        lineSplit = line.split()
-        key = lineSplit[0]
-        num_blocks = 1
-        if len(lineSplit) > 1:
-            num_blocks = int(lineSplit[1])
-        
-        if key in keys:
-            continue
-        keys.add(key)
-        row = f"('{key}', '{random.randbytes(16 * num_blocks).hex()}')"
-        rows.append(row)
-
-        if count >= chunk:
-            endpart = f"""
-
-    INSERT INTO {test_name} (orig_key, orig_value)
-    VALUES
-
-            """
-            f2.write(endpart)
-            rowsContent = ""
-            for r in rows:
-                rowsContent += r + ',\n' 
-            rowsContent = rowsContent[:-2]
-            rowsContent += ';\n'
-            f2.write(rowsContent)
-            count = 0
-            rows.clear()
-            continue
-
-        count += 1
-    
-    if(len(rows) > 0):
-        endpart = f"""
-
-    INSERT INTO {test_name} (orig_key, orig_value)
-    VALUES
-
-            """
-        f2.write(endpart)
-            
-        rowsContent = ""
-        for r in rows:
-            rowsContent += r + ',\n' 
-        rowsContent = rowsContent[:-2]
-        rowsContent += ';\n'
-        f2.write(rowsContent)
-    print('filename', filename)        
+    """
+
+
+def create_index_sql(test_name):
+    return f"""
+    ALTER TABLE {test_name} ADD PRIMARY KEY (id);
+    ALTER TABLE {test_name} ADD CONSTRAINT {test_name}_orig_key_key UNIQUE (orig_key);
+    ANALYZE {test_name};
+    """
+
+
+def copy_sql(test_name, copy_format, source="STDIN"):
+    options = " WITH (FORMAT binary)" if copy_format == "binary" else ""
+    return f"COPY {test_name} (orig_key, orig_value) FROM {source}{options}"
+
+
+class ChunkReader:
+    """
+    File like reader over an iterator of byte chunks, for copy_expert.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+        self.position = 0
+
+    def read(self, size=-1):
+        while self.position >= len(self.buffer):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return b""
+            self.buffer = chunk
+            self.position = 0
+        end = len(self.buffer) if size < 0 else self.position + size
+        data = self.buffer[self.position:end]
+        self.position += len(data)
+        return data
+
+
+def frame_binary(chunks):
+    """
+    Adds the header and trailer of the COPY binary format to the row data.
+    """
+    yield BINARY_HEADER
+    yield from chunks
+    yield BINARY_TRAILER
+
+
+def load_rows(test_name, chunks, copy_format):
+    """
+    Creates the table, streams the rows into it with COPY FROM STDIN and indexes it.
+    """
+    import psycopg2
+
+    conn = psycopg2.connect(host=os.getenv('POSTGRES_HOSTNAME'),
+                            port=os.getenv('POSTGRES_PORT'),
+                            dbname=os.getenv('POSTGRES_DATABASE'),
+                            user=os.getenv('POSTGRES_USERNAME'),
+                            password=os.getenv('POSTGRES_PASSWORD'))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(create_table_sql(test_name))
+            cursor.copy_expert(copy_sql(test_name, copy_format), ChunkReader(chunks),
+                               size=1 << 20)
+            cursor.execute(create_index_sql(test_name))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def makesqlfile(foldername, trace_file_path, test_name, copy_format="text", seed=0,
+                workers=None, load=False, part_keys=PART_KEYS):
+    """
+    Generates the source table data of a trace.
+
+    Parameters:
+    - foldername (str): Folder of the trace, the output is written next to it.
+    - trace_file_path (str): Trace file name in the folder.
+    - test_name (str): Name of the source table.
+    - copy_format (str): "text" for TRACE.sql, "binary" for TRACE.copy.
+    - seed (int): Seed the values of every part are derived from.
+    - workers (int): Processes generating values, defaults to the number of cores.
+    - load (bool): Whether to load the rows into Postgres instead of writing a file.
+    - part_keys (int): Keys per generated part.
+    """
+    if copy_format not in COPY_FORMATS:
+        raise ValueError("Invalid copy format. Supported formats are: {}".format(COPY_FORMATS))
+    filename = f'{foldername}/{trace_file_path}'
+    workers = workers or os.cpu_count()
+
+    keys, num_lines = read_trace_keys(filename)
+    chunks = generate_rows(keys, seed, copy_format, workers, part_keys)
+    if copy_format == "binary":
+        chunks = frame_binary(chunks)
+
+    if load:
+        load_rows(test_name, chunks, copy_format)
+        outfilename = f'table {test_name}'
+    elif copy_format == "binary":
+        outfilename = f'{foldername}/{trace_file_path}.copy'
+        with open(outfilename, 'wb') as f2:
+            f2.writelines(chunks)
+        print(create_table_sql(test_name))
+        print(f"    \\copy {test_name} (orig_key, orig_value) FROM '{outfilename}' WITH (FORMAT binary)")
+        print(create_index_sql(test_name))
+    else:
+        outfilename = f'{foldername}/{trace_file_path}.sql'
+        with open(outfilename, 'wb') as f2:
+            f2.write(create_table_sql(test_name).encode())
+            f2.write(f"\n{copy_sql(test_name, copy_format, 'stdin')};\n".encode())
+            f2.writelines(chunks)
+            f2.write(b"\\.\n")
+            f2.write(create_index_sql(test_name).encode())
+
+    print('filename', filename)
+    print('output', outfilename)
     print('num reqs', num_lines)
     print('num keys', len(keys))
-    f1.close()
-    f2.close()
 
-folder_name = sys.argv[1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the source table of a trace")
+    parser.add_argument("folder", help="Folder of the trace file")
+    parser.add_argument("trace", help="Trace file name in the folder")
+    parser.add_argument("table", help="Name of the source table")
+    parser.add_argument("--format", dest="copy_format", default="text", choices=COPY_FORMATS,
+                        help="COPY text data in TRACE.sql or binary data in TRACE.copy")
+    parser.add_argument("--load", action="store_true",
+                        help="Load the rows into Postgres with COPY FROM STDIN")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the values")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Processes generating values (0: one per core)")
+    parser.add_argument("--part_keys", type=int, default=PART_KEYS,
+                        help="Keys generated per part")
+    args = parser.parse_args()
+    makesqlfile(args.folder, args.trace, args.table, args.copy_format, args.seed,
+                args.workers, args.load, args.part_keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Offline Belady (MIN) simulator giving the best possible hit rate of a trace.
+
+Reads the text or binary trace formats app.py consumes (a key and an optional block count
+per request, a value is 16 bytes per block as in make_sql_dump.py) and writes the OPT hit and byte hit rates for
+each cache byte budget to opt_stats.csv in the output folder, next to the stats.csv written
+by gen_test_stats.py.
+
+Memory stays proportional to the trace length in compact integer arrays: the trace is
+interned to 4 byte key ids, next use positions are computed in one backward pass, and the
+simulation only keeps a heap of the cached entries. With variable value sizes evicting the
+entry used furthest in the future is the usual MIN heuristic rather than a proven optimum.
+
+usage: opt_sim.py [-h] [--limit LIMIT] [--out_dir OUT_DIR] tracefile sizes
+"""
+
+import argparse
+import heapq
+import os
+import sys
+from array import array
+
+# traces are read with the reader the app replays them with
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from trace_file import BLOCK_BYTES, read_trace
+
+SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    """
+    Parses a byte size such as 4096, 64K, 16M or 1G.
+    """
+    text = text.strip().upper()
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def load_trace(tracefile_path, limit=0):
+    """
+    Interns the keys of a trace file.
+
+    Returns:
+    - tuple: key id per request (array), value bytes per key id (array).
+    """
+    key_ids = {}
+    requests = array('I')
+    key_bytes = array('I')
+    for key, num_blocks in read_trace(tracefile_path, limit):
+        key_id = key_ids.get(key)
+        if key_id is None:
+            key_id = len(key_bytes)
+            key_ids[key] = key_id
+            key_bytes.append(BLOCK_BYTES * num_blocks)
+        requests.append(key_id)
+    return requests, key_bytes
+
+
+def next_uses(requests, key_count):
+    """
+    Finds the position of the next request of the same key for every request.
+
+    Returns:
+    - array: Next use position per request, len(requests) when the key is not used again.
+    """
+    never = len(requests)
+    next_use = array('I', bytes(4 * never))
+    last_seen = array('I', [never]) * key_count
+    for position in range(never - 1, -1, -1):
+        key_id = requests[position]
+        next_use[position] = last_seen[key_id]
+        last_seen[key_id] = position
+    return next_use
+
+
+def simulate(requests, next_use, key_bytes, max_size):
+    """
+    Replays the trace through a cache that evicts the entry used furthest in the future.
+
+    Heap items pack (next use, key id) into one negated integer, so the heap is a max heap
+    on next use. An item is stale once its key was evicted or requested again.
+
+    Returns:
+    - tuple: hits, hit bytes and requested bytes.
+    """
+    never = len(requests)
+    key_count = len(key_bytes)
+    cached_next = array('q', [-1]) * key_count
+    heap = []
+    cached_count = 0
+    size = 0
+    hits = 0
+    hit_bytes = 0
+    total_bytes = 0
+
+    for position in range(never):
+        key_id = requests[position]
+        value_size = key_bytes[key_id]
+        total_bytes += value_size
+        upcoming = next_use[position]
+
+        if cached_next[key_id] >= 0:
+            hits += 1
+            hit_bytes += value_size
+            cached_next[key_id] = upcoming
+            heapq.heappush(heap, -((upcoming << 32) | key_id))
+        elif upcoming < never and value_size <= max_size:
+            # a value that is never requested again is not worth caching
+            cached_next[key_id] = upcoming
+            cached_count += 1
+            size += value_size
+            heapq.heappush(heap, -((upcoming << 32) | key_id))
+            while size > max_size:
+                item = -heapq.heappop(heap)
+                victim = item & 0xFFFFFFFF
+                if cached_next[victim] != item >> 32:
+                    continue
+                cached_next[victim] = -1
+                cached_count -= 1
+                size -= key_bytes[victim]
+        else:
+            continue
+
+        if len(heap) > 2 * cached_count + 1024:
+            heap = [item for item in heap
+                    if cached_next[-item & 0xFFFFFFFF] == -item >> 32]
+            heapq.heapify(heap)
+
+    return hits, hit_bytes, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compute Belady OPT hit rates of a trace file for a list of cache byte sizes.')
+    parser.add_argument('tracefile', type=str, help='Path to the trace file.')
+    parser.add_argument('sizes', type=str,
+                        help='Comma separated cache byte sizes, K/M/G suffixes allowed.')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Maximum number of requests to read from the trace.')
+    parser.add_argument('--out_dir', type=str, default=".",
+                        help='Folder to write opt_stats.csv to.')
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    requests, key_bytes = load_trace(args.tracefile, args.limit)
+    next_use = next_uses(requests, len(key_bytes))
+    trace_file = os.path.basename(args.tracefile)
+    print('num reqs', len(requests))
+    print('num keys', len(key_bytes))
+
+    out_path = os.path.join(args.out_dir, 'opt_stats.csv')
+    write_header = not os.path.exists(out_path)
+    with open(out_path, 'a') as out_file:
+        if write_header:
+            out_file.write("trace_file,cache_bytes,requests,opt_hit_rate %,opt_byte_hit_rate %\n")
+        for max_size in sizes:
+            hits, hit_bytes, total_bytes = simulate(
+                requests, next_use, key_bytes, max_size)
+            hit_rate = hits / max(1, len(requests))
+            byte_hit_rate = hit_bytes / max(1, total_bytes)
+            print(max_size, "{:.4f}".format(hit_rate), "{:.4f}".format(byte_hit_rate))
+            out_file.write(f"{trace_file},{max_size},{len(requests)},"
+                           f"{hit_rate:.4f},{byte_hit_rate:.4f}\n")
+
+
+if __name__ == "__main__":
+    main()
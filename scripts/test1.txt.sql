@@ -1,77 +1,80 @@
 
-    CREATE TABLE IF NOT EXISTS test1 (
-        id SERIAL PRIMARY KEY,
-        orig_key VARCHAR NOT NULL UNIQUE,
+    DROP TABLE IF EXISTS test1;
+    CREATE TABLE test1 (
+        id SERIAL,
+        orig_key VARCHAR NOT NULL,
         orig_value VARCHAR NOT NULL
     );
-    DELETE FROM test1;
     
+COPY test1 (orig_key, orig_value) FROM stdin;
+61	cd072cd8be6f9f62ac4c09c28206e7e3
+42	5594aa6b342f5d0a3a5e4842fab428f7
+96	62e6e282e5c1657c78c3a967b36711eb
+44	3906a7c8603d71d409e7a54d87bdc1f7
+63	0442027aaf1fa95b7f86589578df43e4
+9	13167ae8d9dceb37762833811a71a723
+40	738626482f61c62379627cc124d44618
+69	3c6e4d9ea1a5a5ccf72e2140c304bdfc
+99	6a21e5e81217568835d497fb212b86b4
+82	9e656acf0641169a0b59f4e629439f25
+24	d9d4654fec8d4819fb40d6bab2c8e012
+72	1c441ae614a7b8d92a9219af1ece8754
+26	5758de781ef34f8ff48dc7198711925a
+0	a2e2256f5544f250b916639cbfc9f2a3
+67	bc17bbe948a75834c18373f70431728d
+56	06501d7a135a54719ef384dd9a6e7785
+28	c39faf42028ef10fba4d16cee68320eb
+100	a68e778c499d7eeaa83c98033caae017
+30	ec903eb8d13710d7b14c1966162bd3b5
+20	4c0a29d3d0e3f8c881160cabe56b11a0
+83	45e54a009d49a59c7f1e5b7e7af4fbd3
+87	2a371bde225848556af1703e7a89f3ba
+53	ca974053ebea21b4e833d7deccbc1f10
+47	ccc5e9304fc1c1ea4f6248912e96c138
+93	f7ee153d6c05a8cdd2b7b0f733837a24
+19	7d2b9dcdc163018b4422ae72c3ed5917
+2	d11898149ec443fe2219ef5160b805e0
+50	d66508828e117bff8b32ceee02e6417d
+48	1137eb1beb9d2b4db7d91f8d03eb844a
+37	7d35e1b44998f31f6a16258c3a232f55
+88	6ee680d0fb8e18ecc106508a5c090534
+94	721fbef64741a7cc925f6a9aa745178c
+84	77126e960ee8a34905cdea716d337517
+58	6d41a698217845cca5e188627cfb2951
+78	72dd5d9308bcfa3dcc08534a5405122f
+98	26f37b30e4ac4bd2b581cd2f5ce17008
+36	e6b3de9cb87536fb77d41aa8330b9342
+6	7ceffd793d92af11a0bafe167adac0ad
+85	b854f2c1ab635621eb0574e038ee4826
+92	c8b262ece669e4092879abd758278b14
+68	76aceee5a8d106b37b214fec4afe50d4
+80	b9c1648a0bc0f9ae42fa2b64fd557ed6
+8	f1738db4507a4a863df58f4627099485
+35	25e6c6cf6fd7493c93e977d9846e1737
+91	064621e50608f2add035fd96907444d3
+60	74ca23f341525f6b72e4669441377446
+16	811a5873c5a91e7e50d705a99a7925a4
+23	f1c00affcdfa41b3d0a8bcea0d8682fb
+62	5a5a17cb9a707c5b70651615f5f30653
+22	865adf9c9f8f871d749b877c0c874a96
+29	075651a13649d455020157d80eabbc30
+21	2d95373e5e462604b2e042bb7fbe6245
+25	5283fc1d08b690b4141a703838563f5f
+97	38ca69cb80b1a42bdd16215518ee166d
+1	43aedfd045d8eb0f0d6ac11963747ac8
+49	fabf77255f6cf6da068b9ab2478b0138
+4	b175940bc4cb2ed169e2e892fd595ba2
+73	32cff6e89ec1bfefad32c18858d8279a
+10	ec163baeff75f112e899d506328bdb1f
+65	b05a8fa225e3423080fe389b5f8680d4
+27	1fa77193d65ca41ed54c2664b1a16e17
+70	be7dc15e15d476d5a12303fb3433b51d
+95	13fd50094452029b77f8890564b6d031
+13	412506f6fd437ff82a525a2f7b46d6b7
+86	fa97b71f890eaf7a9a57e83551d826ba
+\.
 
-    INSERT INTO test1 (orig_key, orig_value)
-    VALUES
-
-            ('61', 'c572ba382a94508bd4e3a1b0b155e897'),
-('42', '3064c1b3db1231fc151291f1eb6409e1'),
-('96', 'e5b1542c05872ceb6e9d1ced12874e1b'),
-('44', '0361617a9716d17638e93b128ac9620a'),
-('63', '4b0a7f8233fffbf34b16031045677038'),
-('9', '40e3cc3683410de413f8f866116d32a7'),
-('40', 'f6cc3efc8463b2da283429deebd16117'),
-('69', '5f9ece9e325985206b55314afc9e1d85'),
-('99', '008a6d62a378f56d6b6668de6dfea063'),
-('82', '4fd67b7dd1a2cc9c7085c12178bcb072'),
-('24', '3ca9c1af8ccc2429dcbe8198aa4975f8'),
-('72', 'dbae6cdd5c1efaf5a4624add9504d7e9'),
-('26', 'c9836c060cc17bcb48122e2d8eca280a'),
-('0', '41a8f9171c3e84c3a026339eecd9c830'),
-('67', 'd86056a0afb66fc527eba915a8b9dc78'),
-('56', '17b148ccb75fbefac407ff1f327e2d09'),
-('28', '39e3d3469db7eaa651493c270d8f7b00'),
-('100', 'b60743ad92d96a1c6292b096eef9cbff'),
-('30', '89acd129226aa51482e33840c562d85a'),
-('20', 'da575fd1af6e87f32f48981edd9a9240'),
-('83', 'e9aeb9f29d63d5862f9468c16d3f638b'),
-('87', 'b31cedf90f0ae44c8f7827c95a9c5dc4'),
-('53', 'f7164f942011c285ed2a8f4df5085cbb'),
-('47', 'eefe48ed85f48504985fa25cb2785352'),
-('93', '895baec1407bf681f435af7d04396a02'),
-('19', '0caf78e30425df5d865b022403886bf1'),
-('2', '1cf9348a692f1cb880835966aa787e2e'),
-('50', '64d9fda8235cc12ff2b94c15d126b0f8'),
-('48', '58f494eaafd213aefcc9bc8f16ac1b40'),
-('37', '0663dee88dcfb2a1aab9a1475bc9fb20'),
-('88', 'cba9282dbc1cb4da3500b21f88dab3b6'),
-('94', 'd54483da04ae798410da25ba5aa66007'),
-('84', '633f5417ce8c0ae1e06ca7d10f1397c9'),
-('58', 'd05e2e867ca170b24e9e0b6e629948a0'),
-('78', '0c55f56e9a163ac5fd008b4c01187062'),
-('98', '72b3ca501e3dbc13e289da43d3ec0efd'),
-('36', '61d2306825f562af1bba2e91618ea123'),
-('6', 'a7174fe956cce8285e752529d5471e02'),
-('85', '366c2cec4502889807732c4287f6a61e'),
-('92', '90ad2072d4746124230fe1e40667d73b'),
-('68', '3504e93a56519a3c374712c9921f08db'),
-('80', '495afd8ff6cb58aea6e77e3274c2840f'),
-('8', '3cf61c95f2e47fae2e166cb7e052e030'),
-('35', '132a62aa1efc964297521ce17b7d24c5'),
-('91', '5f4b63bee6de12cdedf690095a1480e3'),
-('60', '6ed87e115394189db9cc87633f5c0f9b'),
-('16', '472bf86066f6f438e86b0232f45ed962'),
-('23', 'e5ebc7747395a93d93c8e91f3db5c3ab'),
-('62', 'a17346a5d28593a1628e18ffd91ebab0'),
-('22', '17dd2a9fba38baa22dd954d58d5529af'),
-('29', '1f6ec70c15177a70b0c60e20be6068e1'),
-('21', 'bb151aa9efea7f5acc4e941edc7e796a'),
-('25', '90fffb09506db319d595751e9211180a'),
-('97', 'e3b2615aa33c8700eefd0c0ab1ae54f6'),
-('1', 'b7f299b9bcba03d2bc8d0efec1e70ec9'),
-('49', 'fcb14500e99522f9608e058ed535175a'),
-('4', '43a74e1019bee7ee9695e0c937f8a45b'),
-('73', '0cdeb66c96b79c068c30d97774fa7937'),
-('10', 'b09f66dd28a919c9d88579e6eaecf61d'),
-('65', '8662af00f7a75b5fb4c28454c4557c58'),
-('27', '965b3700009d546e64d4c4c62128b514'),
-('70', '0ae976f7f22376678edd84c625f1935a'),
-('95', 'fd1a4fafb3618ef637a3344d892c6262'),
-('13', '49980ddacf8f63803f52b862c8c131b5'),
-('86', '2a4551ee747c4c0e44305c78cee10438');
+    ALTER TABLE test1 ADD PRIMARY KEY (id);
+    ALTER TABLE test1 ADD CONSTRAINT test1_orig_key_key UNIQUE (orig_key);
+    ANALYZE test1;
+    
\ No newline at end of file
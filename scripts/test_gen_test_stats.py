@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from gen_test_stats import summarise_log
+
+HEADER = "cache_action,thread_number,count,delta_time,pool_wait,timestamp,tier,key,value\n"
+START = 1700000000.0
+
+
+@pytest.fixture
+def near_cache_log(tmp_path):
+    """
+    Ten requests 0.25 s apart: four l1 hits of 1 ms, three l2 hits of 2 ms and three source
+    misses of 10 ms.
+    """
+    tiers = ["source", "l1", "l2", "l1", "source", "l2", "l1", "l2", "source", "l1"]
+    delta_times = {"l1": 1.0, "l2": 2.0, "source": 10.0}
+    log_path = tmp_path / "my_trace_redis_01_02_2024_10_30_5.log"
+    with open(log_path, 'w') as log_file:
+        log_file.write(HEADER)
+        for count, tier in enumerate(tiers, 1):
+            timestamp = START + 0.25 * (count - 1)
+            log_file.write(f"{tier != 'source'},0,{count},{delta_times[tier]:.4f},0.5000,"
+                           f"{timestamp:.6f},{tier},k{count},abcd\n")
+    timeline_dir = tmp_path / "timelines"
+    timeline_dir.mkdir()
+    return str(log_path), str(timeline_dir)
+
+
+@pytest.mark.parametrize("chunk_size", [3, 1000])
+def test_summarise_log(near_cache_log, chunk_size):
+    log_path, timeline_dir = near_cache_log
+    row = summarise_log(log_path, chunk_size, timeline_dir)
+
+    assert (row['cache_type'] == "NearCache")
+    assert (row['trace_file'] == "my_trace")
+    assert (row['label'] == "redis")
+    assert (row['requests'] == 10)
+    assert (row['hit_rate %'] == "0.7000")
+    assert (row['byte_hit_rate %'] == "0.7000")
+    assert (row['l1_hit_rate %'] == "0.4000")
+    assert (row['l2_hit_rate %'] == "0.3000")
+    assert (row['mean_response (m/s)'] == "4.0000")
+    assert (row['mean_hit_response (m/s)'] == "1.4286")
+    assert (row['mean_miss_response (m/s)'] == "10.0000")
+    assert (row['mean_pool_wait (m/s)'] == "0.5000")
+    # percentiles are bucket upper edges, at most 1.2% above the latency
+    assert (float(row['p50_response (m/s)']) == pytest.approx(2.0, rel=0.012))
+    assert (float(row['p99_response (m/s)']) == pytest.approx(10.0, rel=0.012))
+    assert (float(row['p99_hit_response (m/s)']) == pytest.approx(2.0, rel=0.012))
+    assert (float(row['p99_miss_response (m/s)']) == pytest.approx(10.0, rel=0.012))
+    # from the start of the first request to the end of the last
+    assert (float(row['throughput (per sec)']) == pytest.approx(10 / (2.25 + 0.01), abs=1e-4))
+
+    timeline = pd.read_csv(f"{timeline_dir}/my_trace_redis_01_02_2024_10_30_5.csv")
+    assert (timeline['second'].tolist() == [0, 1, 2])
+    assert (timeline['requests'].tolist() == [4, 4, 2])
+    assert (timeline['hits'].tolist() == [3, 3, 1])
+
+
+def test_summarise_log_without_timestamps(tmp_path):
+    log_path = tmp_path / "t1_lru_01_02_2024_10_30_4.log"
+    log_path.write_text("cache_action,thread_number,count,delta_time,key,value\n"
+                        "False,0,1,3.0000,k1,ab\n"
+                        "True,0,2,1.0000,k1,ab\n")
+    row = summarise_log(str(log_path), 1000, str(tmp_path))
+
+    assert (row['cache_type'] == "PythonDict")
+    assert (row['label'] == "lru")
+    assert (row['hit_rate %'] == "0.5000")
+    assert (row['throughput (per sec)'] == '')
+    assert (row['l1_hit_rate %'] == '')
@@ -0,0 +1,91 @@
+import random
+from array import array
+from functools import lru_cache
+
+import pytest
+
+from opt_sim import BLOCK_BYTES, load_trace, next_uses, parse_size, simulate
+from trace_file import read_trace, write_binary_trace
+
+
+def brute_force_opt(requests, key_bytes, max_size):
+    """
+    Most hits of any cache of max_size bytes, trying every set of keys to keep after
+    every request.
+    """
+    @lru_cache(maxsize=None)
+    def best(position, cached):
+        if position == len(requests):
+            return 0
+        key_id = requests[position]
+        candidates = sorted(cached | {key_id})
+        most = 0
+        for mask in range(1 << len(candidates)):
+            kept = frozenset(key for index, key in enumerate(candidates) if mask >> index & 1)
+            if sum(key_bytes[key] for key in kept) <= max_size:
+                most = max(most, best(position + 1, kept))
+        return most + (key_id in cached)
+
+    return best(0, frozenset())
+
+
+def run(requests, key_bytes, max_size):
+    requests = array('I', requests)
+    key_bytes = array('I', key_bytes)
+    return simulate(requests, next_uses(requests, len(key_bytes)), key_bytes, max_size)
+
+
+def test_mixed_sizes_match_brute_force():
+    # keys of 1, 2 and 3 blocks
+    key_bytes = [16, 32, 48, 16]
+    requests = [0, 1, 2, 0, 3, 1, 0, 2, 3, 1, 0, 2]
+    for max_size in (16, 32, 48, 64, 96):
+        hits, hit_bytes, total_bytes = run(requests, key_bytes, max_size)
+        assert (hits == brute_force_opt(requests, key_bytes, max_size))
+        assert (total_bytes == sum(key_bytes[key] for key in requests))
+
+
+def test_never_beats_brute_force():
+    rng = random.Random(5)
+    for _ in range(100):
+        key_count = rng.randint(2, 5)
+        requests = [rng.randrange(key_count) for _ in range(rng.randint(5, 10))]
+        uniform = [16] * key_count
+        mixed = [16 * rng.choice([1, 2, 3]) for _ in range(key_count)]
+        for max_size in (16, 32, 48):
+            # evicting the furthest next use is optimal when all values have one size
+            assert (run(requests, uniform, max_size)[0]
+                    == brute_force_opt(requests, uniform, max_size))
+            assert (run(requests, mixed, max_size)[0]
+                    <= brute_force_opt(requests, mixed, max_size))
+
+
+def test_load_trace_keeps_first_size(tmp_path):
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("a 2\nb\na 4\nc 3\n")
+    requests, key_bytes = load_trace(str(trace_path))
+    assert (list(requests) == [0, 1, 0, 2])
+    assert (list(key_bytes) == [2 * BLOCK_BYTES, BLOCK_BYTES, 3 * BLOCK_BYTES])
+    requests, _ = load_trace(str(trace_path), limit=2)
+    assert (list(requests) == [0, 1])
+
+
+def test_binary_trace_matches_text(tmp_path):
+    text_path = tmp_path / "trace.txt"
+    text_path.write_text("a 2\nb\na 4\nc 3\nb\na\n")
+    binary_path = tmp_path / "trace.trace"
+    write_binary_trace(read_trace(str(text_path)), str(binary_path))
+    for limit in (0, 4):
+        text_requests, text_bytes = load_trace(str(text_path), limit)
+        binary_requests, binary_bytes = load_trace(str(binary_path), limit)
+        assert (len(binary_requests) == (limit or 6))
+        assert (list(binary_requests) == list(text_requests))
+        assert (list(binary_bytes) == list(text_bytes))
+        for max_size in (16, 48):
+            assert (run(binary_requests, binary_bytes, max_size)
+                    == run(text_requests, text_bytes, max_size))
+
+
+@pytest.mark.parametrize("text,size", [("4096", 4096), ("64K", 65536), ("1.5m", 1572864)])
+def test_parse_size(text, size):
+    assert (parse_size(text) == size)